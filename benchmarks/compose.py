@@ -0,0 +1,46 @@
+"""
+Measures how long Pipeline.compose() takes as generated workflows grow.
+
+The workflow is built like main.py: a top level Pipeline of nested Pipelines. Each nested Pipeline holds a chain of Tasks that refer to each
+other by name, and its first Task depends on the last Task of the Pipeline before it. Composing should scale linearly with the number of Tasks.
+
+Usage:
+    python -m benchmarks.compose
+"""
+import logging
+import time
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def passThrough(*args, **kwargs):
+    return 1
+
+
+def buildWorkflow(n: int, perPipeline: int = 1_000) -> Pipeline:
+    pipelines = []
+    previous = None
+    for p in range(max(1, n // perPipeline)):
+        steps = []
+        for i in range(min(n, perPipeline)):
+            name = 'p%st%s' % (p, i)
+            deps = ['p%st%s' % (p, i - 1)] if i > 0 else ([previous] if previous else None)
+            steps.append(Task(passThrough, dependsOn=deps, name=name))
+        previous = steps[-1].name
+        pipelines.append(Pipeline(steps=steps))
+    return Pipeline(steps=pipelines)
+
+
+def main():
+    logging.disable(logging.INFO)
+    print('%10s %12s %14s' % ('tasks', 'seconds', 'us per task'))
+    for n in (1_000, 10_000, 50_000):
+        workflow = buildWorkflow(n)
+        start = time.perf_counter()
+        workflow.compose()
+        elapsed = time.perf_counter() - start
+        print('%10s %12.3f %14.1f' % (n, elapsed, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Measures saving and opening generated workflows as compiled plans (saveDAG/openDAG), next to pickling the DAG the way saveDAG used to.
+Listing and verifying a plan only reads its header and tables, so they should stay well under the cost of loading it.
+
+Usage:
+    python -m benchmarks.plans
+"""
+import logging
+import os
+import pickle
+import tempfile
+import time
+from benchmarks.compose import buildWorkflow
+from dexxy.common.plans import Plan
+from dexxy.common.workflows import Pipeline
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1e3
+
+
+def listPlan(filename: str) -> None:
+    with Plan(filename) as plan:
+        plan.describe()
+
+
+def verifyPlan(filename: str) -> None:
+    with Plan(filename) as plan:
+        plan.verify()
+
+
+def main():
+    logging.disable(logging.INFO)
+    directory = tempfile.mkdtemp(prefix='dexxy-plans-')
+    planPath, picklePath = os.path.join(directory, 'plan'), os.path.join(directory, 'pickle')
+
+    print('%10s %10s %10s %10s %10s %12s %12s' % ('tasks', 'save ms', 'open ms', 'list ms', 'verify ms', 'pickle ms', 'unpickle ms'))
+    for n in (1_000, 10_000, 50_000):
+        workflow = buildWorkflow(n)
+        workflow.compose()
+        save = timed(workflow.saveDAG, planPath)
+        opened = timed(Pipeline().openDAG, planPath)
+        listed = timed(listPlan, planPath)
+        verified = timed(verifyPlan, planPath)
+
+        dumped = timed(lambda: open(picklePath, 'wb').write(pickle.dumps(workflow.dag)))
+        loaded = timed(lambda: pickle.loads(open(picklePath, 'rb').read()))
+        print('%10s %10.1f %10.1f %10.1f %10.1f %12.1f %12.1f' % (n, save, opened, listed, verified, dumped, loaded))
+
+    os.remove(planPath)
+    os.remove(picklePath)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
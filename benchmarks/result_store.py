@@ -0,0 +1,47 @@
+"""
+Measures the per-Task overhead of dependency resolution in the Worker as the number of Tasks grows.
+
+Every Task depends on the Task before it and on the Task halfway back, so each lookup has to find results among many completed Tasks.
+With the tid-indexed ResultStore the time per Task should stay flat from 100 to 100k Tasks.
+
+Usage:
+    python -m benchmarks.result_store
+"""
+import logging
+import time
+from queue import Queue
+from dexxy.common.tasks import Task
+from dexxy.common.workers import Worker
+from dexxy.common.results import ResultStore
+
+
+def passThrough(*args, **kwargs):
+    return 1
+
+
+def buildTasks(n: int) -> Queue:
+    tasks = []
+    for i in range(n):
+        deps = list({tasks[i - 1], tasks[i // 2]}) if i > 0 else None
+        tasks.append(Task(passThrough, dependsOn=deps, name='task%s' % i))
+
+    queue = Queue()
+    for task in tasks:
+        queue.put_nowait(task)
+    return queue
+
+
+def main():
+    logging.disable(logging.INFO)
+    print('%10s %12s %14s' % ('tasks', 'seconds', 'us per task'))
+    for n in (100, 1_000, 10_000, 100_000):
+        queue = buildTasks(n)
+        worker = Worker(taskQueue=queue, resultStore=ResultStore(), workers=1)
+        start = time.perf_counter()
+        worker.run()
+        elapsed = time.perf_counter() - start
+        print('%10s %12.3f %14.1f' % (n, elapsed, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
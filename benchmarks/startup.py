@@ -0,0 +1,59 @@
+"""
+Measures how long it takes to get to the point where a Pipeline can run: importing the engine, building a Pipeline, opening a saved DAG
+and importing main.py. Each case runs in a fresh interpreter, best of several runs, with the cost of starting Python itself subtracted.
+
+Heavy libraries (pandas, pyarrow, cloudpickle, networkx, apscheduler, the database driver) should only be imported by the Tasks that
+need them, so none of these cases should pay for them. Use python -X importtime -c "<case>" to see what a slow case imports.
+
+Usage:
+    python -m benchmarks.startup
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SAVED = os.path.join(tempfile.gettempdir(), 'dexxy-startup.pkl')
+
+BUILD = (
+    'from dexxy.common.tasks import Task\n'
+    'from dexxy.common.workflows import Pipeline\n'
+    'pipeline = Pipeline(steps=[Task(print, name="a"), Task(print, dependsOn=["a"], name="b")])\n'
+    'pipeline.compose()'
+)
+
+CASES = {
+    'python': 'pass',
+    'import Pipeline': 'from dexxy.common.workflows import Pipeline',
+    'build Pipeline': BUILD,
+    'open DAG': (
+        'from dexxy.common.workflows import Pipeline\n'
+        'Pipeline(steps=[]).openDAG(%r)' % SAVED
+    ),
+    'import main': 'import main',
+}
+
+
+def timeCase(code: str, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(runs: int = 5):
+    subprocess.run([sys.executable, '-c', BUILD + '\npipeline.saveDAG(%r)' % SAVED], check=True, stdout=subprocess.DEVNULL)
+
+    baseline = timeCase(CASES['python'], runs)
+    print('%18s %10s %14s' % ('case', 'ms', 'ms over python'))
+    for name, code in CASES.items():
+        elapsed = baseline if name == 'python' else timeCase(code, runs)
+        print('%18s %10.1f %14.1f' % (name, elapsed * 1e3, (elapsed - baseline) * 1e3))
+    os.remove(SAVED)
+
+
+if __name__ == '__main__':
+    main()
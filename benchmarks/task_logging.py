@@ -0,0 +1,82 @@
+"""
+Measures what logging costs per Task: building Tasks, and the lines a Worker logs while running them.
+
+"before" is the old LoggingStuff: basicConfig() and getLogger() on every access, the message formatted before the call, and the line written
+to the stream by the thread that logged it. "after" is dexxy.common.logger: configured once, lazy arguments, and lines written by a
+background thread. Both write to os.devnull so the terminal isn't measured.
+On a single core the background thread competes with the caller for the CPU, so "log a line" gains the least; the hand-off pays off
+most when the stream is slow (a terminal, a pipe, a network log shipper).
+
+Usage:
+    python -m benchmarks.task_logging
+"""
+import logging
+import os
+import sys
+import time
+from dexxy.common.logger import configureLogging, getLogger, logContext, stopLogging
+from dexxy.common.tasks import Task
+
+
+class LegacyLogging(object):
+    @property
+    def logger(self, level: str = 'INFO', **kwargs):
+        logging.basicConfig(stream=sys.stdout, level=level, format='%(asctime)s :: %(name)s :: %(levelname)s :: %(message)s', **kwargs)
+        return logging.getLogger(self.__class__.__name__)
+
+
+class LegacyTask(LegacyLogging):
+    def __init__(self, name: str):
+        self.name = name
+        self._log = self.logger
+        self._log.info('Initalized Task %s' % self.name)
+
+
+def passThrough(*args, **kwargs):
+    return 1
+
+
+def perTask(build, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        build(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main(n: int = 20_000):
+    devnull = open(os.devnull, 'w')
+    root = logging.getLogger()
+
+    # before: a synchronous stream handler installed the way basicConfig does it
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.basicConfig(stream=devnull, level='INFO', format='%(asctime)s :: %(name)s :: %(levelname)s :: %(message)s')
+    legacy = logging.getLogger('Worker')
+    before = {
+        'disabled line': perTask(lambda i: legacy.debug('Running Tasks %s on Worker %s ' % ('t%s' % i, 1)), n),
+        'build Task': perTask(lambda i: LegacyTask('t%s' % i), n),
+        'log a line': perTask(lambda i: LegacyLogging().logger.info('Running Tasks %s on Worker %s ' % ('t%s' % i, 1)), n),
+    }
+
+    # after: configured once, written by the background thread
+    configureLogging(stream=devnull, force=True)
+    log = getLogger('Worker')
+    with logContext(runID='benchmark'):
+        # The line case goes last: the background thread is still writing its lines after it returns
+        after = {
+            'disabled line': perTask(lambda i: log.debug('Running Tasks %s on Worker %s ', 't%s' % i, 1), n),
+            'build Task': perTask(lambda i: Task(passThrough, name='t%s' % i), n),
+            'log a line': perTask(lambda i: log.info('Running Tasks %s on Worker %s ', 't%s' % i, 1), n),
+        }
+    start = time.perf_counter()
+    stopLogging()
+    drained = time.perf_counter() - start
+
+    print('%16s %14s %14s' % ('us per Task', 'before', 'after'))
+    for case in before:
+        print('%16s %14.2f %14.2f' % (case, before[case], after[case]))
+    print('The background thread took another %.3f seconds to write out what was still queued.' % drained)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Measures how much memory Tasks take, and what looking Tasks up by their ID costs.
+
+"before" is a Task the way it used to be built: a __dict__, a related list, a logger reference and a uuid4 string as its ID. "after" is
+dexxy.common.tasks.Task: slots, an integer tid and interned names. Memory is measured with tracemalloc for n Tasks that each depend on
+the one before (like generated partition Tasks), and then for composing them into a Pipeline.
+
+Usage:
+    python -m benchmarks.task_memory
+"""
+import logging
+import time
+import tracemalloc
+from dexxy.common.tasks import Task
+from dexxy.common.utils import generateUniqueID
+from dexxy.common.workflows import Pipeline
+
+
+class LegacyTask(object):
+    def __init__(self, func, dependsOn=None, name=None):
+        self.func = func
+        self.kwargs = {}
+        self.dependsOn = dependsOn
+        self.name = name
+        self.executor = None
+        self.keepResult = False
+        self.cacheable = True
+        self.retries = 0
+        self.retryDelay = 1.0
+        self.timeout = None
+        self.resources = None
+        self.related = []
+        self.tid = generateUniqueID()
+        self.attempts = 0
+        self.cached = False
+        self.restored = False
+        self.status = 'Not Started'
+        self.result = None
+        self.duration = None
+        self.queuedAt = None
+        self.readyAt = None
+        self.startedAt = None
+        self.finishedAt = None
+        self.resultRows = None
+        self.resultBytes = None
+        self.error = None
+        self._log = logging.getLogger('Task')
+
+
+def passThrough(*args, **kwargs):
+    return 1
+
+
+def buildTasks(cls, n: int) -> list:
+    tasks = []
+    for i in range(n):
+        tasks.append(cls(passThrough, dependsOn=['part%s' % (i - 1)] if i else None, name='part%s' % i))
+    return tasks
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, kept
+
+
+def lookups(keys: list, rounds: int = 20) -> float:
+    # What the Workers do for every Task: a handful of dictionary reads and writes keyed by tid
+    table = dict.fromkeys(keys, 0)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            table[key] += 1
+    return (time.perf_counter() - start) / (rounds * len(keys)) * 1e9
+
+
+def main(n: int = 100_000):
+    logging.disable(logging.INFO)
+
+    before, legacy = measure(lambda: buildTasks(LegacyTask, n))
+    after, tasks = measure(lambda: buildTasks(Task, n))
+    pipeline = Pipeline(steps=tasks)
+    composed, _ = measure(pipeline.compose)
+
+    print('%22s %14s %14s' % ('bytes per Task', 'before', 'after'))
+    print('%22s %14.0f %14.0f' % ('Task', before / n, after / n))
+    print('%22s %14s %14.0f' % ('composed DAG (extra)', '', composed / n))
+
+    uuids = [task.tid for task in legacy]
+    tids = [task.tid for task in tasks]
+    print('%22s %14.1f %14.1f' % ('ns per tid lookup', lookups(uuids), lookups(tids)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,510 @@
+import argparse
+import cloudpickle
+import os
+import socket
+import sqlite3
+from concurrent.futures import Executor, Future
+from dexxy.common.logger import LoggingStuff
+from multiprocessing import get_context
+from multiprocessing.managers import BaseManager
+from threading import Event, Lock, Thread, local
+from time import sleep, time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from uuid import uuid4
+
+# Claimed jobs are leased to their worker, which renews the lease while the job runs. A job whose lease runs out (its worker died or lost
+# the broker) is handed to another worker, up to maxClaims times, and then failed so the Task waiting for it doesn't hang.
+LEASE = 60.0
+MAX_CLAIMS = 2
+
+
+def lostJob(jobID: int, claims: int) -> bytes:
+    # The outcome of a job that ran out of claims
+    return cloudpickle.dumps((False, RuntimeError('Job %s was claimed %s time(s) but its worker never finished it (lease expired)' % (jobID, claims))))
+
+
+class SQLiteBroker(object):
+    """
+    A job queue kept in a SQLite file. The Pipeline puts jobs in, any number of BrokerWorker processes on the same host (or on hosts that share
+    the file) claim them one at a time and write the outcome back. Claiming happens inside an IMMEDIATE transaction so two workers never get the same job.
+
+    Every job belongs to the broker (owner) that put it, and the owner marks itself as alive while it waits for outcomes. Jobs of an owner that
+    hasn't been seen for a lease (a Pipeline that crashed) are deleted instead of being run for nobody, so a new run never picks up an old run's jobs.
+    Use the same lease for the Pipeline and its workers.
+    """
+
+    def __init__(self, path: str, lease: float = LEASE, maxClaims: int = MAX_CLAIMS):
+        """
+        Args:
+            path (str): The SQLite file, e.g. 'runs/broker.db'. Created if it doesn't exist.
+            lease (float, optional): Seconds a claimed job (or an owner) may go without being renewed. Defaults to 60.0.
+            maxClaims (int, optional): How many times a job whose lease expired is handed out before it fails. Defaults to 2.
+        """
+        self.path = path
+        self.lease = lease
+        self.maxClaims = maxClaims
+        self.owner = uuid4().hex
+        self._seenAt = 0.0
+        self._local = local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = self.connect()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+        if columns and 'owner' not in columns:
+            # Left by a version without owners and leases. Its jobs can't be told apart from this run's, so start over.
+            conn.execute('DROP TABLE jobs')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, owner TEXT, payload BLOB, status TEXT, worker TEXT, claimedAt REAL, '
+            'claims INTEGER DEFAULT 0, outcome BLOB)'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS owners (id TEXT PRIMARY KEY, seenAt REAL)')
+        self.transaction(self.expire)
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Returns:
+            sqlite3.Connection: This thread's connection to the file. SQLite connections can't be shared between threads.
+        """
+        if getattr(self._local, 'conn', None) is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return self._local.conn
+
+    def transaction(self, func: Callable, *args):
+        # Runs func(conn, *args) inside an IMMEDIATE transaction and returns what it returned
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(conn, *args)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def expire(self, conn: sqlite3.Connection) -> None:
+        # Hands out again (or fails) the jobs whose worker stopped renewing them, and deletes the jobs of owners that stopped waiting for them
+        now = time()
+        conn.execute('DELETE FROM owners WHERE seenAt < ?', (now - self.lease,))
+        conn.execute('DELETE FROM jobs WHERE owner NOT IN (SELECT id FROM owners)')
+        expired = conn.execute("SELECT id, claims FROM jobs WHERE status = 'claimed' AND claimedAt < ?", (now - self.lease,)).fetchall()
+        for jobID, claims in expired:
+            if claims < self.maxClaims:
+                conn.execute("UPDATE jobs SET status = 'pending', worker = NULL, claimedAt = NULL WHERE id = ?", (jobID,))
+            else:
+                conn.execute("UPDATE jobs SET status = 'done', outcome = ?, payload = NULL WHERE id = ?", (lostJob(jobID, claims), jobID))
+
+    def seen(self, conn: sqlite3.Connection) -> None:
+        # Marks this owner as alive. Written at most a few times per lease.
+        now = time()
+        if now - self._seenAt > self.lease / 4:
+            conn.execute('INSERT OR REPLACE INTO owners (id, seenAt) VALUES (?, ?)', (self.owner, now))
+            self._seenAt = now
+
+    def put(self, payload: bytes) -> int:
+        def insert(conn: sqlite3.Connection) -> int:
+            self.seen(conn)
+            return conn.execute("INSERT INTO jobs (owner, payload, status) VALUES (?, ?, 'pending')", (self.owner, payload)).lastrowid
+        return self.transaction(insert)
+
+    def claim(self, worker: str) -> Optional[Tuple[int, bytes]]:
+        def claimNext(conn: sqlite3.Connection) -> Optional[Tuple[int, bytes]]:
+            self.expire(conn)
+            row = conn.execute("SELECT id, payload FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'claimed', worker = ?, claimedAt = ?, claims = claims + 1 WHERE id = ?", (worker, time(), row[0]))
+            return row
+        return self.transaction(claimNext)
+
+    def renew(self, jobID: int, worker: str) -> bool:
+        """
+        Extends the lease of a job the worker is still running.
+
+        Returns:
+            bool: False if the job is no longer the worker's (its lease already expired).
+        """
+        cursor = self.connect().execute("UPDATE jobs SET claimedAt = ? WHERE id = ? AND worker = ? AND status = 'claimed'", (time(), jobID, worker))
+        return cursor.rowcount > 0
+
+    def finish(self, jobID: int, outcome: bytes, worker: str = None) -> None:
+        # A worker whose lease expired doesn't overwrite the job it lost
+        self.connect().execute("UPDATE jobs SET status = 'done', outcome = ?, payload = NULL WHERE id = ? AND status = 'claimed' AND (? IS NULL OR worker = ?)",
+                               (outcome, jobID, worker, worker))
+
+    def collect(self, jobIDs: List[int]) -> List[Tuple[int, bytes]]:
+        marks = ','.join('?' * len(jobIDs))
+
+        def collectDone(conn: sqlite3.Connection) -> List[Tuple[int, bytes]]:
+            self.seen(conn)
+            self.expire(conn)
+            rows = conn.execute("SELECT id, outcome FROM jobs WHERE status = 'done' AND id IN (%s)" % marks, jobIDs).fetchall()
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(row[0],) for row in rows])
+            return rows
+        return self.transaction(collectDone)
+
+    def cancel(self, jobID: int) -> bool:
+        # Only a job no worker has claimed yet can be taken back
+        return self.connect().execute("DELETE FROM jobs WHERE id = ? AND status = 'pending'", (jobID,)).rowcount > 0
+
+
+class MemoryBroker(object):
+    """
+    The same job queue as SQLiteBroker, kept in memory. SocketBroker serves one of these to BrokerWorkers on other hosts. It goes away with
+    the Pipeline's process, so only claimed jobs need leases.
+    """
+
+    def __init__(self, lease: float = LEASE, maxClaims: int = MAX_CLAIMS):
+        """
+        Args:
+            lease (float, optional): Seconds a claimed job may go without being renewed. Defaults to 60.0.
+            maxClaims (int, optional): How many times a job whose lease expired is handed out before it fails. Defaults to 2.
+        """
+        self.lease = lease
+        self.maxClaims = maxClaims
+        self._lock = Lock()
+        self._ids = 0
+        self._pending: Dict[int, bytes] = {}
+        # jobID -> (worker, claimedAt, payload)
+        self._claimed: Dict[int, Tuple[str, float, bytes]] = {}
+        self._claims: Dict[int, int] = {}
+        self._done: Dict[int, bytes] = {}
+
+    def leaseTime(self) -> float:
+        return self.lease
+
+    def expire(self) -> None:
+        # Call with the lock held
+        now = time()
+        for jobID, (worker, claimedAt, payload) in list(self._claimed.items()):
+            if claimedAt < now - self.lease:
+                del self._claimed[jobID]
+                if self._claims[jobID] < self.maxClaims:
+                    self._pending[jobID] = payload
+                else:
+                    self._done[jobID] = lostJob(jobID, self._claims.pop(jobID))
+
+    def put(self, payload: bytes) -> int:
+        with self._lock:
+            self._ids += 1
+            self._pending[self._ids] = payload
+            return self._ids
+
+    def claim(self, worker: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            self.expire()
+            if not self._pending:
+                return None
+            jobID = min(self._pending)
+            payload = self._pending.pop(jobID)
+            self._claimed[jobID] = (worker, time(), payload)
+            self._claims[jobID] = self._claims.get(jobID, 0) + 1
+            return jobID, payload
+
+    def renew(self, jobID: int, worker: str) -> bool:
+        with self._lock:
+            claimed = self._claimed.get(jobID)
+            if claimed is None or claimed[0] != worker:
+                return False
+            self._claimed[jobID] = (worker, time(), claimed[2])
+            return True
+
+    def finish(self, jobID: int, outcome: bytes, worker: str = None) -> None:
+        with self._lock:
+            claimed = self._claimed.get(jobID)
+            if claimed is None or (worker is not None and claimed[0] != worker):
+                return
+            del self._claimed[jobID]
+            self._claims.pop(jobID, None)
+            self._done[jobID] = outcome
+
+    def collect(self, jobIDs: List[int]) -> List[Tuple[int, bytes]]:
+        with self._lock:
+            self.expire()
+            return [(jobID, self._done.pop(jobID)) for jobID in jobIDs if jobID in self._done]
+
+    def cancel(self, jobID: int) -> bool:
+        with self._lock:
+            if self._pending.pop(jobID, None) is None:
+                return False
+            self._claims.pop(jobID, None)
+            return True
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+class SocketBroker(object):
+    """
+    A MemoryBroker shared over TCP, for BrokerWorkers on other hosts. The Pipeline's side serves it (serve=True) and every worker connects to
+    the same address with the same authkey.
+
+    Workers unpickle and run whatever the queue hands them, so anyone who can reach the port and knows the authkey can run code on the
+    Pipeline's host and on every worker. There is no default authkey, and by default the queue is only served on this host. Serve it on
+    another interface (e.g. ('0.0.0.0', 5050)) only on a network you trust, with a long random authkey.
+    """
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 5050), authkey: bytes = None, serve: bool = False, lease: float = LEASE,
+                 maxClaims: int = MAX_CLAIMS):
+        """
+        Args:
+            address (Tuple[str, int], optional): The (host, port) to serve on or connect to. Defaults to ('127.0.0.1', 5050).
+            authkey (bytes): The shared secret workers must present, e.g. secrets.token_bytes(32).
+            serve (bool, optional): Host the queue in this process instead of connecting to one. Defaults to False.
+            lease (float, optional): See MemoryBroker. Only used when serving. Defaults to 60.0.
+            maxClaims (int, optional): See MemoryBroker. Only used when serving. Defaults to 2.
+
+        Raises:
+            ValueError: If no authkey is given.
+        """
+        if not authkey:
+            raise ValueError('SocketBroker needs an authkey. Workers run whatever the broker hands them, so pick a secret only they know')
+        self.address = address
+        if serve:
+            self._broker = MemoryBroker(lease, maxClaims)
+            BrokerManager.register('broker', callable=lambda: self._broker)
+            self._server = BrokerManager(address=address, authkey=authkey).get_server()
+            self.address = self._server.address
+            Thread(target=self._server.serve_forever, name='SocketBroker', daemon=True).start()
+        else:
+            BrokerManager.register('broker')
+            manager = BrokerManager(address=address, authkey=authkey)
+            manager.connect()
+            self._broker = manager.broker()
+        self.lease = self._broker.leaseTime()
+
+    def put(self, payload: bytes) -> int:
+        return self._broker.put(payload)
+
+    def claim(self, worker: str) -> Optional[Tuple[int, bytes]]:
+        return self._broker.claim(worker)
+
+    def renew(self, jobID: int, worker: str) -> bool:
+        return self._broker.renew(jobID, worker)
+
+    def finish(self, jobID: int, outcome: bytes, worker: str = None) -> None:
+        self._broker.finish(jobID, outcome, worker)
+
+    def collect(self, jobIDs: List[int]) -> List[Tuple[int, bytes]]:
+        return self._broker.collect(jobIDs)
+
+    def cancel(self, jobID: int) -> bool:
+        return self._broker.cancel(jobID)
+
+
+Broker = Union[SQLiteBroker, MemoryBroker, SocketBroker]
+
+
+class BrokerFuture(Future):
+    """
+    The Future of a job put on a broker. Cancelling it takes the job off the queue, which only works until a BrokerWorker claims it. After
+    that cancel() returns False and the Future stays running until the job's outcome (or its expired lease) comes back, so a timed-out
+    attempt that is still running on a worker is known to be running.
+    """
+
+    def __init__(self, broker: 'Broker', jobID: int):
+        super(BrokerFuture, self).__init__()
+        self.broker = broker
+        self.jobID = jobID
+
+    def cancel(self) -> bool:
+        if not self.done() and not self.broker.cancel(self.jobID):
+            try:
+                self.set_running_or_notify_cancel()
+            except RuntimeError:
+                # The outcome arrived (or it was already marked running) in the meantime
+                pass
+        return super(BrokerFuture, self).cancel()
+
+
+class BrokerExecutor(Executor):
+    """
+    An Executor that hands calls to a broker instead of running them. Workers use it in place of the local process pool, so Tasks that run
+    with executor='process' go to whichever BrokerWorker claims them first, with the same retries, timeouts and Arrow packing as the process pool.
+    """
+
+    def __init__(self, broker: Broker, pollInterval: float = 0.05):
+        """
+        Args:
+            broker (Broker): Where to put jobs and collect their outcomes.
+            pollInterval (float, optional): Seconds between checks for finished jobs. Defaults to 0.05.
+        """
+        self.broker = broker
+        self.pollInterval = pollInterval
+        self._futures: Dict[int, Future] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._poller = None
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        # A call that times out is cancelled, which takes it off the queue if no worker has claimed it yet (see BrokerFuture)
+        with self._lock:
+            jobID = self.broker.put(cloudpickle.dumps((fn, args, kwargs)))
+            future = self._futures[jobID] = BrokerFuture(self.broker, jobID)
+            if self._poller is None:
+                self._poller = Thread(target=self.poll, name='BrokerExecutor', daemon=True)
+                self._poller.start()
+        return future
+
+    def poll(self) -> None:
+        """
+        Runs on a background thread and resolves the futures of finished jobs.
+        """
+        while not self._stop.wait(self.pollInterval):
+            with self._lock:
+                # Cancelled jobs were deleted from the broker and will never finish
+                for jobID in [jobID for jobID, future in self._futures.items() if future.cancelled()]:
+                    del self._futures[jobID]
+                jobIDs = list(self._futures)
+            if not jobIDs:
+                continue
+
+            for jobID, outcome in self.broker.collect(jobIDs):
+                with self._lock:
+                    future = self._futures.pop(jobID)
+                if future.cancelled():
+                    continue
+                succeeded, value = cloudpickle.loads(outcome)
+                if succeeded:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            with self._lock:
+                futures = list(self._futures.values())
+            for future in futures:
+                future.cancel()
+        self._stop.set()
+        if wait and self._poller is not None:
+            self._poller.join()
+
+
+class BrokerWorker(LoggingStuff):
+    """
+    Claims jobs from a broker, runs them and publishes the outcome. Start as many as you like, on this host or others:
+        python -m dexxy.common.brokers sqlite runs/broker.db --processes 4
+        DEXXY_BROKER_AUTHKEY=<secret> python -m dexxy.common.brokers socket pipeline-host:5050
+
+    While a job runs its lease is renewed from a background thread, so jobs may run longer than the lease.
+    """
+
+    def __init__(self, broker: Broker, name: str = None, pollInterval: float = 0.1):
+        """
+        Args:
+            broker (Broker): The broker to claim jobs from.
+            name (str, optional): Recorded against every job this worker claims. Defaults to None, which uses host-pid.
+            pollInterval (float, optional): Seconds to wait when the queue is empty. Defaults to 0.1.
+        """
+        self.broker = broker
+        self.name = name or '%s-%s' % (socket.gethostname(), os.getpid())
+        self.pollInterval = pollInterval
+        self._log = self.logger
+
+    def runJob(self, payload: bytes) -> bytes:
+        """
+        Args:
+            payload (bytes): cloudpickle.dumps((fn, args, kwargs))
+
+        Returns:
+            bytes: cloudpickle.dumps((True, result)) or cloudpickle.dumps((False, exception))
+        """
+        try:
+            fn, args, kwargs = cloudpickle.loads(payload)
+            outcome = (True, fn(*args, **kwargs))
+        except Exception as error:
+            outcome = (False, error)
+
+        try:
+            return cloudpickle.dumps(outcome)
+        except Exception as error:
+            return cloudpickle.dumps((False, RuntimeError('%s could not send back its outcome: %r' % (self.name, error))))
+
+    def serve(self, maxJobs: int = None) -> int:
+        """
+        Claims and runs jobs until stopped (or until maxJobs have run).
+
+        Args:
+            maxJobs (int, optional): Stop after this many jobs. Defaults to None (run forever).
+
+        Returns:
+            int: The number of jobs that ran.
+        """
+        self._log.info('BrokerWorker %s waiting for jobs', self.name)
+        jobs = 0
+        while maxJobs is None or jobs < maxJobs:
+            job = self.broker.claim(self.name)
+            if job is None:
+                sleep(self.pollInterval)
+                continue
+
+            jobID, payload = job
+            self._log.info('BrokerWorker %s running job %s', self.name, jobID)
+            done = Event()
+            renewer = Thread(target=self.renewLease, args=(jobID, done), name='BrokerLease', daemon=True)
+            renewer.start()
+            try:
+                outcome = self.runJob(payload)
+            finally:
+                done.set()
+                renewer.join()
+            self.broker.finish(jobID, outcome, self.name)
+            jobs += 1
+        return jobs
+
+    def renewLease(self, jobID: int, done: Event) -> None:
+        # Runs next to a job and renews its lease a few times per lease, until the job is done
+        while not done.wait(self.broker.lease / 3):
+            try:
+                if not self.broker.renew(jobID, self.name):
+                    self._log.warning('BrokerWorker %s lost the lease of job %s, its outcome will be ignored', self.name, jobID)
+                    return
+            except Exception as error:
+                self._log.warning('BrokerWorker %s could not renew the lease of job %s: %r', self.name, jobID, error)
+
+
+def openBroker(type: str, location: str, authkey: bytes = None, lease: float = LEASE) -> Broker:
+    """
+    Connects to a broker from the command line arguments of a worker.
+
+    Args:
+        type (str): 'sqlite' or 'socket'.
+        location (str): The SQLite file, or host:port of a SocketBroker.
+        authkey (bytes, optional): The SocketBroker's shared secret. Required for 'socket'. Defaults to None.
+        lease (float, optional): The SQLite broker's lease, the same as the Pipeline's. Defaults to 60.0.
+
+    Returns:
+        Broker: The broker.
+    """
+    if type == 'socket':
+        host, port = location.rsplit(':', 1)
+        return SocketBroker((host, int(port)), authkey=authkey)
+    return SQLiteBroker(location, lease=lease)
+
+
+def runWorker(type: str, location: str, authkey: bytes, lease: float = LEASE) -> None:
+    BrokerWorker(openBroker(type, location, authkey, lease)).serve()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run Tasks handed out by a dexxy broker.')
+    parser.add_argument('type', choices=['sqlite', 'socket'])
+    parser.add_argument('location', help='The SQLite file, or host:port of a SocketBroker')
+    parser.add_argument('--authkey', default=os.environ.get('DEXXY_BROKER_AUTHKEY'),
+                        help="The SocketBroker's secret. Defaults to $DEXXY_BROKER_AUTHKEY, which keeps it out of the process list")
+    parser.add_argument('--lease', type=float, default=LEASE, help='The SQLite broker lease in seconds, the same as the Pipeline uses')
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+    if args.type == 'socket' and not args.authkey:
+        parser.error('a socket broker needs --authkey (or DEXXY_BROKER_AUTHKEY)')
+
+    authkey = args.authkey.encode() if args.authkey else None
+    workers = [get_context('spawn').Process(target=runWorker, args=(args.type, args.location, authkey, args.lease))
+               for _ in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
@@ -0,0 +1,266 @@
+import hashlib
+import os
+import pickle
+import sysconfig
+from threading import Lock
+from types import CodeType, FunctionType, MethodType
+from typing import Any, Callable, List, TypeVar
+from dexxy.common.results import SpilledResult, saveResult, loadResult
+from dexxy.common.utils import isDataFrame
+
+Task = TypeVar('Task')
+
+
+# Functions from the standard library and installed packages are hashed by name only, not followed into
+LIBRARY_PATHS = tuple({sysconfig.get_paths()[name] for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+# Values read from globals, closures and defaults that are hashed by value. Anything else (a connection, a DataFrame, ...) only adds its type.
+PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def hashCode(code: CodeType, digest, names: set) -> None:
+    """
+    Feeds a code object (and every nested function or lambda inside it) into a hash, and collects the names it refers to.
+    """
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    names.update(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            hashCode(const, digest, names)
+        else:
+            digest.update(repr(const).encode())
+
+
+def hashValue(value: Any, digest, seen: set) -> None:
+    """
+    Feeds something a function refers to into a hash: other functions by their code (see fingerprint), plain values and containers of them by value.
+    """
+    if isinstance(value, (FunctionType, MethodType)):
+        digest.update(fingerprint(value, seen).encode())
+    elif isinstance(value, PLAIN_TYPES):
+        digest.update(repr(value).encode())
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        digest.update(type(value).__name__.encode())
+        for item in (sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value):
+            hashValue(item, digest, seen)
+    elif isinstance(value, type):
+        # Classes by name only -- the same class is in module 'main' or '__main__' depending on how main.py was started
+        digest.update(value.__qualname__.encode())
+    elif isinstance(value, dict):
+        for key, item in sorted(value.items(), key=lambda pair: repr(pair[0])):
+            digest.update(repr(key).encode())
+            hashValue(item, digest, seen)
+    else:
+        digest.update(type(value).__qualname__.encode())
+
+
+def fingerprint(func: Callable, seen: set = None) -> str:
+    """
+    Hashes a Task's function by its code rather than its name, so editing the body of a transform changes its fingerprint. What the code refers
+    to is hashed with it: the module-level functions it calls and the constants it reads (followed into their own code and globals), the values
+    captured in its closure and its default arguments. Functions from the standard library and installed packages are hashed by name only, and
+    values reached through a module (helpers.clean, config.ROWS) aren't followed -- give the Task a version for changes like those.
+
+    Args:
+        func (Callable): The Task's function.
+        seen (set, optional): The code objects already being hashed, so recursive functions don't loop. Defaults to None.
+
+    Returns:
+        str: A hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(getattr(func, '__qualname__', repr(func)).encode())
+    func = getattr(func, '__func__', func)
+    code = getattr(func, '__code__', None)
+    if code is None:
+        import cloudpickle
+        digest.update(cloudpickle.dumps(func))
+        return digest.hexdigest()
+
+    seen = set() if seen is None else seen
+    if code.co_filename.startswith(LIBRARY_PATHS) or code.co_filename.startswith('<frozen'):
+        digest.update(str(getattr(func, '__module__', None)).encode())
+        return digest.hexdigest()
+    if id(code) in seen:
+        return digest.hexdigest()
+    seen.add(id(code))
+
+    names = set()
+    hashCode(code, digest, names)
+    # Globals read by name, in a fixed order. Attribute names are in co_names too -- the ones that aren't globals are skipped.
+    scope = getattr(func, '__globals__', {})
+    for name in sorted(names):
+        if name in scope:
+            digest.update(name.encode())
+            hashValue(scope[name], digest, seen)
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            hashValue(cell.cell_contents, digest, seen)
+        except ValueError:
+            # A closure variable that hasn't been assigned yet
+            continue
+    hashValue(getattr(func, '__defaults__', None), digest, seen)
+    hashValue(getattr(func, '__kwdefaults__', None), digest, seen)
+    return digest.hexdigest()
+
+
+class TaskCache(object):
+    """
+    A content-addressed cache of Task results on local disk. A Task's key is a hash of its function's code (with the helpers and constants it
+    refers to, see fingerprint), its kwargs (functions passed in kwargs by their code too), its partitions and reduce functions, its version and
+    the keys of the Tasks it depends on, so changing one transform only changes the keys of that transform and everything downstream of it.
+
+    Tasks that aren't cacheable (like extracts that read a live database) are run every time and keyed by the content of their result instead,
+    so a change in a source table changes the keys of everything built from it.
+
+    DataFrames are stored as Arrow files and handed back as SpilledResult handles (memory-mapped when a downstream Task needs them). Other results are pickled.
+    When the cache grows past maxBytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, maxBytes: int = 2 * 1024 ** 3):
+        """
+        Args:
+            directory (str): The folder to keep cached results in.
+            maxBytes (int, optional): The most disk space the cache may use. Defaults to 2 GiB.
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        # Keys used during the current run are never evicted, so handles to them stay valid
+        self.pinned = set()
+        self._fingerprints = {}
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, func: Callable) -> str:
+        # Mapped Tasks share their func with every child, so each function is hashed once per run
+        cached = self._fingerprints.get(id(func))
+        if cached is None or cached[0] is not func:
+            cached = self._fingerprints[id(func)] = (func, fingerprint(func))
+        return cached[1]
+
+    def resultKey(self, result: Any) -> str:
+        """
+        Keys a result by its content, for Tasks that aren't cacheable and run every time (e.g. extracts).
+
+        Args:
+            result (Any): The Task's result.
+
+        Returns:
+            str: A hex digest, or None if the result can't be hashed (a connection, a cursor, ...).
+        """
+        if isinstance(result, SpilledResult):
+            result = result.load()
+        digest = hashlib.sha256()
+        if isDataFrame(result):
+            import pandas as pd
+
+            digest.update(repr(list(zip(result.columns, result.dtypes.astype(str)))).encode())
+            try:
+                digest.update(pd.util.hash_pandas_object(result, index=True).values.tobytes())
+                return digest.hexdigest()
+            except TypeError:
+                # Columns holding unhashable values (lists, dicts) fall back to pickle
+                pass
+        try:
+            digest.update(pickle.dumps(result, protocol=4))
+        except Exception:
+            return None
+        return digest.hexdigest()
+
+    def key(self, task: Task, upstream: List[str]) -> str:
+        """
+        Computes a Task's cache key.
+
+        Args:
+            task (Task): The Task.
+            upstream (List[str]): The cache keys of the Tasks it depends on (see resultKey for the ones that aren't cacheable), in dependsOn order.
+
+        Returns:
+            str: A hex digest, or None if the Task's kwargs can't be hashed (or an upstream Task has no key).
+        """
+        if any(key is None for key in upstream):
+            return None
+        # Functions passed as kwargs (e.g. mapChunks' func) are pickled by name, so their code is hashed separately
+        functions = sorted((name, value) for name, value in task.kwargs.items() if isinstance(value, (FunctionType, MethodType)))
+        try:
+            kwargs = pickle.dumps(sorted(task.kwargs.items()), protocol=4)
+        except Exception:
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(self.fingerprint(task.func).encode())
+        digest.update(kwargs)
+        for name, value in functions:
+            digest.update(name.encode())
+            digest.update(self.fingerprint(value).encode())
+        for func in (task.partitions, task.reduce):
+            if func is not None:
+                digest.update(self.fingerprint(func).encode())
+        digest.update(repr(task.version).encode())
+        for key in upstream:
+            digest.update(key.encode())
+        return digest.hexdigest()
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key: str) -> Any:
+        """
+        Looks up a cached result and marks it as recently used.
+
+        Args:
+            key (str): The Task's cache key.
+
+        Raises:
+            KeyError: If nothing is cached under the key.
+
+        Returns:
+            Any: The cached result (a SpilledResult for DataFrames).
+        """
+        with self._lock:
+            for suffix in ('.arrow', '.pkl'):
+                path = self.path(key, suffix)
+                if os.path.exists(path):
+                    os.utime(path)
+                    self.pinned.add(key)
+                    break
+            else:
+                raise KeyError(key)
+
+        return loadResult(path)
+
+    def put(self, key: str, result: Any) -> None:
+        """
+        Stores a Task's result. Results that can't be written (a cursor, a connection, ...) are skipped.
+
+        Args:
+            key (str): The Task's cache key.
+            result (Any): The Task's result.
+        """
+        try:
+            saveResult(result, self.path(key, ''))
+        except Exception:
+            return
+
+        with self._lock:
+            self.pinned.add(key)
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits in maxBytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path, os.path.splitext(name)[0]))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, path, key in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            if key in self.pinned:
+                continue
+            os.remove(path)
+            total -= size
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+from threading import Lock
+from typing import Dict, List, TypeVar
+from dexxy.common.results import saveResult, loadResult
+
+Task = TypeVar('Task')
+
+
+class Checkpoint(object):
+    """
+    Records the progress of a run in a run directory so a failed run can be resumed instead of starting over from openPool.
+
+    Every Task that completes is appended to checkpoint.jsonl (one line per Task, by name) along with its result under results/, so recording
+    a Task costs the same however many completed before it. Loading reads the lines back (a later line for the same Task wins) and compacts
+    the file. Results that can't be written (a cursor, a connection, ...) are marked as not restorable, so resuming runs those Tasks again. Layout:
+        <directory>/checkpoint.jsonl    {"runID": ...} and then {"task": <name>, "status": "Completed", ...} per completed Task
+        <directory>/results/<task name>.arrow or .pkl
+
+    Run directories written before the log (a single checkpoint.json) are still read.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): The run directory, e.g. 'runs/nightly'
+        """
+        self.directory = directory
+        self.resultsDir = os.path.join(directory, 'results')
+        self.statePath = os.path.join(directory, 'checkpoint.jsonl')
+        self.state: Dict[str, Dict] = {}
+        self.runID = None
+        self._lock = Lock()
+
+    def reset(self, runID: str) -> None:
+        """
+        Starts a fresh checkpoint for a new run, removing whatever a previous run left in the directory.
+
+        Args:
+            runID (str): The unique ID of the run.
+        """
+        if os.path.exists(self.resultsDir):
+            shutil.rmtree(self.resultsDir)
+        os.makedirs(self.resultsDir, exist_ok=True)
+        self.state = {}
+        self.runID = runID
+        self.write()
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Reads the checkpoint of a previous run and compacts its log to one line per Task. A last line cut short by a crash is ignored.
+
+        Returns:
+            Dict[str, Dict]: The recorded Tasks by name, e.g. {'extractCustomer': {'status': 'Completed', 'result': 'results/extractCustomer.arrow'}}
+        """
+        self.state = {}
+        legacyPath = os.path.join(self.directory, 'checkpoint.json')
+        if os.path.exists(self.statePath):
+            with open(self.statePath, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'task' in record:
+                        self.state[record.pop('task')] = record
+                    elif 'runID' in record:
+                        self.runID = record['runID']
+        elif os.path.exists(legacyPath):
+            with open(legacyPath, 'r') as f:
+                legacy = json.load(f)
+            self.state = legacy.get('tasks', {})
+            self.runID = legacy.get('runID')
+
+        os.makedirs(self.resultsDir, exist_ok=True)
+        self.write()
+        return self.state
+
+    def key(self, task: Task) -> str:
+        return task.name if task.name is not None else str(task.tid)
+
+    def save(self, task: Task, runID: str) -> None:
+        """
+        Records a completed Task and writes its result.
+
+        Args:
+            task (Task): The Task that just completed.
+            runID (str): The unique ID of the run.
+        """
+        key = self.key(task)
+        entry = {'status': 'Completed', 'tid': task.tid, 'result': None, 'restorable': True}
+
+        if task.result is not None:
+            try:
+                path = saveResult(task.result, os.path.join(self.resultsDir, key))
+                entry['result'] = os.path.relpath(path, self.directory)
+            except Exception:
+                entry['restorable'] = False
+
+        line = json.dumps({'task': key, **entry}) + '\n'
+        with self._lock:
+            self.state[key] = entry
+            with open(self.statePath, 'a') as f:
+                # A resumed run carries on the log of the run it resumes
+                if runID != self.runID:
+                    self.runID = runID
+                    f.write(json.dumps({'runID': runID}) + '\n')
+                f.write(line)
+
+    def write(self) -> None:
+        """
+        Rewrites checkpoint.jsonl with one line per recorded Task. The file is replaced atomically so a crash mid-write never leaves a broken
+        checkpoint behind.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.statePath + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(json.dumps({'runID': self.runID}) + '\n')
+            for key, entry in self.state.items():
+                f.write(json.dumps({'task': key, **entry}) + '\n')
+        os.replace(tmp, self.statePath)
+
+    def restore(self, tasks: List[Task]) -> int:
+        """
+        Marks the Tasks that completed in the checkpointed run as restored and reloads their results, so the Worker only runs the rest.
+
+        Args:
+            tasks (List[Task]): The Tasks of the DAG being resumed.
+
+        Returns:
+            int: The number of Tasks restored.
+        """
+        restored = 0
+        for task in tasks:
+            entry = self.state.get(self.key(task))
+            if entry is None or entry.get('status') != 'Completed' or not entry.get('restorable', False):
+                continue
+
+            task.result = loadResult(os.path.join(self.directory, entry['result'])) if entry.get('result') else None
+            task.restored = True
+            task.updateStatus('Completed')
+            restored += 1
+        return restored
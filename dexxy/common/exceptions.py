@@ -10,4 +10,19 @@ class DependencyError(Exception):
     pass
 
 class NotFoundError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class TaskTimeoutError(Exception):
+    pass
+
+class TaskFailedError(Exception):
+    pass
+
+class PlanError(Exception):
+    pass
+
+class ResourceError(Exception):
+    pass
+
+class StreamError(Exception):
+    pass
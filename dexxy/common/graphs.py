@@ -0,0 +1,207 @@
+from typing import Any, Dict, Iterator, List, Set, Tuple, TypeVar
+
+Task = TypeVar('Task')
+
+
+class DAG(object):
+    """
+    The graph behind a Pipeline. Nodes are numbered in the order they are added and everything about them lives in lists indexed by that
+    number: the node's tid, its Task and the numbers of the nodes on either side of its edges. Only the tid -> number lookup is a dictionary.
+    Compared to a networkx MultiDiGraph this keeps no attribute dictionaries per node or edge, which is most of the memory of a large DAG.
+
+    networkx is only needed to draw the DAG (see toNetworkx and dexxy/common/plotting.py).
+    """
+
+    def __init__(self):
+        self.index: Dict[int, int] = {}
+        self.tids: List[int] = []
+        self.nodeTasks: List[Task] = []
+        self.children: List[List[int]] = []
+        self.parents: List[List[int]] = []
+        self.pids: List[List[int]] = []
+        self.properties: Dict[int, Dict] = {}
+
+    def addNode(self, tid: int, task: Task = None) -> int:
+        """
+        Adds a node (or sets the Task of a node that was only created by an edge).
+
+        Args:
+            tid (int): The Task's unique ID.
+            task (Task, optional): The Task. Defaults to None.
+
+        Returns:
+            int: The number of the node.
+        """
+        node = self.index.get(tid)
+        if node is None:
+            node = len(self.tids)
+            self.index[tid] = node
+            self.tids.append(tid)
+            self.nodeTasks.append(task)
+            self.children.append([])
+            self.parents.append([])
+            self.pids.append([])
+        elif task is not None:
+            self.nodeTasks[node] = task
+        return node
+
+    def addNodes(self, tids: List[int], tasks: List[Task]) -> None:
+        """
+        Adds many new nodes at once, e.g. when loading a plan. The tids must not be in the DAG yet.
+
+        Args:
+            tids (List[int]): The tids of the new nodes.
+            tasks (List[Task]): Their Tasks (or None), in the same order.
+        """
+        start = len(self.tids)
+        self.index.update(zip(tids, range(start, start + len(tids))))
+        self.tids.extend(tids)
+        self.nodeTasks.extend(tasks)
+        self.children.extend([] for _ in tids)
+        self.parents.extend([] for _ in tids)
+        self.pids.extend([] for _ in tids)
+
+    def addEdge(self, tidFrom: int, tidTo: int, pid: int = None) -> bool:
+        """
+        Adds an edge, creating either node if needed.
+
+        Args:
+            tidFrom (int): The tid of the dependency.
+            tidTo (int): The tid of the Task that depends on it.
+            pid (int, optional): The Pipeline that added the edge. Defaults to None.
+
+        Returns:
+            bool: False if the edge was already there.
+        """
+        source, target = self.addNode(tidFrom), self.addNode(tidTo)
+        # Tasks depend on a handful of others, so the parents list is the short side to search
+        if source in self.parents[target]:
+            return False
+        self.children[source].append(target)
+        self.pids[source].append(pid)
+        self.parents[target].append(source)
+        return True
+
+    def hasEdge(self, tidFrom: int, tidTo: int) -> bool:
+        source, target = self.index.get(tidFrom), self.index.get(tidTo)
+        return source is not None and target is not None and source in self.parents[target]
+
+    def task(self, tid: int) -> Task:
+        """
+        Returns:
+            Task: The Task of a node, or None if the node only exists as the end of an edge.
+        """
+        return self.nodeTasks[self.index[tid]]
+
+    def tasks(self) -> List[Task]:
+        """
+        Returns:
+            List[Task]: Every Task in the order its node was added.
+        """
+        return [task for task in self.nodeTasks if task is not None]
+
+    def successors(self, tid: int) -> Iterator[int]:
+        return (self.tids[child] for child in self.children[self.index[tid]])
+
+    def predecessors(self, tid: int) -> Iterator[int]:
+        return (self.tids[parent] for parent in self.parents[self.index[tid]])
+
+    def outDegree(self, tid: int) -> int:
+        return len(self.children[self.index[tid]])
+
+    def edges(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Returns:
+            Iterator[Tuple[int, int, int]]: (tidFrom, tidTo, pid) for every edge.
+        """
+        for source, children in enumerate(self.children):
+            for target, pid in zip(children, self.pids[source]):
+                yield self.tids[source], self.tids[target], pid
+
+    def numberOfEdges(self) -> int:
+        return sum(len(children) for children in self.children)
+
+    def closure(self, tids: List[int], direction: str = 'upstream') -> Set[int]:
+        """
+        Finds every node reachable from the given nodes, walking edges backwards ('upstream', the dependencies) or forwards ('downstream', the dependents).
+
+        Args:
+            tids (List[int]): The nodes to start from. They are part of the result.
+            direction (str, optional): 'upstream' or 'downstream'. Defaults to 'upstream'.
+
+        Returns:
+            Set[int]: The tids of the closure.
+        """
+        neighbours = self.parents if direction == 'upstream' else self.children
+        seen = set(self.index[tid] for tid in tids)
+        pending = list(seen)
+        while pending:
+            for node in neighbours[pending.pop()]:
+                if node not in seen:
+                    seen.add(node)
+                    pending.append(node)
+        return set(self.tids[node] for node in seen)
+
+    def topologicalOrder(self) -> List[int]:
+        """
+        Orders the nodes so every node comes after all of its dependencies (Kahn's algorithm). Nodes that are ready at the same time keep the
+        order they were added in.
+
+        Returns:
+            List[int]: The tids in topological order.
+        """
+        indegree = [len(parents) for parents in self.parents]
+        order = [node for node, degree in enumerate(indegree) if degree == 0]
+        for node in order:
+            for child in self.children[node]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    order.append(child)
+        return [self.tids[node] for node in order]
+
+    def toNetworkx(self) -> Any:
+        """
+        Builds the equivalent networkx MultiDiGraph (the format DAGs used to be stored in), e.g. for plotting.
+
+        Returns:
+            MultiDiGraph: Nodes keyed by tid with 'id', 'tasks' and 'properties' attributes, and one edge per dependency keyed by the dependent Task's tid.
+        """
+        from networkx import MultiDiGraph
+
+        G = MultiDiGraph()
+        for node, tid in enumerate(self.tids):
+            task = self.nodeTasks[node]
+            G.add_node(tid, id=tid, tasks={tid: task} if task is not None else None, properties=self.properties.get(node))
+        for tidFrom, tidTo, pid in self.edges():
+            G.add_edge(tidFrom, tidTo, tidTo, pid=pid, tid_from=tidFrom, tid_to=tidTo)
+        return G
+
+    @classmethod
+    def fromNetworkx(cls, G: Any) -> "DAG":
+        """
+        Converts a networkx DAG, e.g. one saved with saveDAG before Pipelines used this class.
+
+        Args:
+            G (MultiDiGraph): A graph with a 'tasks' dict on every node.
+
+        Returns:
+            DAG: The same nodes, Tasks and edges.
+        """
+        dag = cls()
+        for tid, attrs in G.nodes(data=True):
+            tasks = attrs.get('tasks') or {}
+            node = dag.addNode(tid, next(iter(tasks.values()), None))
+            if attrs.get('properties') is not None:
+                dag.properties[node] = attrs['properties']
+        for tidFrom, tidTo, attrs in G.edges(data=True):
+            dag.addEdge(tidFrom, tidTo, attrs.get('pid'))
+        return dag
+
+    def __contains__(self, tid: int) -> bool:
+        return tid in self.index
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.tids)
+
+    def __len__(self) -> int:
+        return len(self.tids)
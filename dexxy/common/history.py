@@ -0,0 +1,51 @@
+import json
+import os
+from typing import Dict, List, TypeVar
+
+Task = TypeVar('Task')
+
+class DurationHistory(object):
+    """
+    Remembers how long each Task took on previous runs so the critical_path scheduling policy can estimate the cost of the DAG.
+    Durations are kept per Task name in a small JSON file, smoothed with an exponential moving average.
+    """
+
+    def __init__(self, path: str = None, smoothing: float = 0.5):
+        """
+        Args:
+            path (str, optional): The JSON file to read and write durations to. Defaults to None (keep the history in memory only).
+            smoothing (float, optional): Weight of the newest run in the moving average. Defaults to 0.5.
+        """
+        self.path = path
+        self.smoothing = smoothing
+        self.durations: Dict[str, float] = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.durations = json.load(f)
+
+    def record(self, tasks: List[Task]) -> None:
+        """
+        Folds the durations of a run's Tasks into the history.
+
+        Args:
+            tasks (List[Task]): The Tasks that ran.
+        """
+        for task in tasks:
+            duration = task.duration
+            if task.name is None or duration is None:
+                continue
+            previous = self.durations.get(task.name)
+            if previous is None:
+                self.durations[task.name] = duration
+            else:
+                self.durations[task.name] = self.smoothing * duration + (1 - self.smoothing) * previous
+
+    def save(self) -> None:
+        """
+        Writes the history back to its JSON file.
+        """
+        if self.path is None:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.durations, f, indent=2, sort_keys=True)
@@ -1,16 +1,244 @@
+import atexit
 import logging
+import os
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from queue import SimpleQueue
+from threading import Event, Lock, Thread, current_thread
+from typing import Dict, Iterator, TextIO
+
+FORMAT = '%(asctime)s :: %(name)s :: %(levelname)s :: %(message)s'
+
+# The run and Task a log line belongs to. Workers set these around every Task they execute, and they are copied onto each record.
+runContext: ContextVar = ContextVar('runID', default=None)
+taskContext: ContextVar = ContextVar('taskID', default=None)
+
+_lock = Lock()
+_loggers: Dict[str, logging.Logger] = {}
+_handler = None
+_stream = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the current run and Task IDs onto every record as record.runID and record.taskID. Runs on the thread that logged the record.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.runID = runContext.get()
+        record.taskID = taskContext.get()
+        return True
+
+
+class ContextFormatter(logging.Formatter):
+    """
+    The usual one line format, followed by the run and Task IDs when the record has them:
+        2022-12-02 19:03:00,764 :: Worker :: INFO :: Running Tasks tearDown on Worker 1 :: run=0b6c... task=41
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super(ContextFormatter, self).format(record)
+        context = ' '.join('%s=%s' % (key, value) for key, value in (('run', getattr(record, 'runID', None)), ('task', getattr(record, 'taskID', None)))
+                           if value is not None)
+        return '%s :: %s' % (line, context) if context else line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the time, logger, level, message, runID and taskID as fields, for log shippers.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        import json
+
+        fields = {
+            'time': record.created,
+            'logger': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'runID': getattr(record, 'runID', None),
+            'taskID': getattr(record, 'taskID', None),
+        }
+        if record.exc_info:
+            fields['error'] = self.formatException(record.exc_info)
+        return json.dumps(fields, default=str)
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Hands records to a background thread, which passes them on to `target`. The thread that logged only merges the message with its
+    arguments (they may change once it moves on). The layout, traceback and the write itself happen on the background thread, so a slow
+    terminal or a full pipe never holds up a Worker.
+    logging.handlers.QueueHandler does the same, but importing logging.handlers pulls in socket and pickle at startup.
+    """
+
+    def __init__(self, target: logging.Handler):
+        super(QueuedHandler, self).__init__()
+        self.target = target
+        self.queue = SimpleQueue()
+        self.thread = Thread(target=self.drain, name='dexxy-logging', daemon=True)
+        self.thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            record.msg, record.args = record.getMessage(), None
+            self.queue.put(record)
+        except Exception:
+            self.handleError(record)
+
+    def drain(self) -> None:
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            if isinstance(record, Event):
+                # A flush() waiting for the records queued before it
+                self.target.flush()
+                record.set()
+                continue
+            self.target.handle(record)
+
+    def flush(self) -> None:
+        # Waits until everything queued so far has been written, so output printed next doesn't land in the middle of it
+        if not self.thread.is_alive() or current_thread() is self.thread:
+            return
+        written = Event()
+        self.queue.put(written)
+        written.wait()
+
+    def close(self) -> None:
+        # Write out everything already queued before the thread stops
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+            self.target.flush()
+        super(QueuedHandler, self).close()
+
+
+def configureLogging(level: str = 'INFO', stream: TextIO = None, structured: bool = False, queued: bool = True, force: bool = False) -> None:
+    """
+    Sets up logging for dexxy once per process. Records are put on a queue and written by a background thread, so logging a line costs the
+    Task or Worker only creating the record. Messages below `level` are dropped before a record is created.
+
+    Like logging.basicConfig, nothing is installed if the application already configured the root logger (unless force=True).
+    Calling it again after the first time does nothing (unless force=True).
+
+    Args:
+        level (str, optional): The lowest level written. Defaults to 'INFO'.
+        stream (TextIO, optional): Where to write. Defaults to None (sys.stdout).
+        structured (bool, optional): Write one JSON object per line instead of text. Defaults to False.
+        queued (bool, optional): Write from a background thread. Set to False to write synchronously, e.g. while debugging a crash. Defaults to True.
+        force (bool, optional): Replace the handlers installed earlier. Defaults to False.
+    """
+    global _handler, _stream
+
+    with _lock:
+        root = logging.getLogger()
+        if _handler is not None and not force:
+            return
+        if _handler is None and root.handlers and not force:
+            # The application configured logging itself. Mark dexxy as configured so this isn't checked again.
+            _handler = root.handlers[0]
+            return
+
+        stopLogging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        _stream = logging.StreamHandler(stream or sys.stdout)
+        _stream.setFormatter(JsonFormatter() if structured else ContextFormatter(FORMAT))
+        _handler = QueuedHandler(_stream) if queued else _stream
+        root.addHandler(_handler)
+        root.setLevel(level)
+
+
+def flushLogging() -> None:
+    """
+    Writes out every record logged so far before returning, e.g. at the end of Pipeline.run() so a script's own print() or input() prompts
+    come after the run's log lines rather than in between them.
+    """
+    if isinstance(_handler, QueuedHandler):
+        _handler.flush()
+
+
+def stopLogging() -> None:
+    """
+    Writes out every queued record and stops the background thread. Runs at exit.
+    """
+    if isinstance(_handler, QueuedHandler):
+        _handler.close()
+
+
+def afterFork() -> None:
+    # The background thread doesn't exist in a forked child (e.g. a process pool worker), so write directly there instead of onto a queue nobody reads
+    global _handler
+    if not isinstance(_handler, QueuedHandler):
+        return
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    root.addHandler(_stream)
+    _handler = _stream
+
+
+atexit.register(stopLogging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=afterFork)
+
+
+def getLogger(name: str) -> logging.Logger:
+    """
+    Returns the logger for a class, configuring logging the first time any logger is asked for.
+
+    Args:
+        name (str): The logger's name, e.g. 'Worker'.
+
+    Returns:
+        logging.Logger: A logger whose records carry the run and Task IDs.
+    """
+    logger = _loggers.get(name)
+    if logger is None:
+        configureLogging()
+        logger = logging.getLogger(name)
+        logger.addFilter(ContextFilter())
+        _loggers[name] = logger
+    return logger
+
+
+@contextmanager
+def logContext(runID: str = None, taskID: str = None) -> Iterator[None]:
+    """
+    Tags every record logged inside the block (on this thread or task) with the given run and Task IDs, e.g.
+        with logContext(runID=self.runID, taskID=task.tid):
+            task.run(inputs)
+
+    Args:
+        runID (str, optional): The run's ID. Defaults to None (keep the current one).
+        taskID (str, optional): The Task's ID. Defaults to None (keep the current one).
+    """
+    runToken = runContext.set(runID) if runID is not None else None
+    taskToken = taskContext.set(taskID) if taskID is not None else None
+    try:
+        yield
+    finally:
+        if taskToken is not None:
+            taskContext.reset(taskToken)
+        if runToken is not None:
+            runContext.reset(runToken)
+
 
 class LoggingStuff(object):
     """
-    The purpsose of this class is to log messagges so we can monitor the progress during runtime. 
-    
+    The purpsose of this class is to log messagges so we can monitor the progress during runtime.
+
     Example of runtime output:
-        2022-12-02 19:03:00,764 :: Worker :: INFO :: Running Tasks tearDown on Worker 1 
+        2022-12-02 19:03:00,764 :: Worker :: INFO :: Running Tasks tearDown on Worker 1 :: run=0b6c... task=41
+
+    Logging is configured once (see configureLogging) and every class shares one logger per class name. Pass the values as arguments
+    (self._log.info('Running Tasks %s', name)) rather than formatting the message first, so disabled levels cost next to nothing.
     """
+    __slots__ = ()
+
     @property
-    def logger(self, level: str = 'INFO', **kwargs):
-        logging.basicConfig(stream=sys.stdout, level=level, format='%(asctime)s :: %(name)s :: %(levelname)s :: %(message)s', **kwargs)
-        name = self.__class__.__name__ 
-        
-        return logging.getLogger(name)
\ No newline at end of file
+    def logger(self) -> logging.Logger:
+        return getLogger(self.__class__.__name__)
@@ -0,0 +1,81 @@
+from datetime import date, datetime
+from typing import Any, List, Tuple, Union
+from dexxy.common.utils import isDataFrame
+
+# Helpers for mapped Tasks (Task(partitions=..., reduce=...)): splitting a key range or a date range into partitions, and the default reduce.
+# pandas is only imported when there are DataFrames to combine.
+
+
+def concatResults(*results: Any) -> Any:
+    """
+    The default reduce of a mapped Task. Children that returned nothing are left out.
+
+    Args:
+        results (Any): The children's results, in partition order.
+
+    Returns:
+        Any: One DataFrame if every result is a DataFrame (concatenated in partition order with a fresh index), None if there are no results,
+            otherwise a list of the results.
+    """
+    results = [result for result in results if result is not None]
+    if not results:
+        return None
+    if all(isDataFrame(result) for result in results):
+        import pandas as pd
+
+        return pd.concat(results, ignore_index=True)
+    return list(results)
+
+
+def rangePartitions(low: int, high: int, parts: int = None, size: int = None) -> List[Tuple[int, int]]:
+    """
+    Splits the keys from low to high (both included) into half-open ranges, e.g. rangePartitions(1, 16044, parts=4) ->
+    [(1, 4012), (4012, 8023), (8023, 12034), (12034, 16045)].
+
+    Args:
+        low (int): The smallest key, e.g. SELECT min(rental_id).
+        high (int): The largest key.
+        parts (int, optional): How many ranges to make. Defaults to None.
+        size (int, optional): How many keys each range covers. Used when parts isn't given. Defaults to None.
+
+    Raises:
+        ValueError: If neither parts nor size is given.
+
+    Returns:
+        List[Tuple[int, int]]: (start, stop) pairs covering every key exactly once. Empty if there are no keys.
+    """
+    if low is None or high is None or high < low:
+        return []
+    if parts is None and size is None:
+        raise ValueError('Give rangePartitions the number of parts or the size of each part')
+
+    count = high - low + 1
+    if parts is None:
+        parts = -(-count // size)
+    parts = max(1, min(parts, count))
+    bounds = [low + count * part // parts for part in range(parts)] + [high + 1]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def monthPartitions(start: Union[date, datetime], end: Union[date, datetime]) -> List[Tuple[date, date]]:
+    """
+    Splits the dates from start to end (both included) into calendar months, e.g. monthPartitions(date(2005, 5, 24), date(2005, 7, 2)) ->
+    [(2005-05-01, 2005-06-01), (2005-06-01, 2005-07-01), (2005-07-01, 2005-08-01)].
+
+    Args:
+        start (Union[date, datetime]): The earliest date, e.g. SELECT min(rental_date).
+        end (Union[date, datetime]): The latest date.
+
+    Returns:
+        List[Tuple[date, date]]: Half-open (first day of the month, first day of the next month) pairs. Empty if there are no dates.
+    """
+    if start is None or end is None or end < start:
+        return []
+
+    months = []
+    month = date(start.year, start.month, 1)
+    while month <= date(end.year, end.month, 1):
+        following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        months.append((month, following))
+        month = following
+    return months
@@ -0,0 +1,495 @@
+import argparse
+import gc
+import hashlib
+import importlib
+import json
+import mmap
+import os
+import platform
+import struct
+import sys
+from array import array
+from sys import intern
+from time import time
+from typing import Any, Callable, Dict, List, Tuple
+from dexxy.common.cache import fingerprint
+from dexxy.common.exceptions import PlanError
+from dexxy.common.graphs import DAG
+from dexxy.common.tasks import Task
+from dexxy.common.utils import reserveTaskIDs
+
+PLAN_MAGIC = b'DEXXYDAG'
+PLAN_VERSION = 1
+
+# magic, format version, header length
+PREFIX = struct.Struct('<8sII')
+
+# The settings of a Task that are saved, each as a column of the nodes section
+TASK_SETTINGS = ('name', 'executor', 'keepResult', 'cacheable', 'retries', 'retryDelay', 'timeout', 'resources', 'stream', 'version')
+TASK_DEFAULTS = (None, None, False, True, 0, 1.0, None, None, False, None)
+# Settings that hold functions (of mapped Tasks). They are saved in the functions section like func, and the node column holds their number.
+TASK_FUNCTIONS = ('partitions', 'reduce')
+
+
+def functionName(func: Callable) -> str:
+    """
+    Returns:
+        str: 'module:qualname', e.g. 'main:readData', or the type of callables that have no name.
+    """
+    module = getattr(func, '__module__', None) or type(func).__module__
+    return '%s:%s' % (module, getattr(func, '__qualname__', type(func).__qualname__))
+
+
+def resolveFunction(name: str, modules: Dict[str, str] = None) -> Callable:
+    """
+    Finds the function a plan refers to in the current code.
+
+    Args:
+        name (str): 'module:qualname' as returned by functionName.
+        modules (Dict[str, str], optional): Modules to look in instead, e.g. {'__main__': 'main'} for functions saved by running main.py. Defaults to None.
+
+    Raises:
+        LookupError: If the module can't be imported or no longer has the function.
+
+    Returns:
+        Callable: The function.
+    """
+    module, qualname = name.split(':', 1)
+    module = (modules or {}).get(module, module)
+    try:
+        obj = importlib.import_module(module)
+    except Exception as error:
+        raise LookupError('module %s could not be imported (%s)' % (module, error))
+    for part in qualname.split('.'):
+        if not hasattr(obj, part):
+            raise LookupError('%s no longer exists' % name)
+        obj = getattr(obj, part)
+    return obj
+
+
+def savePlan(dag: DAG, filename: str) -> Dict:
+    """
+    Compiles a DAG into a plan file. Layout:
+        magic, format version and header length (16 bytes)
+        header      JSON: format version, content hash, counts, and where each section starts
+        topology    arrays of edges -- source and target nodes (uint32), the Pipeline that added each edge (int64, -1 for none) -- then each
+                    Task's dependsOn as a count per node (int32, -1 for None) followed by the node numbers (uint32)
+        nodes       JSON: one column per field -- tid, function number, kwargs blob, the Task's settings and the numbers of its partitions and
+                    reduce functions. Columns of plain values parse much faster than one record per node.
+        functions   JSON: one record per distinct function -- name, code fingerprint and blob
+        blobs       cloudpickled functions, kwargs and node properties, one after the other
+
+    Each function is pickled once no matter how many Tasks use it. Run state (status, results, timings, loggers) is never saved.
+    The content hash covers everything after the header, so a truncated or edited plan is rejected when opened.
+
+    Args:
+        dag (DAG): A composed DAG.
+        filename (str): Where to write the plan. The file is replaced atomically.
+
+    Raises:
+        PlanError: If a Task depends on a Task that isn't in the DAG.
+
+    Returns:
+        Dict: The header.
+    """
+    import cloudpickle
+
+    blobs = bytearray()
+
+    def addBlob(obj: Any) -> List[int]:
+        data = cloudpickle.dumps(obj)
+        blobs.extend(data)
+        return [len(blobs) - len(data), len(data)]
+
+    functionIndex: Dict[int, int] = {}
+    functions = []
+
+    def addFunction(func: Callable) -> int:
+        if func is None:
+            return None
+        if id(func) not in functionIndex:
+            functionIndex[id(func)] = len(functions)
+            functions.append({'name': functionName(func), 'fingerprint': fingerprint(func), 'blob': addBlob(func)})
+        return functionIndex[id(func)]
+
+    nodes = {column: [] for column in ('tid', 'function', 'kwargs') + TASK_SETTINGS + TASK_FUNCTIONS}
+    dependsCount, dependsOn = array('i'), array('I')
+    for node, tid in enumerate(dag.tids):
+        task = dag.nodeTasks[node]
+        nodes['tid'].append(tid)
+        if task is None:
+            for column, values in nodes.items():
+                if column != 'tid':
+                    values.append(None)
+            dependsCount.append(-1)
+            continue
+
+        nodes['function'].append(addFunction(task.func))
+        # Only the offset is kept: unpickling stops at the end of the object, whatever follows it
+        nodes['kwargs'].append(addBlob(task.kwargs)[0] if task.kwargs else None)
+        for setting, default in zip(TASK_SETTINGS, TASK_DEFAULTS):
+            nodes[setting].append(getattr(task, setting, default))
+        for setting in TASK_FUNCTIONS:
+            nodes[setting].append(addFunction(getattr(task, setting, None)))
+
+        if task.dependsOn is None:
+            dependsCount.append(-1)
+            continue
+        try:
+            dependsOn.extend(dag.index[dep.tid] for dep in task.dependsOn)
+        except (AttributeError, KeyError):
+            raise PlanError('%s depends on a Task that is not in the DAG. Compose the Pipeline before saving it.' % task.name)
+        dependsCount.append(len(task.dependsOn))
+
+    sources, targets, pids = array('I'), array('I'), array('q')
+    for source, children in enumerate(dag.children):
+        for target, pid in zip(children, dag.pids[source]):
+            sources.append(source)
+            targets.append(target)
+            pids.append(-1 if pid is None else pid)
+
+    sections = {
+        'topology': b''.join(values.tobytes() for values in (sources, targets, pids, dependsCount, dependsOn)),
+        'nodes': json.dumps(nodes, separators=(',', ':')).encode(),
+        'functions': json.dumps(functions, separators=(',', ':')).encode(),
+    }
+    properties = addBlob({dag.tids[node]: value for node, value in dag.properties.items()}) if dag.properties else None
+    sections['blobs'] = bytes(blobs)
+
+    digest = hashlib.sha256()
+    offsets = {}
+    offset = 0
+    for name, data in sections.items():
+        digest.update(data)
+        offsets[name] = [offset, len(data)]
+        offset += len(data)
+
+    header = {
+        'version': PLAN_VERSION,
+        'contentHash': digest.hexdigest(),
+        'created': time(),
+        'python': platform.python_version(),
+        'byteorder': sys.byteorder,
+        'tasks': sum(task is not None for task in dag.nodeTasks),
+        'nodes': len(dag),
+        'edges': len(sources),
+        'dependsOn': len(dependsOn),
+        'functions': len(functions),
+        'properties': properties,
+        'sections': offsets,
+    }
+    headerBytes = json.dumps(header, separators=(',', ':')).encode()
+
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(PREFIX.pack(PLAN_MAGIC, PLAN_VERSION, len(headerBytes)))
+        f.write(headerBytes)
+        for data in sections.values():
+            f.write(data)
+    os.replace(temporary, filename)
+    return header
+
+
+def isPlan(filename: str) -> bool:
+    """
+    Returns:
+        bool: True if the file is a compiled plan, False for anything else (e.g. a DAG pickled by an older version).
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(PLAN_MAGIC)) == PLAN_MAGIC
+
+
+class Plan(object):
+    """
+    A compiled plan opened with mmap. The header, node records and function records can be listed and checked without unpickling a single
+    function; load() builds the runnable DAG.
+
+        with Plan('dags/dvd_rental') as plan:
+            plan.verify()
+            problems = plan.checkCode({'__main__': 'main'})
+            dag = plan.load()
+    """
+
+    def __init__(self, filename: str):
+        """
+        Args:
+            filename (str): A file written by savePlan.
+
+        Raises:
+            PlanError: If the file isn't a plan, or was written by a newer format version.
+        """
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < PREFIX.size:
+                raise PlanError('%s is not a compiled plan' % filename)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, headerLength = PREFIX.unpack_from(self._map, 0)
+        if magic != PLAN_MAGIC:
+            self.close()
+            raise PlanError('%s is not a compiled plan' % filename)
+        if version > PLAN_VERSION:
+            self.close()
+            raise PlanError('%s uses plan format %s, this version of dexxy reads up to %s' % (filename, version, PLAN_VERSION))
+
+        self.header: Dict = json.loads(self._map[PREFIX.size:PREFIX.size + headerLength])
+        self.bodyStart = PREFIX.size + headerLength
+        self._nodes = None
+        self._functions = None
+
+    def section(self, name: str) -> memoryview:
+        offset, length = self.header['sections'][name]
+        start = self.bodyStart + offset
+        return memoryview(self._map)[start:start + length]
+
+    def blob(self, offset: int, length: int = None) -> Any:
+        import cloudpickle
+
+        with self.section('blobs') as blobs:
+            return cloudpickle.loads(blobs[offset:None if length is None else offset + length])
+
+    def nodes(self) -> Dict[str, List]:
+        """
+        Returns:
+            Dict[str, List]: The node columns, e.g. {'tid': [...], 'function': [0, 1, 1, ...], 'name': [...]}. Nodes without a Task have None in every column but tid.
+        """
+        if self._nodes is None:
+            with self.section('nodes') as data:
+                self._nodes = json.loads(bytes(data))
+        return self._nodes
+
+    def functions(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: The function records, e.g. {'name': 'main:readData', 'fingerprint': '9f2c...', 'blob': [0, 2311]}
+        """
+        if self._functions is None:
+            with self.section('functions') as data:
+                self._functions = json.loads(bytes(data))
+        return self._functions
+
+    def topology(self) -> Tuple[array, array, array, array, array]:
+        """
+        Returns:
+            Tuple[array, array, array, array, array]: The source node, target node and Pipeline ID of every edge, then the dependsOn count of
+                every node (-1 for None) and the dependsOn node numbers of all nodes one after the other.
+        """
+        counts = [self.header['edges']] * 3 + [self.header['nodes'], self.header['dependsOn']]
+        arrays = (array('I'), array('I'), array('q'), array('i'), array('I'))
+        with self.section('topology') as data:
+            offset = 0
+            for values, count in zip(arrays, counts):
+                size = count * values.itemsize
+                values.frombytes(data[offset:offset + size])
+                offset += size
+        if self.header['byteorder'] != sys.byteorder:
+            for values in arrays:
+                values.byteswap()
+        return arrays
+
+    def verify(self) -> None:
+        """
+        Checks the content hash, i.e. that the file is complete and hasn't been edited since it was compiled. Reads the file but deserializes nothing.
+
+        Raises:
+            PlanError: If the hash doesn't match.
+        """
+        digest = hashlib.sha256()
+        with memoryview(self._map) as data:
+            digest.update(data[self.bodyStart:])
+        if digest.hexdigest() != self.header['contentHash']:
+            raise PlanError('%s is damaged: its content hash does not match its header' % self.filename)
+
+    def checkCode(self, modules: Dict[str, str] = None) -> List[str]:
+        """
+        Compares the functions in the plan to the current code by their fingerprints (a hash of their bytecode). Functions defined inside other
+        functions (lambdas, closures) can't be looked up and aren't checked.
+
+        Args:
+            modules (Dict[str, str], optional): Modules to look functions up in instead, e.g. {'__main__': 'main'} for plans saved by running main.py. Defaults to None.
+
+        Returns:
+            List[str]: A description of every function that changed or can't be found. Empty if the plan matches the code.
+        """
+        compiledWith = self.header['python'].rsplit('.', 1)[0]
+        if compiledWith != platform.python_version().rsplit('.', 1)[0]:
+            return ['compiled with Python %s, so its functions can not be compared with code running on Python %s' % (self.header['python'], platform.python_version())]
+
+        problems = []
+        for record in self.functions():
+            if '<' in record['name']:
+                continue
+            try:
+                current = resolveFunction(record['name'], modules)
+            except LookupError as error:
+                problems.append(str(error))
+                continue
+            if fingerprint(current) != record['fingerprint']:
+                problems.append('%s has changed since the plan was compiled' % record['name'])
+        return problems
+
+    def load(self) -> DAG:
+        """
+        Builds the DAG with fresh Tasks that keep the tids they were compiled with. Each function is unpickled once.
+
+        Returns:
+            DAG: The runnable DAG.
+        """
+        functions = [self.blob(*record['blob']) for record in self.functions()]
+        columns = self.nodes()
+
+        # Nothing created here can be garbage yet, so don't let the collector rescan the growing DAG every few thousand Tasks
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self.build(columns, functions)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def build(self, columns: Dict[str, List], functions: List[Callable]) -> DAG:
+        # Tasks are created without __init__ (which logs a line per Task) and start from the state of a freshly reset Task
+        blank = Task.__new__(Task)
+        blank.reset()
+        blank.dependsOn = None
+        blank._uuid = None
+        state = tuple(blank.__getstate__().items())
+
+        tasks = []
+        # Plans saved before a setting existed don't have its column
+        settings = [columns.get(setting) or [default] * len(columns['tid']) for setting, default in zip(TASK_SETTINGS, TASK_DEFAULTS)]
+        mappers = [columns.get(setting) or [None] * len(columns['tid']) for setting in TASK_FUNCTIONS]
+        for tid, function, kwargs, *values in zip(columns['tid'], columns['function'], columns['kwargs'], *settings, *mappers):
+            if function is None:
+                tasks.append(None)
+                continue
+            task = Task.__new__(Task)
+            for slot, value in state:
+                setattr(task, slot, value)
+            for setting, value in zip(TASK_SETTINGS, values):
+                setattr(task, setting, value)
+            for setting, number in zip(TASK_FUNCTIONS, values[len(TASK_SETTINGS):]):
+                setattr(task, setting, functions[number] if number is not None else None)
+            if type(task.name) is str:
+                task.name = intern(task.name)
+            task.tid = tid
+            task.func = functions[function]
+            task.kwargs = self.blob(kwargs) if kwargs is not None else {}
+            tasks.append(task)
+
+        # Tasks created in this process from now on must not reuse the loaded tids
+        reserveTaskIDs(max((tid for tid in columns['tid'] if type(tid) is int), default=0))
+
+        dag = DAG()
+        dag.addNodes(columns['tid'], tasks)
+
+        sources, targets, pids, dependsCount, dependsOn = self.topology()
+        start = 0
+        for task, count in zip(dag.nodeTasks, dependsCount):
+            if count == -1:
+                continue
+            task.dependsOn = [dag.nodeTasks[node] for node in dependsOn[start:start + count]]
+            start += count
+
+        for source, target, pid in zip(sources, targets, pids):
+            dag.children[source].append(target)
+            dag.pids[source].append(None if pid == -1 else pid)
+            dag.parents[target].append(source)
+
+        if self.header['properties'] is not None:
+            for tid, value in self.blob(*self.header['properties']).items():
+                dag.properties[dag.index[tid]] = value
+        return dag
+
+    def describe(self) -> List[Dict]:
+        """
+        Lists the Tasks in the plan without unpickling anything.
+
+        Returns:
+            List[Dict]: One entry per Task, e.g. {'name': 'readCustomer', 'tid': 3, 'function': 'main:readData', 'dependsOn': ['openPool'], 'executor': None,
+                'partitions': None}
+        """
+        columns = self.nodes()
+        functions = self.functions()
+        names = [name if name is not None else tid for tid, name in zip(columns['tid'], columns['name'])]
+        partitions = columns.get('partitions') or [None] * len(columns['tid'])
+        dependsCount, dependsOn = self.topology()[3:]
+
+        tasks = []
+        start = 0
+        for node, function in enumerate(columns['function']):
+            count = max(dependsCount[node], 0)
+            if function is not None:
+                tasks.append({
+                    'name': names[node],
+                    'tid': columns['tid'][node],
+                    'function': functions[function]['name'],
+                    'dependsOn': [names[dep] for dep in dependsOn[start:start + count]],
+                    'executor': columns['executor'][node],
+                    'partitions': functions[partitions[node]]['name'] if partitions[node] is not None else None,
+                })
+            start += count
+        return tasks
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "Plan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def openPlan(filename: str, validate: bool = False, modules: Dict[str, str] = None) -> DAG:
+    """
+    Verifies a plan and loads its DAG.
+
+    Args:
+        filename (str): A file written by savePlan.
+        validate (bool, optional): Also refuse plans whose functions no longer match the current code. Defaults to False.
+        modules (Dict[str, str], optional): See Plan.checkCode. Defaults to None.
+
+    Raises:
+        PlanError: If the plan is damaged or, with validate=True, out of date.
+
+    Returns:
+        DAG: The runnable DAG.
+    """
+    with Plan(filename) as plan:
+        plan.verify()
+        if validate:
+            problems = plan.checkCode(modules)
+            if problems:
+                raise PlanError('%s does not match the current code:\n    %s' % (filename, '\n    '.join(problems)))
+        return plan.load()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect a compiled dexxy plan without running it.')
+    parser.add_argument('command', choices=['list', 'validate'])
+    parser.add_argument('filename')
+    parser.add_argument('--main', default=None, help="The module to look up functions saved from __main__ in, e.g. 'main' for plans saved by running main.py")
+    args = parser.parse_args()
+
+    with Plan(args.filename) as plan:
+        header = plan.header
+        print('%s: plan format %s, %s Tasks, %s edges, %s functions, compiled with Python %s, hash %s' % (
+            args.filename, header['version'], header['tasks'], header['edges'], header['functions'], header['python'], header['contentHash'][:12]))
+
+        if args.command == 'list':
+            for task in plan.describe():
+                print('  %-30s %-40s <- %s' % (task['name'], task['function'], ', '.join(task['dependsOn']) or '-'))
+        else:
+            try:
+                plan.verify()
+            except PlanError as error:
+                print(error)
+                sys.exit(1)
+            # Running the module sets sys.path[0] to this file's folder, so look functions up from the working directory instead
+            sys.path.insert(0, os.getcwd())
+            problems = plan.checkCode({'__main__': args.main} if args.main else None)
+            for problem in problems:
+                print('  ' + problem)
+            print('%s does not match the current code' % args.filename if problems else 'The plan matches the current code')
+            sys.exit(1 if problems else 0)
@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import random
 import networkx as nx
+from dexxy.common.graphs import DAG
 
 def topological_pos(G):
     """Display in topological order, with simple offsetting for legibility"""
@@ -167,7 +168,9 @@ def my_draw_networkx_edge_labels(
 
 
 def plot_dag(G, node_attr: str = 'tasks', attr: str = 'name', path: str = None, savefig=True):
-    """Visualize the DAG using matplotlib"""
+    """Visualize the DAG (a Pipeline's DAG or a networkx graph) using matplotlib"""
+    if isinstance(G, DAG):
+        G = G.toNetworkx()
     G = nx.convert_node_labels_to_integers(G)
 
     pos = topological_pos(G)
@@ -0,0 +1,139 @@
+from dexxy.common.results import SpilledResult
+from dexxy.common.exceptions import TaskTimeoutError
+from dexxy.common.utils import isDataFrame
+from concurrent.futures import Executor, TimeoutError
+from typing import TYPE_CHECKING, Any, Callable
+
+# cloudpickle, pandas, pyarrow and the process pool machinery are only imported once a Task actually runs in another process
+if TYPE_CHECKING:
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+
+class ArrowFrame(object):
+    """
+    A pandas DataFrame packed into a single Arrow IPC stream buffer. Sending this between processes only copies one contiguous buffer of columns
+    instead of pickling the DataFrame block by block, and reading it back is a zero-copy Arrow read followed by to_pandas().
+    """
+
+    def __init__(self, df: 'pd.DataFrame'):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        self.buffer = sink.getvalue()
+
+    def toPandas(self) -> 'pd.DataFrame':
+        """
+        Rebuilds the DataFrame from the Arrow buffer.
+
+        Returns:
+            pd.DataFrame: The original DataFrame (including its index).
+        """
+        import pyarrow as pa
+
+        return pa.ipc.open_stream(self.buffer).read_all().to_pandas()
+
+
+def pack(obj: Any) -> Any:
+    """
+    Wraps a DataFrame in an ArrowFrame before it crosses a process boundary. Anything else (or a DataFrame Arrow can't represent) is returned as is and falls back to pickle.
+
+    Args:
+        obj (Any): A Task input or result.
+
+    Returns:
+        Any: An ArrowFrame or the original object.
+    """
+    if isDataFrame(obj):
+        import pyarrow as pa
+
+        try:
+            return ArrowFrame(obj)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return obj
+    return obj
+
+
+def unpack(obj: Any) -> Any:
+    """
+    Reverses pack(). Results that were spilled to disk travel as a SpilledResult handle and are memory-mapped here instead.
+
+    Args:
+        obj (Any): An ArrowFrame, SpilledResult or any other object.
+
+    Returns:
+        Any: The DataFrame held by an ArrowFrame or SpilledResult, otherwise the object itself.
+    """
+    if isinstance(obj, ArrowFrame):
+        return obj.toPandas()
+    if isinstance(obj, SpilledResult):
+        return obj.load()
+    return obj
+
+
+def callInProcess(payload: bytes, inputs: tuple) -> Any:
+    """
+    Runs inside the child process. Loads the Task's func and kwargs shipped with cloudpickle, calls it and packs the result for the trip back.
+
+    Args:
+        payload (bytes): cloudpickle.dumps((func, kwargs))
+        inputs (tuple): The packed positional inputs of the Task.
+
+    Returns:
+        Any: The packed result of func.
+    """
+    import cloudpickle
+
+    func, kwargs = cloudpickle.loads(payload)
+    result = func(*(unpack(data) for data in inputs), **kwargs)
+    return pack(result)
+
+
+def createProcessPool(processes: int) -> 'ProcessPoolExecutor':
+    """
+    Creates the pool used for Tasks that run with executor='process'. The 'spawn' start method is used because the pool is started from a Worker that already has threads running.
+
+    Args:
+        processes (int): The number of child processes.
+
+    Returns:
+        ProcessPoolExecutor: A process pool.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    return ProcessPoolExecutor(max_workers=processes, mp_context=get_context('spawn'))
+
+
+def runInProcess(pool: Executor, func: Callable, inputs: tuple, kwargs: dict, timeout: float = None) -> Any:
+    """
+    Runs func(*inputs, **kwargs) on a process pool and waits for the result. func is serialized with cloudpickle so functions defined in main.py or as lambdas can be shipped too.
+
+    Args:
+        pool (Executor): The process pool to run on.
+        func (Callable): The Task's function.
+        inputs (tuple): The positional inputs from upstream Tasks.
+        kwargs (dict): The Task's kwargs.
+        timeout (float, optional): Seconds to wait for the result. Defaults to None (wait forever).
+
+    Raises:
+        TaskTimeoutError: If func didn't finish within timeout. A call that already started keeps its child process busy until it returns,
+            and the error carries its future (error.pending).
+
+    Returns:
+        Any: The result of func.
+    """
+    import cloudpickle
+
+    payload = cloudpickle.dumps((func, kwargs))
+    future = pool.submit(callInProcess, payload, tuple(pack(data) for data in inputs))
+    try:
+        return unpack(future.result(timeout=timeout))
+    except TimeoutError:
+        error = TaskTimeoutError('%s did not finish within %.1f seconds' % (getattr(func, '__name__', func), timeout))
+        if not future.cancel():
+            error.pending = future
+        raise error from None
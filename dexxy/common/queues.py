@@ -1,27 +1,258 @@
 from queue import Queue as ThreadSafeQueue
+from heapq import heappush, heappop
+from itertools import count
+from statistics import mean
+from typing import Callable, Dict, List, Literal, Tuple, TypeVar, Union
+
+Task = TypeVar('Task')
+AsyncQueue = TypeVar('AsyncQueue')
+Broker = TypeVar('Broker')
+
+
+class FifoPolicy(object):
+    """
+    Starts ready Tasks in the order they became ready.
+    """
+
+    def prepare(self, tasks: List[Task], dependents: Dict[int, List[Task]]) -> None:
+        pass
+
+    def priority(self, task: Task) -> float:
+        return 0
+
+    def adopt(self, children: List[Task], parent: Task) -> None:
+        pass
+
+
+class CriticalPathPolicy(object):
+    """
+    Starts the ready Task with the longest remaining path to the end of the DAG first. The length of a path is the sum of the recorded durations
+    of its Tasks, so a long extract feeding the fact build starts before small lookups that nothing slow is waiting on.
+    """
+
+    def __init__(self, durations: Dict[str, float] = None):
+        """
+        Args:
+            durations (Dict[str, float], optional): Seconds each Task took on earlier runs, by Task name. Tasks without a recorded duration
+                count as the average recorded duration (or 1 second if there is no history at all). Defaults to None.
+        """
+        self.durations = durations or {}
+        self.default = mean(self.durations.values()) if self.durations else 1.0
+        self.remaining = {}
+
+    def prepare(self, tasks: List[Task], dependents: Dict[int, List[Task]]) -> None:
+        """
+        Computes the longest remaining path of every Task.
+
+        Args:
+            tasks (List[Task]): Every Task in the run, in topological order.
+            dependents (Dict[int, List[Task]]): The Tasks waiting on each Task by tid.
+        """
+        self.remaining = {}
+        for task in reversed(tasks):
+            tail = max((self.remaining[child.tid] for child in dependents[task.tid]), default=0.0)
+            self.remaining[task.tid] = self.durations.get(task.name, self.default) + tail
+
+    def priority(self, task: Task) -> float:
+        return -self.remaining.get(task.tid, 0.0)
+
+    def adopt(self, children: List[Task], parent: Task) -> None:
+        """
+        Gives the children of a mapped Task the remaining path of the Task they were expanded from.
+        """
+        for child in children:
+            self.remaining[child.tid] = self.remaining.get(parent.tid, 0.0)
+
+
+class ReadyQueue(object):
+    """
+    A priority queue of the Tasks that are ready to run. Tasks come out in order of policy.priority() (lowest first) and then in the order they became ready.
+    """
+
+    def __init__(self, policy: Union[FifoPolicy, CriticalPathPolicy]):
+        self.policy = policy
+        self._heap = []
+        self._order = count()
+
+    def push(self, task: Task) -> None:
+        heappush(self._heap, (self.policy.priority(task), next(self._order), task))
+
+    def pop(self, fits: Callable[[Task], bool] = None) -> Task:
+        """
+        Args:
+            fits (Callable[[Task], bool], optional): Skip Tasks this returns False for, e.g. because their resources are in use. They keep their
+                place in the queue. Defaults to None (take the first Task).
+
+        Returns:
+            Task: The first Task in policy order that fits, or None if none do.
+        """
+        if fits is None:
+            return heappop(self._heap)[-1]
+
+        blocked = []
+        try:
+            while self._heap:
+                entry = heappop(self._heap)
+                if fits(entry[-1]):
+                    return entry[-1]
+                blocked.append(entry)
+            return None
+        finally:
+            for entry in blocked:
+                heappush(self._heap, entry)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class ResourcePool(object):
+    """
+    Tracks how much of each pool (database connections, memory, ...) the running Tasks hold. A Task declares what it needs with
+    Task(resources={'db': 1, 'mem_gb': 4}) and only starts once every pool it names has that much free. Pools without a capacity are unlimited.
+    """
+
+    def __init__(self, capacities: Dict[str, float] = None):
+        """
+        Args:
+            capacities (Dict[str, float], optional): The size of each pool, e.g. {'db': 4, 'mem_gb': 16}. Defaults to None (no limits).
+        """
+        self.capacities = dict(capacities or {})
+        for name, capacity in self.capacities.items():
+            if capacity < 0:
+                raise ValueError('The capacity of resource %s must not be negative. Got %s' % (name, capacity))
+        self.used = {name: 0 for name in self.capacities}
+        self.peak = dict(self.used)
+
+    def demands(self, *tasks: Task) -> Dict[str, float]:
+        # Tasks that start together (a stream group) need the sum of what each of them needs
+        total = {}
+        for task in tasks:
+            for name, amount in (task.resources or {}).items():
+                if name in self.capacities:
+                    total[name] = total.get(name, 0) + amount
+        return total
+
+    def check(self, *tasks: Task) -> str:
+        """
+        Returns:
+            str: Why the Tasks can never start (together they need more than a pool holds), or None if they can.
+        """
+        for name, amount in self.demands(*tasks).items():
+            if amount > self.capacities[name]:
+                return 'Tasks %s needs %s of resource %s but the pool only holds %s' % (', '.join(str(task.name) for task in tasks), amount, name,
+                                                                                        self.capacities[name])
+        return None
+
+    def fits(self, *tasks: Task) -> bool:
+        return all(self.used[name] + amount <= self.capacities[name] for name, amount in self.demands(*tasks).items())
+
+    def acquire(self, *tasks: Task) -> None:
+        for name, amount in self.demands(*tasks).items():
+            self.used[name] += amount
+            self.peak[name] = max(self.peak[name], self.used[name])
+
+    def release(self, *tasks: Task) -> None:
+        for name, amount in self.demands(*tasks).items():
+            self.used[name] -= amount
+
+    def __bool__(self) -> bool:
+        return bool(self.capacities)
+
 
 class QueueWarehouse:
-    @staticmethod 
-    
-    # @staticmethod is a built-in decorator that defines a static method in the class in Python. 
+    @staticmethod
+
+    # @staticmethod is a built-in decorator that defines a static method in the class in Python.
     # A static method doesn't receive any reference argument whether it is called by an instance of a class or by the class itself.
-    
-    def warehouse(type: str ='default') -> ThreadSafeQueue:
+
+    def warehouse(type: Literal['default', 'asyncio'] = 'default') -> Union[ThreadSafeQueue, AsyncQueue]:
         """
-        A "Queue Warehouse" that returns a queue which can be used to track the order of operation of Tasks/Pipelines/Workflows. 
-        
-        If no type is input then the default 'ThreadSafeQueue' type will be selected. 
-        
-        Later additional Queue types could be added to as an elif. 
-            Example. (would require import -- 'from asyncio import Queue as AsyncQueue')
-                elif type == 'asyncio':
-                    return AsyncQueue()  
+        A "Queue Warehouse" that returns a queue which can be used to track the order of operation of Tasks/Pipelines/Workflows.
+
+        If no type is input then the default 'ThreadSafeQueue' type will be selected.
+
+        Available types:
+            default -- A ThreadSafeQueue used by the thread pool Worker.
+            asyncio -- An AsyncQueue used by the AsyncWorker when a Pipeline runs on an event loop.
+
+        Both types share put_nowait/get_nowait/empty/task_done, which is all the Pipeline and Workers use.
 
         Args:
-            type (str, optional): Defaults to 'default'. 
+            type (Literal[default, asyncio], optional): Defaults to 'default'.
 
         Returns:
-            ThreadSafeQueue: A queue that can be used for storing the order of operation of Tasks/Pipelines/etc. 
+            Union[ThreadSafeQueue, AsyncQueue]: A queue that can be used for storing the order of operation of Tasks/Pipelines/etc.
         """
-        
+
+        if type == 'asyncio':
+            from asyncio import Queue as AsyncQueue
+            return AsyncQueue()
+
         return ThreadSafeQueue()
+
+    @staticmethod
+    def policy(type: Literal['fifo', 'critical_path'] = 'fifo', durations: Dict[str, float] = None) -> Union[FifoPolicy, CriticalPathPolicy]:
+        """
+        Returns the scheduling policy a Worker uses to pick the next ready Task.
+
+        Available types:
+            fifo -- Ready Tasks start in the order they became ready.
+            critical_path -- The ready Task with the longest remaining path (by recorded durations) starts first.
+
+        Args:
+            type (Literal[fifo, critical_path], optional): Defaults to 'fifo'.
+            durations (Dict[str, float], optional): Recorded seconds per Task name, used by critical_path. Defaults to None.
+
+        Returns:
+            Union[FifoPolicy, CriticalPathPolicy]: A scheduling policy.
+        """
+
+        if type == 'critical_path':
+            return CriticalPathPolicy(durations)
+
+        return FifoPolicy()
+
+    @staticmethod
+    def ready(policy: Union[FifoPolicy, CriticalPathPolicy]) -> ReadyQueue:
+        """
+        Returns the priority queue that holds ready Tasks for a Worker.
+
+        Args:
+            policy (Union[FifoPolicy, CriticalPathPolicy]): The scheduling policy that orders the queue.
+
+        Returns:
+            ReadyQueue: An empty ready queue.
+        """
+        return ReadyQueue(policy)
+
+    @staticmethod
+    def broker(type: Literal['sqlite', 'socket'] = 'sqlite', path: str = 'runs/broker.db', address: Tuple[str, int] = ('127.0.0.1', 5050), authkey: bytes = None,
+               lease: float = 60.0) -> Broker:
+        """
+        Returns the broker that hands Tasks to BrokerWorker processes when a Pipeline runs with broker=. Tasks that would run with executor='process'
+        are put on the broker instead of the local process pool, and the workers publish the results back.
+
+        Available types:
+            sqlite -- A job table in a SQLite file. Workers on this host (or hosts sharing the file) run `python -m dexxy.common.brokers sqlite <path>`.
+            socket -- A queue served from this process over TCP. Workers run `DEXXY_BROKER_AUTHKEY=<key> python -m dexxy.common.brokers socket <host>:<port>`.
+                      Workers run whatever the queue hands them, so it needs a secret authkey, and it is only served on this host unless address says otherwise.
+
+        A job whose worker dies is handed to another worker once its lease runs out, and fails after that if it is lost again.
+
+        Args:
+            type (Literal[sqlite, socket], optional): Defaults to 'sqlite'.
+            path (str, optional): The SQLite file. Defaults to 'runs/broker.db'.
+            address (Tuple[str, int], optional): The (host, port) the socket broker listens on. Defaults to ('127.0.0.1', 5050).
+            authkey (bytes, optional): The secret socket workers must present, e.g. secrets.token_bytes(32). Required for 'socket'. Defaults to None.
+            lease (float, optional): Seconds a worker may go without renewing the job it claimed. Workers of a sqlite broker need the same --lease. Defaults to 60.0.
+
+        Returns:
+            Broker: A broker.
+        """
+
+        from dexxy.common.brokers import SQLiteBroker, SocketBroker
+
+        if type == 'socket':
+            return SocketBroker(address, authkey=authkey, serve=True, lease=lease)
+
+        return SQLiteBroker(path, lease=lease)
@@ -0,0 +1,106 @@
+import csv
+import json
+import sys
+from typing import Any, Dict, List, Tuple, TypeVar
+from dexxy.common.results import SpilledResult
+from dexxy.common.utils import isDataFrame
+
+Task = TypeVar('Task')
+
+# The columns of a run report, one row per Task
+REPORT_FIELDS = [
+    'tid', 'uuid', 'name', 'status', 'queuedAt', 'readyAt', 'startedAt', 'finishedAt',
+    'waitDependencies', 'waitWorker', 'duration', 'attempts', 'cached', 'resultRows', 'resultBytes', 'error',
+]
+
+
+def describeResult(result: Any) -> Tuple[int, int]:
+    """
+    Estimates the size of a Task's result.
+
+    Args:
+        result (Any): Whatever the Task's func returned.
+
+    Returns:
+        Tuple[int, int]: (rows, bytes). Rows is None for anything that isn't a DataFrame. Bytes counts the DataFrame's memory including strings,
+            or sys.getsizeof for other objects.
+    """
+    if result is None:
+        return None, None
+    if isinstance(result, SpilledResult):
+        return result.rows, result.nbytes
+    if isDataFrame(result):
+        return len(result), int(result.memory_usage(deep=True).sum())
+    return None, sys.getsizeof(result)
+
+
+def elapsed(start: float, end: float) -> float:
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+class RunReport(object):
+    """
+    A machine readable summary of a Pipeline run: when every Task was queued, became ready, started and finished, how long it waited on its
+    dependencies and for a free worker, how big its result was and the exception it raised (if any).
+    """
+
+    def __init__(self, runID: str, tasks: List[Task], **summary):
+        """
+        Args:
+            runID (str): The unique ID of the run.
+            tasks (List[Task]): The Tasks that were part of the run.
+            summary: Run level values to include, e.g. workers=4, peakConcurrency=3
+        """
+        self.runID = runID
+        self.tasks = tasks
+        self.summary = summary
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            List[Dict[str, Any]]: One dictionary per Task with the REPORT_FIELDS. Timestamps are seconds since the epoch, waits and durations are seconds.
+        """
+        rows = []
+        for task in self.tasks:
+            queuedAt = task.queuedAt
+            readyAt = task.readyAt
+            startedAt = task.startedAt
+            rows.append({
+                'tid': task.tid,
+                'uuid': task.uuid,
+                'name': task.name,
+                'status': task.status,
+                'queuedAt': queuedAt,
+                'readyAt': readyAt,
+                'startedAt': startedAt,
+                'finishedAt': task.finishedAt,
+                'waitDependencies': elapsed(queuedAt, readyAt),
+                'waitWorker': elapsed(readyAt, startedAt),
+                'duration': task.duration,
+                'attempts': task.attempts,
+                'cached': task.cached,
+                'resultRows': task.resultRows,
+                'resultBytes': task.resultBytes,
+                'error': task.error,
+            })
+        return rows
+
+    def write(self, path: str) -> None:
+        """
+        Writes the report. Paths ending in .csv get one CSV row per Task. Anything else gets a JSON document with the run summary and the Tasks.
+
+        Args:
+            path (str): Where to write the report, e.g. 'reports/nightly.json'
+        """
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['runID'] + REPORT_FIELDS)
+                writer.writeheader()
+                for row in self.rows():
+                    writer.writerow({'runID': self.runID, **row})
+            return
+
+        with open(path, 'w') as f:
+            json.dump({'runID': self.runID, **self.summary, 'tasks': self.rows()}, f, indent=2, default=str)
@@ -0,0 +1,259 @@
+from dexxy.common.exceptions import NotFoundError
+from dexxy.common.utils import isDataFrame
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, TypeVar
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+
+# pandas and pyarrow are only imported once a DataFrame actually has to be written or read
+if TYPE_CHECKING:
+    import pandas as pd
+
+Task = TypeVar('Task')
+
+
+class SpilledResult(object):
+    """
+    A handle to a DataFrame result that was written to a local Arrow IPC file instead of being kept in memory. Only the path and a few numbers
+    are held in memory. The file is memory-mapped again when a downstream Task needs the DataFrame, and the handle itself is cheap to send to a process worker.
+
+    Handles with temporary=False point at files owned by someone else (e.g. the TaskCache) and never delete them.
+    """
+
+    def __init__(self, path: str, rows: int, nbytes: int, temporary: bool = True):
+        self.path = path
+        self.rows = rows
+        self.nbytes = nbytes
+        self.temporary = temporary
+
+    @classmethod
+    def spill(cls, df: 'pd.DataFrame', path: str) -> "SpilledResult":
+        """
+        Writes a DataFrame to an Arrow IPC file.
+
+        Args:
+            df (pd.DataFrame): The result to spill.
+            path (str): Where to write it.
+
+        Returns:
+            SpilledResult: A handle to the file.
+        """
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return cls(path, table.num_rows, table.nbytes)
+
+    def load(self) -> 'pd.DataFrame':
+        """
+        Memory-maps the file and rebuilds the DataFrame.
+
+        Returns:
+            pd.DataFrame: The spilled result.
+        """
+        import pyarrow as pa
+
+        with pa.memory_map(self.path, 'r') as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def delete(self) -> None:
+        """
+        Removes the file once nobody needs the result anymore.
+        """
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __repr__(self) -> str:
+        return 'SpilledResult(path=%r, rows=%s, nbytes=%s)' % (self.path, self.rows, self.nbytes)
+
+
+def saveResult(result: Any, path: str) -> str:
+    """
+    Writes a Task's result to disk: DataFrames (and spilled results) as an Arrow file at path + '.arrow', anything else pickled to path + '.pkl'.
+
+    Args:
+        result (Any): The Task's result.
+        path (str): The file path without a suffix.
+
+    Raises:
+        Exception: Whatever pickle/Arrow raise for results that can't be written (a cursor, a connection, ...). Nothing is left behind in that case.
+
+    Returns:
+        str: The path of the file that was written.
+    """
+    if isinstance(result, SpilledResult):
+        shutil.copyfile(result.path, path + '.arrow')
+        return path + '.arrow'
+
+    target = path + ('.arrow' if isDataFrame(result) else '.pkl')
+    try:
+        if target.endswith('.arrow'):
+            SpilledResult.spill(result, target)
+        else:
+            with open(target, 'wb') as f:
+                pickle.dump(result, f, protocol=4)
+    except Exception:
+        if os.path.exists(target):
+            os.remove(target)
+        raise
+    return target
+
+
+def loadResult(path: str) -> Any:
+    """
+    Reads a result written by saveResult. Arrow files come back as a SpilledResult handle (memory-mapped when a Task needs the DataFrame) that
+    never deletes the file.
+
+    Args:
+        path (str): The path returned by saveResult.
+
+    Returns:
+        Any: The result.
+    """
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    import pyarrow as pa
+
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return SpilledResult(path, rows, os.path.getsize(path), temporary=False)
+
+
+class ResultStore(object):
+    """
+    Holds the Tasks that have completed during a run, indexed by their tid and by their name. Looking up the output of an upstream Task is a
+    dictionary lookup, so resolving dependencies costs the same no matter how many Tasks have already finished.
+
+    Every Worker (thread pool, asyncio, ...) writes completed Tasks here and reads the inputs of the next Task from here.
+
+    When spillThreshold is set, DataFrame results larger than that many bytes are written to an Arrow file in spillDir and replaced by a SpilledResult handle,
+    so intermediates bigger than the host's memory don't have to live in RAM between Tasks.
+    """
+
+    def __init__(self, spillThreshold: int = None, spillDir: str = None):
+        """
+        Args:
+            spillThreshold (int, optional): Spill DataFrame results larger than this many bytes to disk. Defaults to None (never spill).
+            spillDir (str, optional): The folder to spill results to. Defaults to None, which uses a temporary folder removed along with the store.
+        """
+        self._byTid: Dict[int, Task] = {}
+        self._byName: Dict[str, Task] = {}
+        self._lock = Lock()
+        self.spillThreshold = spillThreshold
+        self.spillDir = spillDir
+
+        if spillThreshold is not None and spillDir is None:
+            self.spillDir = tempfile.mkdtemp(prefix='dexxy-spill-')
+            weakref.finalize(self, shutil.rmtree, self.spillDir, ignore_errors=True)
+        elif spillDir is not None:
+            os.makedirs(spillDir, exist_ok=True)
+
+    def maybeSpill(self, task: Task) -> None:
+        """
+        Replaces a large DataFrame result with a SpilledResult handle. Results Arrow can't represent stay in memory.
+        Workers call this on the thread that ran the Task so writing the file doesn't hold up dispatching other Tasks.
+
+        Args:
+            task (Task): The Task that just finished.
+        """
+        if self.spillThreshold is None or not isDataFrame(task.result):
+            return
+        nbytes = task.resultBytes if task.resultBytes is not None else task.result.memory_usage(deep=True).sum()
+        if nbytes <= self.spillThreshold:
+            return
+
+        import pyarrow as pa
+
+        try:
+            task.result = SpilledResult.spill(task.result, os.path.join(self.spillDir, '%s.arrow' % task.uuid))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return
+
+    def release(self, task: Task) -> None:
+        """
+        Drops a Task's result (and its spill file, if it has one) once nothing needs it anymore.
+
+        Args:
+            task (Task): A completed Task.
+        """
+        if isinstance(task.result, SpilledResult):
+            task.result.delete()
+        task.result = None
+
+    def put(self, task: Task) -> None:
+        """
+        Records a completed Task.
+
+        Args:
+            task (Task): The Task that just finished.
+        """
+        with self._lock:
+            self._byTid[task.tid] = task
+            if task.name is not None:
+                self._byName[task.name] = task
+
+    def get(self, tid: int) -> Task:
+        """
+        Looks up a completed Task by its tid.
+
+        Args:
+            tid (int): The unique ID of the Task.
+
+        Returns:
+            Task: The completed Task, or None if it hasn't completed.
+        """
+        return self._byTid.get(tid)
+
+    def getByName(self, name: str) -> Task:
+        """
+        Looks up a completed Task by its name.
+
+        Args:
+            name (str): The name of the Task, e.g. 'extractCustomer'
+
+        Raises:
+            NotFoundError: If no Task with that name has completed.
+
+        Returns:
+            Task: The completed Task.
+        """
+        try:
+            return self._byName[name]
+        except KeyError:
+            raise NotFoundError(f"{name} has not completed in this run")
+
+    def getResult(self, name: str) -> Any:
+        """
+        Returns the output of a completed upstream Task.
+
+        Args:
+            name (str): The name of the Task, e.g. 'transformFactRental'
+
+        Returns:
+            Any: Whatever the Task's func returned. Spilled results are loaded back from disk.
+        """
+        result = self.getByName(name).result
+        if isinstance(result, SpilledResult):
+            return result.load()
+        return result
+
+    def tasks(self) -> List[Task]:
+        """
+        Returns:
+            List[Task]: Every completed Task in the order it completed.
+        """
+        return list(self._byTid.values())
+
+    def __contains__(self, tid: int) -> bool:
+        return tid in self._byTid
+
+    def __len__(self) -> int:
+        return len(self._byTid)
@@ -1,4 +1,14 @@
+import os
+import tempfile
+from apscheduler.job import Job
 from apscheduler.schedulers.background import BackgroundScheduler
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.logger import LoggingStuff
+from threading import Lock
+from time import time
+from typing import Any, Dict, List, TypeVar
+
+Pipeline = TypeVar('Pipeline')
 
 
 class Scheduler(BackgroundScheduler):
@@ -6,5 +16,196 @@ class Scheduler(BackgroundScheduler):
     The BackgroundScheduler runs a workflow in a seperate thread
     """
 
-    def __new__(cls):
-        return super(Scheduler, cls).__new__(cls)
\ No newline at end of file
+    def __new__(cls, *args, **kwargs):
+        return super(Scheduler, cls).__new__(cls)
+
+    def __init__(self, **options):
+        super(Scheduler, self).__init__(**options)
+        self.scheduled: Dict[str, ScheduledPipeline] = {}
+
+        # Close the warm resources of a scheduled Pipeline when its job is removed or the scheduler shuts down
+        from apscheduler.events import EVENT_JOB_REMOVED, EVENT_SCHEDULER_SHUTDOWN
+        self.add_listener(self.closeScheduled, EVENT_JOB_REMOVED | EVENT_SCHEDULER_SHUTDOWN)
+
+    def schedulePipeline(self, pipeline: Pipeline, trigger: str = 'interval', id: str = None, maxConcurrentRuns: int = 1, coalesce: bool = True,
+                         misfireGraceTime: int = 60, keepWarm: List[str] = None, runOptions: Dict = None, **triggerArgs) -> Job:
+        """
+        Runs a composed (or opened) Pipeline on a cron or interval trigger, e.g.
+            scheduler.schedulePipeline(workflow, 'interval', minutes=5, keepWarm=['openPool'])
+            scheduler.schedulePipeline(workflow, 'cron', hour=2, runOptions={'report': 'dags/run_report.json'})
+
+        A run that is still going when the next one is due is never queued behind: with maxConcurrentRuns=1 the next run is skipped,
+        and with coalesce=True runs that were missed (e.g. while the host was busy) are collapsed into one.
+
+        Args:
+            pipeline (Pipeline): A composed Pipeline, or one opened with openDAG.
+            trigger (str, optional): 'interval', 'cron' or 'date'. Defaults to 'interval'.
+            id (str, optional): The job's ID. Scheduling the same ID again replaces the job. Defaults to None.
+            maxConcurrentRuns (int, optional): How many runs may overlap. Each overlapping run gets its own copy of the DAG. Defaults to 1.
+            coalesce (bool, optional): Run once instead of once per missed firing. Defaults to True.
+            misfireGraceTime (int, optional): Seconds a run may start late before it is skipped. Defaults to 60.
+            keepWarm (List[str], optional): Names of Tasks (e.g. 'openPool') whose results are kept and reused by later runs instead of being re-created.
+                Defaults to None.
+            runOptions (Dict, optional): Keyword arguments for Pipeline.run(), e.g. {'workers': 4, 'cache': 'dags/cache'}. Defaults to None.
+            triggerArgs: The trigger's fields, e.g. minutes=5 or hour=2, and other add_job options such as next_run_time.
+
+        Returns:
+            Job: The APScheduler job. scheduler.scheduled[job.id] is the ScheduledPipeline, with its run and failure counts.
+        """
+        scheduled = ScheduledPipeline(pipeline, maxConcurrentRuns=maxConcurrentRuns, keepWarm=keepWarm, runOptions=runOptions)
+        job = self.add_job(scheduled.run, trigger, id=id, name=scheduled.name, max_instances=maxConcurrentRuns, coalesce=coalesce,
+                           misfire_grace_time=misfireGraceTime, replace_existing=id is not None, **triggerArgs)
+        self.scheduled[job.id] = scheduled
+        return job
+
+    def closeScheduled(self, event: Any) -> None:
+        jobID = getattr(event, 'job_id', None)
+        for key in ([jobID] if jobID is not None else list(self.scheduled)):
+            scheduled = self.scheduled.pop(key, None)
+            if scheduled is not None:
+                scheduled.close()
+
+
+class ScheduledPipeline(LoggingStuff):
+    """
+    What a scheduled job runs: one Pipeline run per firing, on a Pipeline that is kept between runs. The DAG is composed (or loaded) once,
+    and Tasks named in keepWarm (connections, clients) keep their results, so later runs only re-run the rest.
+
+    Overlapping runs (maxConcurrentRuns > 1) each need their own Tasks. A copy is opened from the compiled plan the first time one is needed
+    and kept for later runs.
+    """
+
+    def __init__(self, pipeline: Pipeline, maxConcurrentRuns: int = 1, keepWarm: List[str] = None, runOptions: Dict = None):
+        """
+        Args:
+            pipeline (Pipeline): A composed Pipeline, or one opened with openDAG.
+            maxConcurrentRuns (int, optional): The most runs that may overlap. Defaults to 1.
+            keepWarm (List[str], optional): Names of Tasks whose results are reused by later runs. Defaults to None.
+            runOptions (Dict, optional): Keyword arguments for Pipeline.run(). Defaults to None.
+        """
+        if len(pipeline.dag) == 0:
+            raise ValueError('Compose the Pipeline (or open a saved DAG) before scheduling it')
+
+        self.pipeline = pipeline
+        self.name = 'Pipeline %s' % pipeline.pid
+        self.maxConcurrentRuns = maxConcurrentRuns
+        self.keepWarm = set(keepWarm or [])
+        self.runOptions = runOptions or {}
+        self.runs = 0
+        self.failures = 0
+        self.lastRunAt = None
+        self.lastError = None
+        self._idle = [pipeline]
+        self._copies = 1
+        self._planFile = getattr(pipeline, 'plan_file', None)
+        self._ownsPlan = False
+        self._lock = Lock()
+        self._log = self.logger
+
+    def acquire(self) -> Pipeline:
+        """
+        Returns:
+            Pipeline: An idle copy of the Pipeline, opening a new copy from the compiled plan if every copy is running.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._planFile is None:
+                from dexxy.common.plans import savePlan
+
+                handle, self._planFile = tempfile.mkstemp(prefix='dexxy-plan-')
+                os.close(handle)
+                savePlan(self.pipeline.dag, self._planFile)
+                self._ownsPlan = True
+            self._copies += 1
+
+        from dexxy.common.workflows import Pipeline
+        self._log.info('Opening copy %s of %s for an overlapping run', self._copies, self.name)
+        return Pipeline(type=self.pipeline.type).openDAG(self._planFile)
+
+    def release(self, pipeline: Pipeline) -> None:
+        with self._lock:
+            self._idle.append(pipeline)
+
+    def prepare(self, pipeline: Pipeline, **selection) -> None:
+        """
+        Clears the previous run from the Tasks and queues them again. Warm Tasks that completed before are marked as completed (like Tasks
+        restored from a checkpoint) so the Worker hands their results straight to the Tasks that depend on them.
+
+        Args:
+            pipeline (Pipeline): The copy about to run.
+            selection: targets= and direction= from the run options, passed to Pipeline.collect().
+        """
+        warm = []
+        for task in pipeline.tasks():
+            if task.name in self.keepWarm:
+                task.keepResult = True
+                if task.status == 'Completed' and task.error is None:
+                    warm.append((task, task.result))
+
+        # collect() clears the previous run from every Task, so the warm results are put back afterwards
+        pipeline.collect(**selection)
+        for task, result in warm:
+            task.result = result
+            task.restored = True
+            task.updateStatus('Completed')
+
+    def cool(self, pipeline: Pipeline) -> None:
+        """
+        Closes and forgets the warm results of a copy, e.g. after a failed run that may have been caused by a dropped connection.
+        """
+        for task in pipeline.tasks():
+            if task.name in self.keepWarm:
+                closeResource(task.result)
+                task.reset()
+
+    def run(self) -> None:
+        """
+        Runs the Pipeline once. Failed runs are logged (and their warm results dropped) rather than raised, so the schedule keeps going.
+        """
+        # Targets are collected before the warm Tasks are marked, not again inside run()
+        options = dict(self.runOptions)
+        selection = {key: options.pop(key) for key in ('targets', 'direction') if key in options}
+
+        pipeline = self.acquire()
+        self.lastRunAt = time()
+        try:
+            self.prepare(pipeline, **selection)
+            pipeline.run(**options)
+            self.runs += 1
+            self.lastError = None
+        except TaskFailedError as error:
+            self.failures += 1
+            self.lastError = str(error)
+            self._log.error('Scheduled run of %s failed: %s', self.name, error)
+            self.cool(pipeline)
+        except Exception as error:
+            self.failures += 1
+            self.lastError = repr(error)
+            self.cool(pipeline)
+            raise
+        finally:
+            self.release(pipeline)
+
+    def close(self) -> None:
+        """
+        Closes the warm results of every copy and removes the temporary plan.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pipeline in idle:
+            self.cool(pipeline)
+        if self._ownsPlan and os.path.exists(self._planFile):
+            os.remove(self._planFile)
+
+
+def closeResource(resource: Any) -> None:
+    """
+    Closes a warm result that holds a resource, e.g. a cursor or a connection. Anything without close() is simply dropped.
+    """
+    close = getattr(resource, 'close', None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
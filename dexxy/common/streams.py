@@ -0,0 +1,152 @@
+from collections import deque
+from threading import Condition
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from dexxy.common.exceptions import StreamError
+from dexxy.common.reports import describeResult
+
+# Streams carry the chunks a streaming Task (Task(stream=True)) produces to the Tasks that read them, while both are running.
+# Every reader has its own bounded buffer, so the producer only gets ahead of its slowest reader by that many chunks.
+
+
+class StreamReader(object):
+    """
+    One reader's end of a stream: a bounded buffer of chunks the producer fills and the reading Task iterates over, e.g.
+        def loadData(df, target):
+            for chunk in df:
+                ...
+
+    Iterating blocks until the next chunk arrives and stops once the producer has finished. If the producer failed, StreamError is raised instead.
+    """
+
+    def __init__(self, name: str, size: int):
+        """
+        Args:
+            name (str): The name of the Task producing the stream, for error messages.
+            size (int): The most chunks the buffer holds before the producer has to wait.
+        """
+        self.name = name
+        self.size = size
+        self.chunks = deque()
+        self.condition = Condition()
+        self.done = False
+        self.closed = False
+        self.error = None
+
+    def put(self, chunk: Any) -> None:
+        # Waits while the buffer is full. Once the reader is closed its chunks are dropped, so a reader that stopped early never holds up the producer.
+        with self.condition:
+            while len(self.chunks) >= self.size and not self.closed:
+                self.condition.wait()
+            if not self.closed:
+                self.chunks.append(chunk)
+                self.condition.notify_all()
+
+    def finish(self, error: str = None) -> None:
+        with self.condition:
+            if not self.done:
+                self.done = True
+                self.error = error
+                self.condition.notify_all()
+
+    def close(self) -> None:
+        """
+        Stops reading. Chunks still buffered (or produced later) are dropped.
+        """
+        with self.condition:
+            self.closed = True
+            self.chunks.clear()
+            self.condition.notify_all()
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        with self.condition:
+            while not self.chunks and not self.done and not self.closed:
+                self.condition.wait()
+            if self.chunks:
+                chunk = self.chunks.popleft()
+                self.condition.notify_all()
+                return chunk
+            if self.error is not None and not self.closed:
+                raise StreamError('The stream of %s failed before it finished:\n%s' % (self.name, self.error))
+            raise StopIteration
+
+    def __repr__(self) -> str:
+        return 'StreamReader(%r, buffered=%s/%s)' % (self.name, len(self.chunks), self.size)
+
+
+class ChunkStream(object):
+    """
+    The stream of one streaming Task: a StreamReader for every Task that reads it.
+    """
+
+    def __init__(self, name: str, readers: List[int], size: int = 8):
+        """
+        Args:
+            name (str): The name of the Task producing the stream.
+            readers (List[int]): The tids of the Tasks reading it.
+            size (int, optional): The most chunks each reader's buffer holds. Defaults to 8.
+        """
+        if size < 1:
+            raise ValueError('A stream needs room for at least 1 chunk. Got size=%s' % size)
+        self.name = name
+        self.readers: Dict[int, StreamReader] = {tid: StreamReader(name, size) for tid in readers}
+
+    def reader(self, tid: int) -> StreamReader:
+        return self.readers[tid]
+
+    def publish(self, chunks: Iterable[Any]) -> Tuple[int, int]:
+        """
+        Hands every chunk to every reader, waiting whenever a reader's buffer is full. Runs on the producer's thread.
+
+        Args:
+            chunks (Iterable[Any]): What the producer's func returned, e.g. a generator of DataFrames.
+
+        Returns:
+            Tuple[int, int]: The rows and bytes streamed (rows is None if the chunks aren't DataFrames), for the run report.
+        """
+        rows = size = None
+        for chunk in chunks:
+            chunkRows, chunkBytes = describeResult(chunk)
+            if chunkRows is not None:
+                rows = (rows or 0) + chunkRows
+            if chunkBytes is not None:
+                size = (size or 0) + chunkBytes
+            for reader in self.readers.values():
+                reader.put(chunk)
+        return rows, size
+
+    def finish(self, error: str = None) -> None:
+        """
+        Ends the stream. Readers stop after the chunks already buffered, or raise StreamError if error is given.
+
+        Args:
+            error (str, optional): The producer's traceback if it failed. Defaults to None.
+        """
+        for reader in self.readers.values():
+            reader.finish(error)
+
+
+def mapChunks(chunks: Iterable[Any], *inputs: Any, func: Callable = None, **kwargs: Any) -> Iterator[Any]:
+    """
+    Applies a whole-DataFrame transform to each chunk of a stream, so a streaming Task can transform chunks as they arrive:
+        Task(mapChunks,
+            kwargs={'func': buildDimCustomer},
+            dependsOn=['extractCustomer'],
+            stream=True,
+            name='transformCustomer')
+
+    Only transforms that treat rows independently (renames, derived columns, lookups against small tables) give the same answer chunk by chunk.
+
+    Args:
+        chunks (Iterable[Any]): The stream being read.
+        inputs (Any): The Task's other inputs, passed to func after each chunk.
+        func (Callable): The transform.
+        kwargs (Any): Passed to func.
+
+    Returns:
+        Iterator[Any]: func's result for every chunk.
+    """
+    for chunk in chunks:
+        yield func(chunk, *inputs, **kwargs)
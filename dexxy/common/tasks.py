@@ -1,67 +1,468 @@
-from typing import Any, List, Union, TypeVar, Callable, Literal, Tuple
+from typing import Any, Dict, List, Union, TypeVar, Callable, Literal, Tuple
 from dexxy.common.logger import LoggingStuff
-from dexxy.common.utils import generateUniqueID
+from dexxy.common.utils import generateUniqueID, nextTaskID
+from dexxy.common.processes import runInProcess
+from dexxy.common.results import SpilledResult
+from dexxy.common.exceptions import TaskTimeoutError
+from concurrent.futures import Executor, Future
+from contextvars import copy_context
+from inspect import iscoroutinefunction
+from sys import intern
+from threading import Thread
+from time import perf_counter, sleep, time
+from traceback import format_exception
+from dexxy.common.reports import describeResult
+from dexxy.common.streams import ChunkStream, StreamReader
 
 Task = TypeVar('Task')
 Pipeline = TypeVar('Pipeline')
 
 class Task(LoggingStuff):
-    
-    def __init__(self, func: Callable, kwargs: dict = {}, dependsOn: List = None, name: str = None) -> None:
+
+    # Generated DAGs can hold hundreds of thousands of Tasks, so a Task has fixed slots instead of a __dict__. Its logger is shared by every Task.
+    SETTINGS = ('func', 'kwargs', 'dependsOn', 'name', 'executor', 'keepResult', 'cacheable', 'retries', 'retryDelay', 'timeout', 'resources',
+                'partitions', 'reduce', 'stream', 'version', 'tid', '_uuid')
+    RUN_STATE = ('attempts', 'cached', 'restored', 'status', 'result', 'duration', 'queuedAt', 'readyAt', 'startedAt', 'finishedAt',
+                 'resultRows', 'resultBytes', 'error', 'children', 'inputs', 'abandoned')
+    __slots__ = SETTINGS + RUN_STATE
+    # What a setting is when a Task pickled by an older version doesn't have it
+    DEFAULTS = dict(name=None, executor=None, keepResult=False, cacheable=True, retries=0, retryDelay=1.0, timeout=None, resources=None,
+                    partitions=None, reduce=None, stream=False, version=None, _uuid=None)
+
+    def __init__(self, func: Callable, kwargs: dict = {}, dependsOn: List = None, name: str = None, executor: Literal['thread', 'process'] = None, keepResult: bool = False, cacheable: bool = True,
+                 retries: int = 0, retryDelay: float = 1.0, timeout: float = None, resources: Dict[str, float] = None, partitions: Callable = None,
+                 reduce: Callable = None, stream: bool = False, version: str = None) -> None:
         """
         Initalization of the class Task. To inilizatize it will look like:
             Task(createCursor,
                 kwargs={'path': databaseConfig, 'section': section},
                 dependsOn=None,
                 name='createCursor')
+
+        A Task with partitions is a mapped Task. When it is ready to run, partitions is called like func (with the Task's inputs and kwargs) and
+        returns one dict of kwargs per partition, e.g. [{'where': ('rental_date', '2005-05-01', '2005-06-01')}, ...]. The Task then expands
+        into one child Task per partition (named 'extractRental[0]', 'extractRental[1]', ...) that calls func with those kwargs added, and the
+        children run in parallel like any other ready Tasks. A partition can also carry an 'inputs' tuple, which the child gets as its
+        positional inputs instead of the full results of the Tasks it depends on (e.g. only that month's rows), so a child sent to a process
+        pool doesn't copy every whole input. Once they have all completed, reduce is called with their results, in partition order, and its
+        return value is the mapped Task's result:
+            Task(readData,
+                kwargs={'tableName': dvd.rental, 'columns': ('rental_id', 'rental_date')},
+                partitions=rentalMonths,
+                name='extractRental')
+
+        A Task with stream=True is a streaming Task. Its func returns an iterator of chunks (usually it is a generator yielding DataFrames) and
+        the Tasks that depend on it get a StreamReader instead of a result: they start at the same time as the streaming Task and iterate over the
+        chunks as they are produced, through a bounded buffer. A reader can be a streaming Task itself, so extract, transform and load overlap:
+            Task(readChunks, kwargs={...}, stream=True, name='extractCustomer')
+            Task(mapChunks, kwargs={'func': buildDimCustomer}, dependsOn=['extractCustomer'], stream=True, name='transformCustomer')
+            Task(loadData, kwargs={...}, dependsOn=['transformCustomer'], name='loadCustomer')
                 
         It accepts input variables to know how to call other functions, which varibles to pass, and what other Tasks it depends on to execute. 
-        By default the status is "Not Started", a logger is generated, and nothing is related to this. 
+        By default the status is "Not Started". Every Task gets a small integer tid, unique within the process, used as its key in the DAG and
+        in every Worker's bookkeeping. A UUID for showing the Task outside the process (reports, file names) is only made if task.uuid is asked for.
 
         Args:
-            func (Callable): The function to call when operating on this Task. 
+            func (Callable): The function to call when operating on this Task. Can be a coroutine function when the Pipeline runs with type='asyncio'.
             kwargs (dict, optional): This is the input paramters to the specified function. Defaults to {}.
             dependsOn (List, optional): List of other Tasks this is dependent on to execute. Defaults to None.
             name (str, optional): Name of the Task. Defaults to None.
+            executor (Literal[thread, process], optional): Where to run func. 'process' ships func to a process pool, which helps CPU-bound pandas work that holds the GIL.
+                Defaults to None, which uses the executor passed to Pipeline.run().
+            keepResult (bool, optional): Keep the result after every Task that depends on this one has run, instead of releasing it to free memory. Defaults to False.
+            cacheable (bool, optional): Allow the result to be reused from the TaskCache when the Pipeline runs with a cache. Set this to False for Tasks with side effects
+                (opening connections, creating tables, loading data). Defaults to True.
+            retries (int, optional): How many more times to call func if it raises, e.g. 1 to ride out a dropped database connection. Defaults to 0.
+            retryDelay (float, optional): Seconds to wait before the first retry. The wait doubles after every failed attempt. Defaults to 1.0.
+            timeout (float, optional): Seconds a single attempt may take before it counts as failed. An attempt on a thread can't be cancelled
+                (nor can one a child process already started), so it keeps running after it times out: the Task fails without a retry, and its
+                resources stay held until the abandoned attempt returns (see task.abandoned). Defaults to None (no limit).
+            resources (Dict[str, float], optional): What the Task holds while it runs, e.g. {'db': 1, 'mem_gb': 4}. It only starts once the pools passed to
+                Pipeline.run(resources=) have that much free. Defaults to None (needs nothing).
+            partitions (Callable, optional): Makes this a mapped Task. Returns a list of kwargs dicts, one per child Task, optionally with the
+                child's own 'inputs' (see above). Children copy every other setting of the Task, including its resources. Defaults to None (run func once).
+            reduce (Callable, optional): Combines the children's results. Defaults to None, which uses dexxy.common.partitions.concatResults
+                (one DataFrame for DataFrames, a list for anything else).
+            stream (bool, optional): Stream the chunks func returns to the Tasks that depend on it (see above). Their results are not kept, cached
+                or checkpointed, and a stream that fails part way is not retried. If nothing in the run reads the stream the chunks are concatenated
+                into the result like a mapped Task's. Defaults to False.
+            version (str, optional): Part of the Task's cache key. Change it to invalidate cached results after a change the cache can't see,
+                e.g. an upgraded package or a helper reached through a module (see dexxy.common.cache.fingerprint). Defaults to None.
         """
         
         self.func = func
         self.kwargs = kwargs
         self.dependsOn = dependsOn
-        self.name = name
+        self.name = intern(name) if type(name) is str else name
+        self.executor = executor
+        self.keepResult = keepResult
+        self.cacheable = cacheable
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.timeout = timeout
+        self.resources = resources
+        self.partitions = partitions
+        self.reduce = reduce
+        self.stream = stream
+        self.version = version
+        self.tid = nextTaskID()
+        self._uuid = None
+        self.reset()
+        self._log.debug('Initalized Task %s', self.name)
+
+    @property
+    def _log(self):
+        return self.logger
+
+    @property
+    def uuid(self) -> str:
+        """
+        Returns:
+            str: A UUID for the Task, made the first time it is asked for. Use it where the Task is shown outside this process.
+        """
+        if self._uuid is None:
+            self._uuid = generateUniqueID()
+        return self._uuid
+
+    @property
+    def related(self) -> List[int]:
+        """
+        Returns:
+            List[int]: The tids of the Tasks this one depends on, without duplicates.
+        """
+        return list(dict.fromkeys(dep.tid for dep in self.dependsOn or [] if hasattr(dep, 'tid')))
+
+    def __getstate__(self) -> dict:
+        # An abandoned attempt belongs to this process and run, and a child's slice of the inputs is only held while it runs
+        return {slot: getattr(self, slot) for slot in self.__slots__ if hasattr(self, slot) and slot not in ('abandoned', 'inputs')}
+
+    def __setstate__(self, state: Union[dict, Tuple[dict, dict]]) -> None:
+        # Tasks pickled before Task had slots carry a __dict__ (with a logger and a related list) -- keep only what still has a slot
+        # Settings added since the Task was pickled take their defaults, and missing run state starts out cleared
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        self.reset()
+        for slot in self.SETTINGS:
+            if slot not in state and slot in self.DEFAULTS:
+                setattr(self, slot, self.DEFAULTS[slot])
+        for slot in self.__slots__:
+            if slot in state:
+                setattr(self, slot, state[slot])
+
+    def reset(self) -> None:
+        """
+        Clears everything a run records on the Task (status, result, timings, error), leaving how to run it untouched.
+        """
+        self.attempts = 0
+        self.cached = False
+        self.restored = False
         self.status = "Not Started"
-        self.related = []
         self.result = None
-        self.tid = generateUniqueID()
-        self._log = self.logger
-        self._log.info('Initalized Task %s' % self.name)
+        self.duration = None
+        self.queuedAt = None
+        self.readyAt = None
+        self.startedAt = None
+        self.finishedAt = None
+        self.resultRows = None
+        self.resultBytes = None
+        self.error = None
+        self.children = None
+        self.inputs = None
+        self.abandoned = None
     
-    def updateStatus(self, status: Literal['Not Started', 'Queued', 'Running', 'Completed', 'Failed'] = 'Not Started') -> None:
+    def updateStatus(self, status: Literal['Not Started', 'Queued', 'Running', 'Mapped', 'Completed', 'Failed', 'Skipped'] = 'Not Started') -> None:
         """
         A function to allow updaing the status of a Task.status. It allows us to track the progress of a Task through execution. 
+        Moving to Queued, Running and Completed/Failed/Skipped also records the time in queuedAt, startedAt and finishedAt.
+        Mapped means a mapped Task has expanded into its children and is waiting for them.
+        Skipped means the Task never ran because a Task it depends on failed (or the run was stopped).
 
         Args:
-            status (Literal[Not Started, Queued, Running, Completed, Failed], optional): Allows you to pass one of these options when updating the status. Defaults to 'Not Started'.
+            status (Literal[Not Started, Queued, Running, Mapped, Completed, Failed, Skipped], optional): Allows you to pass one of these options when updating the status. Defaults to 'Not Started'.
         """
         self.status = status
-        
-    def run(self, inputs:tuple):
+        if status == 'Queued':
+            self.queuedAt = time()
+        elif status == 'Running':
+            self.startedAt = time()
+        elif status in ('Completed', 'Failed', 'Skipped'):
+            self.finishedAt = time()
+
+    def markReady(self) -> None:
+        """
+        Records when the last Task this one depends on completed. The gap between queuedAt and readyAt is the time spent waiting on dependencies.
+        """
+        self.readyAt = time()
+
+    def measureResult(self) -> None:
         """
-        A function that runs the func with kwargs specificed in the Task
+        Records the approximate size of the result (rows and bytes for DataFrames) for the run report.
+        """
+        self.resultRows, self.resultBytes = describeResult(self.result)
+
+    def recordError(self, error: Exception) -> None:
+        """
+        Logs an exception raised by func and keeps its traceback for the run report.
+        """
+        self.error = ''.join(format_exception(type(error), error, error.__traceback__))
+        self._log.exception(error, exc_info=True, stack_info=True)
+
+    def attemptTimeout(self, deadline: float = None) -> float:
+        """
+        Works out how long the next attempt may take: the Task's own timeout, cut short by the run's deadline.
+
+        Args:
+            deadline (float, optional): The time.time() by which the whole run must finish. Defaults to None.
+
+        Raises:
+            TaskTimeoutError: If the deadline has already passed.
+
+        Returns:
+            float: Seconds, or None for no limit.
+        """
+        timeout = self.timeout
+        if deadline is None:
+            return timeout
+        remaining = deadline - time()
+        if remaining <= 0:
+            raise TaskTimeoutError('The run deadline passed before %s could start' % self.name)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def retryWait(self, attempt: int, deadline: float = None) -> float:
+        """
+        Decides whether a failed attempt is tried again.
+
+        Args:
+            attempt (int): The attempt that just failed, starting at 0.
+            deadline (float, optional): The time.time() by which the whole run must finish. Defaults to None.
+
+        Returns:
+            float: Seconds to wait before the next attempt, or None if the Task has failed for good.
+        """
+        if attempt >= self.retries:
+            return None
+        delay = self.retryDelay * 2 ** attempt
+        if deadline is not None and time() + delay >= deadline:
+            return None
+        self._log.warning('Retrying %s in %.1f seconds (attempt %s of %s)', self.name, delay, attempt + 2, self.retries + 1)
+        return delay
+
+    def run(self, inputs:tuple, pool: Executor = None, deadline: float = None):
+        """
+        A function that runs the func with kwargs specificed in the Task. If func raises (or takes longer than timeout) it is tried again up to `retries` times.
+        When every attempt fails, task.error holds the traceback of the last one.
+
+        An attempt that timed out but couldn't be stopped is not retried, since the next attempt would run next to it on the same inputs.
+        task.abandoned is then a Future that resolves once it returns.
+
+        Args:
+            inputs (tuple): The results of the Tasks this Task depends on.
+            pool (Executor, optional): A process pool to run func on. Defaults to None, which calls func in the current thread.
+            deadline (float, optional): The time.time() by which the whole run must finish. No attempt runs past it. Defaults to None.
 
         Returns:
             Any: If there is a df, list, etc. to return by the specific function, it will return this. 
         """
         
+        started = perf_counter()
+        self.error = None
+        attempt = 0
+        # A stream can only be read once, so a Task that reads one isn't retried
+        replayable = not any(isinstance(value, StreamReader) for value in inputs)
         try:
-            self.result = self.func(*inputs, **self.kwargs)
+            while True:
+                self.attempts = attempt + 1
+                try:
+                    timeout = self.attemptTimeout(deadline)
+                    if pool is None:
+                        self.result = callWithTimeout(self.func, inputs, self.kwargs, timeout)
+                    else:
+                        self.result = runInProcess(pool, self.func, inputs, self.kwargs, timeout=timeout)
+                    self.error = None
+                    return
+                except Exception as error:
+                    self.recordError(error)
+                    self.abandoned = getattr(error, 'pending', None)
+                    if self.abandoned is not None:
+                        self._log.warning('%s timed out but its attempt is still running, so it is not retried', self.name)
+                    delay = self.retryWait(attempt, deadline) if replayable and self.abandoned is None else None
+                    if delay is None:
+                        return
+                sleep(delay)
+                attempt += 1
+        finally:
+            self.duration = perf_counter() - started
+
+    async def arun(self, inputs: tuple, pool: Executor = None, deadline: float = None):
+        """
+        The asyncio version of run(). Coroutine functions are awaited on the running event loop (and cancelled when they time out). Regular functions are handed to a thread
+        so they don't block the loop while other Tasks are waiting on I/O.
+
+        Args:
+            inputs (tuple): The results of the Tasks this Task depends on.
+            pool (Executor, optional): A process pool to run func on. Defaults to None.
+            deadline (float, optional): The time.time() by which the whole run must finish. Defaults to None.
+        """
+
+        import asyncio
+
+        if not iscoroutinefunction(self.func):
+            return await asyncio.to_thread(self.run, inputs, pool, deadline)
+
+        started = perf_counter()
+        self.error = None
+        attempt = 0
+        try:
+            while True:
+                self.attempts = attempt + 1
+                try:
+                    timeout = self.attemptTimeout(deadline)
+                    try:
+                        self.result = await asyncio.wait_for(self.func(*inputs, **self.kwargs), timeout)
+                    except asyncio.TimeoutError:
+                        raise TaskTimeoutError('%s did not finish within %.1f seconds' % (self.name, timeout)) from None
+                    self.error = None
+                    return
+                except Exception as error:
+                    self.recordError(error)
+                    delay = self.retryWait(attempt, deadline)
+                    if delay is None:
+                        return
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            self.duration = perf_counter() - started
+
+    @property
+    def mapped(self) -> bool:
+        return self.partitions is not None
+
+    def expand(self, inputs: tuple) -> None:
+        """
+        Calls partitions and creates one child Task per partition in task.children. If partitions raises, task.error is set instead.
+
+        Args:
+            inputs (tuple): The results of the Tasks this Task depends on.
+        """
+        self.error = None
+        try:
+            parts = list(self.partitions(*inputs, **self.kwargs))
+        except Exception as error:
+            self.recordError(error)
+            return
+
+        settings = dict(executor=self.executor, cacheable=self.cacheable, retries=self.retries, retryDelay=self.retryDelay, timeout=self.timeout,
+                        resources=self.resources, version=self.version)
+        self.children = []
+        for index, part in enumerate(parts):
+            part = dict(part)
+            inputs = part.pop('inputs', None)
+            child = Task(self.func, kwargs={**self.kwargs, **part}, dependsOn=self.dependsOn, name='%s[%s]' % (self.name, index), **settings)
+            child.inputs = tuple(inputs) if inputs is not None else None
+            self.children.append(child)
+
+    def combine(self, inputs: tuple) -> None:
+        """
+        Calls reduce with the children's results and keeps what it returns as the result. If reduce raises, task.error is set instead.
+
+        Args:
+            inputs (tuple): The children's results, in partition order.
+        """
+        self.error = None
+        reduce = self.reduce
+        if reduce is None:
+            from dexxy.common.partitions import concatResults as reduce
+        try:
+            self.result = reduce(*inputs)
         except Exception as error:
-            self._log.exception(error, exc_info=True, stack_info=True)
+            self.recordError(error)
+        finally:
+            # A mapped Task takes from its expansion until its children are combined
+            self.duration = time() - self.startedAt if self.startedAt is not None else None
+
+    def publish(self, stream: ChunkStream = None) -> None:
+        """
+        Produces the chunks of a streaming Task and hands them to the Tasks reading its stream. The chunks are only produced here (func is
+        usually a generator), so this takes most of the Task's time. If producing a chunk raises, task.error is set and the readers get a StreamError.
+
+        Args:
+            stream (ChunkStream, optional): The Task's stream. Defaults to None, which means nothing reads it: the chunks are concatenated
+                into the result instead.
+        """
+        from dexxy.common.partitions import concatResults
+
+        started = perf_counter()
+        try:
+            if stream is None:
+                self.result = concatResults(*self.result)
+            else:
+                self.resultRows, self.resultBytes = stream.publish(self.result)
+                self.result = None
+        except Exception as error:
+            self.result = None
+            self.recordError(error)
+        finally:
+            if stream is not None:
+                stream.finish(self.error)
+            self.duration = (self.duration or 0.0) + perf_counter() - started
+
+    @property
+    def streaming(self) -> bool:
+        return self.stream
+
+
+def callWithTimeout(func: Callable, inputs: tuple, kwargs: dict, timeout: float = None) -> Any:
+    """
+    Calls func(*inputs, **kwargs) and gives up waiting after timeout seconds. Python can't stop a thread from the outside, so a call that
+    times out can't be cancelled: it is left to finish on its own daemon thread and its result is thrown away. The TaskTimeoutError carries a
+    Future (error.pending) that resolves once it does.
+
+    Args:
+        func (Callable): The Task's function.
+        inputs (tuple): The positional inputs from upstream Tasks.
+        kwargs (dict): The Task's kwargs.
+        timeout (float, optional): Seconds to wait. Defaults to None, which calls func on the current thread.
+
+    Raises:
+        TaskTimeoutError: If func didn't return within timeout.
+
+    Returns:
+        Any: The result of func.
+    """
+    if timeout is None:
+        return func(*inputs, **kwargs)
+
+    outcome = {}
+    finished = Future()
+
+    def call():
+        try:
+            outcome['result'] = func(*inputs, **kwargs)
+        except BaseException as error:
+            outcome['error'] = error
+        finally:
+            finished.set_result(None)
+
+    # Carry the run and Task IDs of the log context over to the thread
+    thread = Thread(target=copy_context().run, args=(call,), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        error = TaskTimeoutError('%s did not finish within %.1f seconds' % (getattr(func, '__name__', func), timeout))
+        error.pending = finished
+        raise error
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
             
-def getTaskResult(task) -> Tuple[Any]:
+def getTaskResult(task, load: bool = True) -> Tuple[Any]:
     """
     Takes in a node in the Task with a list of UUIDs to lookup. Then looks up the data required to run a task using the provided list of UUIDs. 
 
+    Args:
+        task (Task): A completed Task.
+        load (bool, optional): Load results that were spilled to disk. Pass False to keep the SpilledResult handle, e.g. to hand it to a process worker. Defaults to True.
+
     Returns:
         Tuple[Any]: Returns the outputs from the Tasks func call. Could be a cursor, df, etc. 
     """
@@ -71,6 +472,8 @@ def getTaskResult(task) -> Tuple[Any]:
     # If there's a task
     if task is not None:
         data = task.result
+        if load and isinstance(data, SpilledResult):
+            data = data.load()
         # If the task had a returned item(s) 
         if data is not None:
             # Add the returned item(s) so they can used in subsequent function calls. 
@@ -1,5 +1,11 @@
+import sys
+from itertools import count
+from threading import Lock
 from uuid import uuid4, uuid5, NAMESPACE_OID
 
+_taskIDs = count(1)
+_taskIDLock = Lock()
+
 def generateUniqueID(name: str = None) -> str:
     """
     Generates a unique ID based off input (if any). Additional documentation relted to uuid4/uuid5 can be found at:
@@ -18,4 +24,40 @@ def generateUniqueID(name: str = None) -> str:
     if name:
         return str(uuid5(NAMESPACE_OID, name))
     # Otherwise generate a random UUID.
-    return str(uuid4())
\ No newline at end of file
+    return str(uuid4())
+
+def nextTaskID() -> int:
+    """
+    Returns the next Task ID. Integers are much cheaper than UUID strings to hash and compare, and the DAG and Workers look them up constantly.
+    They are unique within the process (see reserveTaskIDs for Tasks loaded from elsewhere).
+
+    Returns:
+        int: A positive integer not handed out before.
+    """
+    return next(_taskIDs)
+
+def reserveTaskIDs(highest: int) -> None:
+    """
+    Makes sure nextTaskID() never returns an ID up to `highest` again, e.g. after loading Tasks saved by another process.
+
+    Args:
+        highest (int): The largest ID already in use.
+    """
+    global _taskIDs
+    with _taskIDLock:
+        following = next(_taskIDs)
+        _taskIDs = count(max(following, highest + 1))
+
+def isDataFrame(obj) -> bool:
+    """
+    Checks whether obj is a pandas DataFrame without importing pandas. If pandas hasn't been imported yet, nothing can be a DataFrame,
+    so code paths that never see a DataFrame don't pay for the import.
+
+    Args:
+        obj (Any): Any object, e.g. a Task's result.
+
+    Returns:
+        bool: True for a DataFrame.
+    """
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(obj, pd.DataFrame)
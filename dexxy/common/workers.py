@@ -1,80 +1,858 @@
-from dexxy.common.logger import LoggingStuff
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dexxy.common.logger import LoggingStuff, logContext
 from dexxy.common.tasks import getTaskResult
+from dexxy.common.processes import createProcessPool
+from dexxy.common.results import ResultStore
+from dexxy.common.cache import TaskCache
+from dexxy.common.checkpoints import Checkpoint
+from dexxy.common.queues import QueueWarehouse, ReadyQueue, ResourcePool, FifoPolicy, CriticalPathPolicy
+from dexxy.common.exceptions import ResourceError
+from dexxy.common.streams import ChunkStream
 from dexxy.common.utils import generateUniqueID
-from typing import TypeVar
+from inspect import iscoroutinefunction
+from typing import Dict, List, Literal, TypeVar, Union
+from threading import Lock
+from time import time
+import os
 
 Queue = TypeVar('Queue')
+Broker = TypeVar('Broker')
 
 class Worker(LoggingStuff):
 
     workerID = 0
     job_id = generateUniqueID()
-    
-    def __init__(self, taskQueue: Queue, resultQueue: Queue):
+
+    def __init__(self, taskQueue: Queue, resultStore: ResultStore, workers: int = 1, executor: Literal['thread', 'process'] = 'thread', releaseResults: bool = True,
+                 policy: Union[FifoPolicy, CriticalPathPolicy] = None, cache: TaskCache = None, checkpoint: Checkpoint = None, runID: str = None,
+                 failFast: bool = False, deadline: float = None, broker: Broker = None, resources: Dict[str, float] = None, streamBuffer: int = 8):
         """
-        Initalization of a Worker object. Takes in the taskQueue to know when to execute Tasks, then uses the resultsQueue to know what outputs to pass to future taskQueue executions. 
+        Initalization of a Worker object. Takes in the taskQueue to know which Tasks to execute, then uses the resultStore to know what outputs to pass to future Task executions.
+
+        The Worker owns a pool of `workers` threads. A Task is dispatched to the pool as soon as all of the Tasks it depends on have completed (its in-degree drops to zero),
+        so independent branches of the DAG run at the same time. With workers=1 the Tasks run one at a time in the order they were enqueued.
+        When more Tasks are ready than there are free threads, the scheduling policy (see QueueWarehouse.policy) decides which one starts first.
+
+        Tasks that run with executor='process' are shipped to a process pool (started on first use) while their pool thread waits for the result,
+        so CPU-bound transforms can use every core while extracts and loads keep running in this process. With a broker those Tasks are put on the
+        broker instead, and BrokerWorker processes on this or other hosts run them.
+
+        With releaseResults=True a Task's result is dropped as soon as the last Task that consumes it has completed, so only the results still needed
+        by pending Tasks stay in memory. Tasks created with keepResult=True, and Tasks nothing depends on, keep their results.
+
+        When a Task fails (after its retries) every Task that depends on it, directly or not, is marked Skipped and never runs. Independent branches keep
+        running unless failFast=True, in which case nothing new is started after the first failure. Once the deadline passes no new Task starts, and
+        running Tasks time out at the deadline.
+
+        With resources (pool capacities such as {'db': 4, 'mem_gb': 16}) a ready Task only starts once the pools it declared with Task(resources=)
+        have room, so raising workers can't open more database connections or load more data than the host can hold. While the Task at the head
+        of the ready queue waits for room, smaller ready Tasks that fit go ahead of it. A Task that needs more than a whole pool fails before the run starts.
+        A Task that timed out while its attempt kept running (task.abandoned) holds its resources until that attempt returns.
+
+        A mapped Task (Task(partitions=...)) runs twice. The first time it expands into child Tasks, which are added to the run and depend on what
+        the mapped Task depends on, so they run in parallel. Once every child has completed, the mapped Task runs again and combines their results.
+
+        A streaming Task (Task(stream=True)) and the Tasks reading its stream form a stream group, which starts as one unit once everything else its
+        members depend on has completed. The members run on threads at the same time, passing chunks through buffers of streamBuffer chunks, and the
+        group counts as one of the `workers` (the pool has extra threads for the other members). Its resources are the sum of its members'.
 
         Args:
             taskQueue (Queue): A queue of the Tasks to execute
-            resultQueue (Queue): The outputs from functions called by the Tasks which could be needed for future func calls from Tasks. 
+            resultStore (ResultStore): The completed Tasks, indexed by tid, whose outputs could be needed for future func calls from Tasks.
+            workers (int, optional): The number of Tasks allowed to run at once. Defaults to 1.
+            executor (Literal[thread, process], optional): Where to run Tasks that don't set their own executor. Defaults to 'thread'.
+            releaseResults (bool, optional): Drop results once every consumer has run. Defaults to True.
+            policy (Union[FifoPolicy, CriticalPathPolicy], optional): The scheduling policy for ready Tasks. Defaults to None, which uses FifoPolicy.
+            cache (TaskCache, optional): Reuse results of cacheable Tasks whose code, kwargs and upstream Tasks haven't changed. Defaults to None (run everything).
+            checkpoint (Checkpoint, optional): Record every completed Task and its result so the run can be resumed. Tasks restored from a checkpoint
+                (task.restored) are treated as already completed. Defaults to None.
+            runID (str, optional): The unique ID of the run, written to the checkpoint. Defaults to None.
+            failFast (bool, optional): Stop starting new Tasks as soon as one Task fails. Defaults to False (only skip the failed Task's descendants).
+            deadline (float, optional): The time.time() by which the run must finish. Defaults to None (no deadline).
+            broker (Broker, optional): Send Tasks that run with executor='process' to this broker instead of the local process pool (see QueueWarehouse.broker). Defaults to None.
+            resources (Dict[str, float], optional): The capacity of each resource pool Tasks may declare. Defaults to None (no limits).
+            streamBuffer (int, optional): The most chunks a streaming Task may get ahead of each Task reading it. Defaults to 8.
         """
+        if workers < 1:
+            raise ValueError('A Worker needs at least 1 thread to run Tasks. Got workers=%s' % workers)
+
         Worker.workerID += 1
         self.workerID = Worker.workerID
         self.taskQueue = taskQueue
-        self.resultQueue = resultQueue
+        self.resultStore = resultStore
+        self.workers = workers
+        self.executor = executor
+        self.releaseResults = releaseResults
+        self.policy = policy or QueueWarehouse.policy('fifo')
+        self.cache = cache
+        self.cacheKeys = {}
+        self.checkpoint = checkpoint
+        self.runID = runID
+        self.failFast = failFast
+        self.deadline = deadline
+        self.failed = []
+        self.skipped = []
+        self.children = []
+        self.broker = broker
+        self.resources = ResourcePool(resources)
+        self.streamBuffer = streamBuffer
+        self.groups = {}
+        self.streams = {}
+        self.processPool = None
+        self._poolLock = Lock()
+        self.peakConcurrency = 0
         self._log = self.logger
-        self._log.info('Initalized Worker %s' % self.workerID)
-    
+        self._log.info('Initalized Worker %s with %s thread(s)', self.workerID, self.workers)
+
     def start(self):
         """
-        Starts execution. 
+        Starts execution.
         """
-        # Log the job we're starting and call run(). From within run, we'll loop through the taskQueue and execute the Tasks. ß
-        self._log.info('Starting Job %s' % self.job_id)
+        # Log the job we're starting and call run(). From within run, we'll dispatch the Tasks from the taskQueue as they become ready.
+        self._log.info('Starting Job %s', self.job_id)
         return self.run()
-        
-    def run(self): 
+
+    def getInputs(self, task) -> tuple:
+        """
+        Collects the results of every Task the given Task depends on, in the order of task.dependsOn.
+
+        Args:
+            task (Task): The Task about to be executed.
+
+        Returns:
+            tuple: The positional inputs for task.run(inputs)
+        """
+        # A child of a mapped Task may have been given its own slice of the inputs
+        if task.inputs is not None:
+            return task.inputs
+
+        # A mapped Task that has expanded combines the results of its children instead
+        sources = task.children if task.children is not None else task.dependsOn
+
+        # If no dependencies, shouldn't be anything to pass into the next func call
+        inputs = tuple()
+        if not sources:
+            return inputs
+
+        # Local process workers memory-map spilled results themselves, so only the handle is sent to them. Broker workers may be on another host,
+        # so they get the data. A mapped Task splits and combines on this thread.
+        pool = None if task.mapped else self.getPool(task)
+        load = pool is None or self.broker is not None
+        for depTask in dict.fromkeys(sources):
+            # A Task reading a stream gets its own reader instead of a result
+            if depTask.tid in self.streams:
+                inputs = inputs + (self.streams[depTask.tid].reader(task.tid),)
+                continue
+            inputData = getTaskResult(self.resultStore.get(depTask.tid), load=load)
+            # Add the returned func data (if any) so it can be used during run(inputs)
+            inputs = inputs + inputData
+        return inputs
+
+    def getPool(self, task):
+        """
+        Picks the pool a Task's func should be called on.
+
+        Args:
+            task (Task): The Task about to be executed.
+
+        Returns:
+            Executor: The process pool (or the broker) for Tasks that run with executor='process', otherwise None (call func on the current thread).
+        """
+        if (task.executor or self.executor) != 'process':
+            return None
+        # Streams don't cross process boundaries -- stream groups always run on threads
+        if task.tid in self.groups:
+            return None
+
+        # Start the process pool the first time a Task needs it
+        with self._poolLock:
+            if self.processPool is None and self.broker is not None:
+                from dexxy.common.brokers import BrokerExecutor
+                self.processPool = BrokerExecutor(self.broker)
+            elif self.processPool is None:
+                self.processPool = createProcessPool(min(self.workers, os.cpu_count() or 1))
+        return self.processPool
+
+    def loadCached(self, task) -> bool:
+        """
+        Reuses a cached result for the Task if there is one.
+
+        Args:
+            task (Task): The Task about to be executed.
+
+        Returns:
+            bool: True if the result came from the cache and func doesn't need to run.
+        """
+        if self.cache is None or not task.cacheable or task.streaming:
+            return False
+        key = self.cacheKey(task)
+        if key is None:
+            return False
+        try:
+            task.result = self.cache.get(key)
+        except KeyError:
+            return False
+
+        task.cached = True
+        task.measureResult()
+        self._log.info('Loaded Tasks %s from cache on Worker %s', task.name, self.workerID)
+        return True
+
+    def cacheKey(self, task) -> str:
+        """
+        Works out the Task's cache key once everything it depends on has completed. Keys chain through the DAG, so a change upstream changes
+        every key below it. A Task that isn't cacheable (e.g. an extract) is keyed by the content of its result, so the Tasks built from it are
+        only reused while it returns the same data.
+
+        Args:
+            task (Task): A Task that is about to run or has completed.
+
+        Returns:
+            str: The key, or None if the Task can't be cached.
+        """
+        if task.tid in self.cacheKeys:
+            return self.cacheKeys[task.tid]
+        if task.streaming:
+            key = None
+        elif not task.cacheable:
+            key = self.cache.resultKey(task.result) if task.status == 'Completed' and task.error is None else None
+        else:
+            key = self.cache.key(task, [self.cacheKey(dep) for dep in self.upstream[task.tid]])
+        # Only settled keys are remembered -- a Task that hasn't completed yet is keyed again later
+        if task.cacheable or task.status == 'Completed':
+            self.cacheKeys[task.tid] = key
+        return key
+
+    def storeCached(self, task) -> None:
         """
-        A loop that processes getting Tasks from the queue and processing them based on their instructions defined. 
+        Saves the Task's result to the cache (if there is one and the Task is cacheable and succeeded).
+
+        Args:
+            task (Task): The Task that just ran.
         """
+        if self.cache is None or not task.cacheable or task.error is not None:
+            return
+        key = self.cacheKey(task)
+        if key is not None:
+            self.cache.put(key, task.result)
 
-        # While there are remaining items in the taskQueue -- execute them
+    def saveCheckpoint(self, task) -> None:
+        """
+        Records the Task as completed in the run's checkpoint (if there is one and the Task succeeded).
+
+        Args:
+            task (Task): The Task that just ran.
+        """
+        if self.checkpoint is None or task.error is not None:
+            return
+        self.checkpoint.save(task, self.runID)
+
+    def execute(self, task):
+        """
+        Runs a single Task on one of the pool's threads.
+
+        Args:
+            task (Task): A Task whose dependencies have all completed.
+
+        Returns:
+            Task: The Task that was executed.
+        """
+        # Tag the log lines of this Task (and of its func, if it logs) with the run and Task IDs
+        with logContext(runID=self.runID, taskID=task.tid):
+            try:
+                # A mapped Task whose children have completed only combines their results
+                if task.status == 'Mapped':
+                    task.combine(self.getInputs(task))
+                    return self.finish(task)
+
+                # Update the status of the Task to Running and log this
+                task.updateStatus('Running')
+
+                if self.loadCached(task):
+                    self.saveCheckpoint(task)
+                    task.updateStatus('Completed')
+                    return task
+
+                if task.mapped:
+                    task.expand(self.getInputs(task))
+                    task.updateStatus('Failed' if task.error is not None else 'Mapped')
+                    return task
+
+                self._log.info('Running Tasks %s on Worker %s', task.name, self.workerID)
+
+                # Execute the Task and update status once completed. A Task that failed on every attempt is reported to complete() as Failed.
+                task.run(self.getInputs(task), pool=self.getPool(task), deadline=self.deadline)
+                if task.streaming and task.error is None:
+                    task.publish(self.streams.get(task.tid))
+                return self.finish(task)
+            except Exception as error:
+                return self.failOutside(task, error)
+            finally:
+                self.closeStreams(task)
+
+    def failOutside(self, task, error: Exception):
+        """
+        Fails a Task for an error raised around its func rather than by it: loading its inputs (e.g. a missing spill file), the cache, the checkpoint
+        (e.g. a full disk), or expanding and combining a mapped Task. complete() then skips its descendants like for any failed Task, and the run
+        still stops its pools and writes its report and checkpoint.
+
+        Args:
+            task (Task): The Task being executed.
+            error (Exception): What was raised.
+
+        Returns:
+            Task: The Task, now Failed.
+        """
+        task.recordError(error)
+        task.updateStatus('Failed')
+        return task
+
+    def closeStreams(self, task) -> None:
+        """
+        Ends the Task's own stream (so its readers never wait on a Task that stopped) and closes its readers of other streams (so those
+        producers never wait on a Task that stopped reading).
+
+        Args:
+            task (Task): A Task that just ran.
+        """
+        stream = self.streams.get(task.tid)
+        if stream is not None:
+            stream.finish(task.error or 'Tasks %s stopped before it finished its stream' % task.name)
+        for dep in self.upstream.get(task.tid, ()):
+            if dep.tid in self.streams:
+                self.streams[dep.tid].reader(task.tid).close()
+
+    def finish(self, task):
+        """
+        Records the outcome of a Task that just ran: its result size, the cache, the checkpoint and (for large results) the spill file.
+
+        Args:
+            task (Task): The Task that just ran.
+
+        Returns:
+            Task: The Task, now Completed or Failed.
+        """
+        if task.error is not None:
+            task.updateStatus('Failed')
+            return task
+
+        # A stream has already gone to its readers -- there is no result to keep
+        if task.tid in self.streams:
+            task.updateStatus('Completed')
+            return task
+
+        task.measureResult()
+        self.storeCached(task)
+        self.saveCheckpoint(task)
+        self.resultStore.maybeSpill(task)
+        task.updateStatus('Completed')
+        return task
+
+    def plan(self):
+        """
+        Drains the taskQueue and works out which Tasks can start right away. Also records the number of unfinished dependencies of every Task,
+        the Tasks waiting on each Task and how many consumers still need each Task's result.
+
+        Returns:
+            ReadyQueue: The Tasks with no unfinished dependencies, ordered by the scheduling policy.
+        """
+
+        # Drain the taskQueue. It holds the Tasks in topological order, which we keep as the order to start ready Tasks in.
+        tasks = []
         while not self.taskQueue.empty():
-            
-            # Get the Task to run. 
-            _task = self.taskQueue.get()
-            
-            # Update the status of the Task to Running and log this 
-            _task.updateStatus('Running')
-            self._log.info('Running Tasks %s on Worker %s ' % (_task.name, self.workerID))
-            
-            # If there's dependencies
-            if _task.dependsOn:
-                inputs = ()
-                for depTask in list(dict.fromkeys(_task.dependsOn).keys()):
-                    for completedTask in list(self.resultQueue.queue):
-                        if depTask.tid == completedTask.tid:
-                            inputData = getTaskResult(completedTask)
-                            # Add the returned func data (if any) so it can be used during run(inputs)
-                            inputs = inputs + inputData
-            else:
-                # If no dependencies, shouldn't be anything to pass into the next func call
-                inputs = tuple()
-            
-            # Execute the Task and update status once completed. 
-            _task.run(inputs)
-            _task.updateStatus('Completed')
-            
-            # Add the task that just finished to the resultsQueue
-            self.resultQueue.put(_task)
-            
-            # Remove the Task that just completed from the taskQueue. 
+            tasks.append(self.taskQueue.get_nowait())
             self.taskQueue.task_done()
-            
+        self.planned = tasks
+
+        # Mapped Tasks expand again on every run
+        for task in tasks:
+            if task.children is not None and not task.restored:
+                task.children = None
+
+        # Count the unfinished dependencies of every Task and remember who is waiting on whom.
+        # A Task reading a stream starts together with the streaming Task, so a stream doesn't count as an unfinished dependency.
+        self.indegree = {}
+        self.dependents = {task.tid: [] for task in tasks}
+        self.upstream = {}
+        for task in tasks:
+            deps = [dep for dep in dict.fromkeys(task.dependsOn or []) if dep.tid in self.dependents]
+            self.indegree[task.tid] = sum(1 for dep in deps if not self.streamsTo(dep))
+            self.upstream[task.tid] = deps
+            for dep in deps:
+                self.dependents[dep.tid].append(task)
+        self.planGroups(tasks)
+
+        # Every Task's result is needed until each of its consumers has run
+        self.consumers = {tid: len(children) for tid, children in self.dependents.items()}
+
+        # Let the scheduling policy look at the whole DAG before anything is ready
+        self.policy.prepare(tasks, self.dependents)
+
+        # Tasks restored from a checkpoint already completed in an earlier run -- only their dependents need to wait on them
+        for task in tasks:
+            if task.restored:
+                self.resultStore.put(task)
+                for child in self.dependents[task.tid]:
+                    self.indegree[child.tid] -= 1
+
+        # A Task (or stream group) that needs more than a whole resource pool would wait forever -- fail it (and skip what depends on it) up front
+        if self.resources:
+            for task in tasks:
+                if task.tid in self.groups and self.groups[task.tid][0] is not task:
+                    continue
+                reason = self.resources.check(*self.members(task))
+                if reason is not None and not task.restored:
+                    self._log.error(reason)
+                    task.error = ResourceError(reason)
+                    task.updateStatus('Failed')
+                    self.fail(task)
+
+        ready = QueueWarehouse.ready(self.policy)
+        for task in tasks:
+            if self.indegree[task.tid] == 0 and not task.restored and task.status not in ('Failed', 'Skipped'):
+                self.becomeReady(task, ready)
+        return ready
+
+    def streamsTo(self, task) -> bool:
+        """
+        Returns:
+            bool: True if the Task streams its chunks to the Tasks that depend on it in this run (it streams and wasn't restored from a checkpoint).
+        """
+        return task.streaming and not task.restored
+
+    def planGroups(self, tasks: List) -> None:
+        """
+        Puts every streaming Task and the Tasks reading its stream in one stream group (in self.groups, by the tid of every member). A Task
+        reading two streams joins the two groups.
+
+        Args:
+            tasks (List[Task]): Every Task in the run, in topological order.
+
+        Raises:
+            ValueError: If a member of a group can't run as part of one: it is mapped, its func is a coroutine function, or it waits on a member
+                of its own group that reads a stream without streaming itself (the two could only finish one after the other).
+        """
+        self.groups = {}
+        self.streams = {}
+        self.pushed = set()
+        self.opened = set()
+        self.unfinished = {}
+        self.extra = 0
+        for task in tasks:
+            for dep in self.upstream[task.tid]:
+                if not self.streamsTo(dep):
+                    continue
+                group = self.groups.setdefault(dep.tid, [dep])
+                other = self.groups.get(task.tid)
+                if other is None:
+                    group.append(task)
+                    self.groups[task.tid] = group
+                elif other is not group:
+                    group.extend(other)
+                    for member in other:
+                        self.groups[member.tid] = group
+
+        order = {task.tid: position for position, task in enumerate(tasks)}
+        groups = list({id(group): group for group in self.groups.values()}.values())
+        for group in groups:
+            group.sort(key=lambda member: order[member.tid])
+            for member in group:
+                if member.mapped or iscoroutinefunction(member.func):
+                    raise ValueError('Tasks %s is part of a stream, so it must be a plain function (not mapped or a coroutine function)' % member.name)
+                for dep in self.upstream[member.tid]:
+                    if self.groups.get(dep.tid) is group and not self.streamsTo(dep):
+                        raise ValueError('Tasks %s reads a stream and also waits for %s, which reads a stream of the same group. Make %s stream=True '
+                                         'or read the stream directly' % (member.name, dep.name, dep.name))
+
+        # Every member of a running group has its own thread
+        self.streamThreads = sum(len(group) for group in groups)
+
+    def members(self, task) -> List:
+        """
+        Returns:
+            List[Task]: The Tasks that start with this Task: every member of its stream group that still has to run, or just the Task.
+        """
+        group = self.groups.get(task.tid)
+        if group is None:
+            return [task]
+        return [member for member in group if not member.restored]
+
+    def becomeReady(self, task, ready: ReadyQueue) -> None:
+        """
+        Moves a Task with no unfinished dependencies to the ready queue. A member of a stream group waits until every member is ready, and
+        then the group is pushed as its first member.
+
+        Args:
+            task (Task): A Task whose dependencies have completed.
+            ready (ReadyQueue): The Tasks that are ready to run.
+        """
+        group = self.groups.get(task.tid)
+        if group is None:
+            task.markReady()
+            ready.push(task)
+            return
+        if group[0].tid in self.pushed or group[0].status in ('Failed', 'Skipped') or any(self.indegree[member.tid] for member in self.members(task)):
+            return
+        self.pushed.add(group[0].tid)
+        for member in self.members(task):
+            member.markReady()
+        ready.push(group[0])
+
+    def open(self, task) -> List:
+        """
+        Opens the streams of a stream group that is about to start.
+
+        Args:
+            task (Task): The Task taken from the ready queue.
+
+        Returns:
+            List[Task]: The Tasks to start: the Task, or every member of its stream group.
+        """
+        members = self.members(task)
+        if task.tid not in self.groups:
+            return members
+
+        for member in members:
+            self.opened.add(member.tid)
+            if self.streamsTo(member):
+                readers = [child.tid for child in self.dependents[member.tid] if not child.restored]
+                self.streams[member.tid] = ChunkStream(member.name, readers, self.streamBuffer)
+        self.unfinished[task.tid] = len(members)
+        self.extra += len(members) - 1
+        self._log.info('Streaming Tasks %s on Worker %s', ', '.join(str(member.name) for member in members), self.workerID)
+        return members
+
+    def leave(self, task) -> None:
+        """
+        Counts a member of a stream group as finished. The group holds one of the `workers` until its last member finishes.
+
+        Args:
+            task (Task): A Task that just finished.
+        """
+        group = self.groups.get(task.tid)
+        if group is None or task.tid not in self.opened:
+            return
+        self.unfinished[group[0].tid] -= 1
+        if self.unfinished[group[0].tid]:
+            self.extra -= 1
+
+    def releaseUpstream(self, task) -> None:
+        """
+        Counts the Task as done consuming its dependencies' results and drops the results nobody else needs.
+
+        Args:
+            task (Task): A Task that finished or will never run.
+        """
+        # A child's slice of the inputs is only needed while it runs
+        task.inputs = None
+        if not self.releaseResults:
+            return
+        for dep in self.upstream[task.tid]:
+            # A stream keeps no result (and the streaming Task may still be producing)
+            if dep.tid in self.streams:
+                continue
+            self.consumers[dep.tid] -= 1
+            if self.consumers[dep.tid] == 0 and not dep.keepResult:
+                self.resultStore.release(dep)
+
+    def fail(self, task) -> None:
+        """
+        Records a failed Task and marks every Task below it as Skipped, so none of them run with missing inputs.
+
+        Args:
+            task (Task): The Task that failed.
+        """
+        self.failed.append(task)
+        self._log.error('Tasks %s failed after %s attempt(s) on Worker %s', task.name, task.attempts, self.workerID)
+        self.releaseUpstream(task)
+
+        skipped = len(self.skipped)
+        pending = list(self.dependents[task.tid])
+        while pending:
+            child = pending.pop()
+            # Members of a running stream group fail (or finish) on their own once the stream ends
+            if child.status == 'Skipped' or child.tid in self.opened:
+                continue
+            child.updateStatus('Skipped')
+            self.skipped.append(child)
+            self.releaseUpstream(child)
+            pending.extend(self.dependents[child.tid])
+
+        if len(self.skipped) > skipped:
+            self._log.warning('Skipped %s Task(s) downstream of %s', len(self.skipped) - skipped, task.name)
+
+    def stopped(self) -> bool:
+        """
+        Returns:
+            bool: True if no new Task may start, because a Task failed with failFast=True or the run's deadline has passed.
+        """
+        return bool(self.failFast and self.failed) or (self.deadline is not None and time() >= self.deadline)
+
+    def skipRemaining(self) -> None:
+        """
+        Marks every Task that never started as Skipped once the Worker has stopped early.
+        """
+        for task in self.planned:
+            if task.status in ('Queued', 'Mapped'):
+                task.updateStatus('Skipped')
+                self.skipped.append(task)
+
+        if self.failed or self.skipped:
+            self._log.warning('%s Task(s) failed and %s were skipped on Worker %s', len(self.failed), len(self.skipped), self.workerID)
+
+    def complete(self, task, ready: ReadyQueue) -> None:
+        """
+        Records a completed Task, drops upstream results nobody needs anymore and moves every Task that was only waiting on it to the ready queue.
+        Failed Tasks are handed to fail() instead, so nothing below them becomes ready.
+
+        Args:
+            task (Task): The Task that just finished.
+            ready (ReadyQueue): The Tasks that are ready to run.
+        """
+        if task.status == 'Failed':
+            return self.fail(task)
+        if task.status == 'Mapped':
+            return self.addChildren(task, ready)
+
+        # Add the task that just finished to the resultStore
+        self.resultStore.put(task)
+
+        # This Task was the last consumer of some of its dependencies -- let their results be garbage collected
+        self.releaseUpstream(task)
+
+        # The Tasks reading a stream started with it
+        if task.tid in self.streams:
+            return
+
+        for child in self.dependents[task.tid]:
+            self.indegree[child.tid] -= 1
+            if self.indegree[child.tid] == 0:
+                self.becomeReady(child, ready)
+
+    def addChildren(self, task, ready: ReadyQueue) -> None:
+        """
+        Adds the children of a mapped Task that just expanded to the run. They depend on what the mapped Task depends on, so they are ready
+        straight away, and the mapped Task now waits for them. Children that completed in a checkpointed run are restored instead of run again.
+
+        Args:
+            task (Task): The mapped Task, with its children in task.children.
+            ready (ReadyQueue): The Tasks that are ready to run.
+        """
+        children = task.children
+        deps = self.upstream[task.tid]
+        if self.checkpoint is not None:
+            self.checkpoint.restore(children)
+
+        for child in children:
+            self.planned.append(child)
+            self.children.append(child)
+            self.dependents[child.tid] = [task]
+            self.upstream[child.tid] = deps
+            self.indegree[child.tid] = 0
+            self.consumers[child.tid] = 1
+            for dep in deps:
+                self.consumers[dep.tid] += 1
+        self.policy.adopt(children, task)
+
+        # The mapped Task now consumes its children's results instead of its dependencies'
+        self.releaseUpstream(task)
+        self.upstream[task.tid] = list(children)
+        self.indegree[task.tid] = len(children)
+        self._log.info('Mapped Tasks %s into %s partitions on Worker %s', task.name, len(children), self.workerID)
+
+        for child in children:
+            if child.restored:
+                self.complete(child, ready)
+            else:
+                child.updateStatus('Queued')
+                child.markReady()
+                ready.push(child)
+        if not children:
+            task.markReady()
+            ready.push(task)
+
+    def shutdown(self) -> int:
+        """
+        Stops the process pool (if one was started) and logs how many Tasks ran at the same time.
+
+        Returns:
+            int: The most Tasks that were running at once.
+        """
+        # A Task that timed out may still be running in a child process. Don't wait for it after a failure.
+        if self.processPool is not None:
+            self.processPool.shutdown(wait=not self.failed, cancel_futures=True)
+            self.processPool = None
+
+        self._log.info('Ran at most %s Tasks concurrently on Worker %s', self.peakConcurrency, self.workerID)
+        if self.resources:
+            self._log.info('Peak resource use on Worker %s: %s', self.workerID, ', '.join('%s %s/%s' % (name, self.resources.peak[name], capacity)
+                                                                                      for name, capacity in self.resources.capacities.items()))
+        return self.peakConcurrency
+
+    def releaseResources(self, task, lingering: dict) -> None:
+        """
+        Gives back the resources of a Task that stopped running. If its last attempt timed out but is still running (see Task.run), they are
+        only given back once it returns: the Task is added to lingering, keyed by the Future of that attempt.
+
+        Args:
+            task (Task): The Task that just finished.
+            lingering (dict): Abandoned attempts still holding resources, {Future: Task}.
+        """
+        abandoned = task.abandoned
+        if abandoned is None or abandoned.done() or not self.resources.demands(task):
+            self.resources.release(task)
+            return
+        self._log.warning('Holding the resources of %s on Worker %s until its timed out attempt returns', task.name, self.workerID)
+        lingering[abandoned] = task
+
+    def take(self, ready: ReadyQueue):
+        """
+        Takes the next ready Task whose resources are free and reserves them.
+
+        Args:
+            ready (ReadyQueue): The Tasks that are ready to run.
+
+        Returns:
+            Task: The Task to start, or None if every ready Task is waiting for resources.
+        """
+        if not self.resources:
+            return ready.pop()
+        task = ready.pop(lambda task: self.resources.fits(*self.members(task)))
+        if task is not None:
+            self.resources.acquire(*self.members(task))
+        return task
+
+    def run(self):
+        """
+        Dispatches Tasks to the thread pool as soon as their dependencies are met, and keeps going until every Task from the taskQueue has completed, failed or been skipped.
+        """
+
+        ready = self.plan()
+        running = {}
+        lingering = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers + self.streamThreads, thread_name_prefix='Worker-%s' % self.workerID) as pool:
+            while (ready and not self.stopped()) or running:
+                # Fill every free thread with a ready Task whose resources are free. A stream group takes one worker for all of its members.
+                while ready and len(running) - self.extra < self.workers and not self.stopped():
+                    task = self.take(ready)
+                    if task is None:
+                        break
+                    for member in self.open(task):
+                        running[pool.submit(self.execute, member)] = member
+                self.peakConcurrency = max(self.peakConcurrency, len(running))
+                # Ready Tasks may be waiting for the resources of an abandoned attempt
+                if not running and not (ready and lingering and not self.stopped()):
+                    break
+
+                # Wait for at least one Task to finish, then release the Tasks that were waiting on it.
+                done, _ = wait(list(running) + list(lingering), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in lingering:
+                        self.resources.release(lingering.pop(future))
+                        continue
+                    task = running.pop(future)
+                    future.result()
+                    self.releaseResources(task, lingering)
+                    self.leave(task)
+                    self.complete(task, ready)
+
+        self.skipRemaining()
+        return self.shutdown()
+
     def end(self):
         """
-        Ends the execution. 
+        Ends the execution.
         """
-        # Stops execution of Tasks by deleting the resultQueue
-        del self.resultQueue
-        
\ No newline at end of file
+        # Stops execution of Tasks by dropping the Worker's reference to the resultStore
+        del self.resultStore
+
+
+class AsyncWorker(Worker):
+    """
+    A Worker that runs on an asyncio event loop instead of a thread pool. Coroutine Task functions are awaited directly, so many I/O-bound Tasks
+    can overlap on one thread. Regular functions are handed off to a thread so they don't block the loop. Used when a Pipeline has type='asyncio'.
+    asyncio is imported inside the methods so the thread pool Worker doesn't pay for importing it.
+    """
+
+    async def start(self):
+        """
+        Starts execution. Must be awaited on a running event loop.
+        """
+        self._log.info('Starting Job %s', self.job_id)
+        return await self.run()
+
+    async def execute(self, task):
+        """
+        Runs a single Task on the event loop.
+
+        Args:
+            task (Task): A Task whose dependencies have all completed.
+
+        Returns:
+            Task: The Task that was executed.
+        """
+        import asyncio
+
+        with logContext(runID=self.runID, taskID=task.tid):
+            # Expanding a mapped Task and combining its children's results can block (a query, a concat), so both happen off the loop
+            if task.status == 'Mapped' or task.mapped:
+                return await asyncio.to_thread(super().execute, task)
+
+            # Members of a stream group wait on each other's buffers, so each gets a thread of its own
+            if task.tid in self.groups:
+                return await asyncio.get_running_loop().run_in_executor(self.streamPool, super().execute, task)
+
+            try:
+                task.updateStatus('Running')
+                self._log.info('Running Tasks %s on Worker %s', task.name, self.workerID)
+
+                if await asyncio.to_thread(self.loadCached, task):
+                    await asyncio.to_thread(self.saveCheckpoint, task)
+                    task.updateStatus('Completed')
+                    return task
+
+                await task.arun(self.getInputs(task), pool=self.getPool(task), deadline=self.deadline)
+                return await asyncio.to_thread(self.finish, task)
+            except Exception as error:
+                return self.failOutside(task, error)
+
+    async def run(self):
+        """
+        Schedules Tasks on the event loop as soon as their dependencies are met, with at most `workers` Tasks in flight.
+        """
+
+        import asyncio
+
+        ready = self.plan()
+        running = set()
+        lingering = {}
+        self.streamPool = ThreadPoolExecutor(max_workers=self.streamThreads, thread_name_prefix='Worker-%s-stream' % self.workerID) if self.groups else None
+
+        while (ready and not self.stopped()) or running:
+            while ready and len(running) - self.extra < self.workers and not self.stopped():
+                task = self.take(ready)
+                if task is None:
+                    break
+                for member in self.open(task):
+                    running.add(asyncio.ensure_future(self.execute(member)))
+            self.peakConcurrency = max(self.peakConcurrency, len(running))
+            if not running and not (ready and lingering and not self.stopped()):
+                break
+
+            waiting = {asyncio.wrap_future(abandoned): abandoned for abandoned in lingering}
+            done, _ = await asyncio.wait(running | set(waiting), return_when=asyncio.FIRST_COMPLETED)
+            running -= done
+            for future in done:
+                if future in waiting:
+                    self.resources.release(lingering.pop(waiting[future]))
+                    continue
+                task = future.result()
+                self.releaseResources(task, lingering)
+                self.leave(task)
+                self.complete(task, ready)
+
+        if self.streamPool is not None:
+            self.streamPool.shutdown()
+        self.skipRemaining()
+        return self.shutdown()
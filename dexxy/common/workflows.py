@@ -1,65 +1,197 @@
 import pickle
-from dexxy.common.logger import LoggingStuff
+from dexxy.common.logger import LoggingStuff, flushLogging, logContext
 from dexxy.common.queues import QueueWarehouse
 from dexxy.common.tasks import Task, createTask
-from dexxy.common.workers import Worker
-from dexxy.common.scheduler import Scheduler
-from dexxy.common.exceptions import DependencyError, NotFoundError, CircularDependencyError, MissingDependencyError
-from typing import Any, List, Literal, Tuple, Dict, Type
+from dexxy.common.workers import Worker, AsyncWorker
+from dexxy.common.results import ResultStore
+from dexxy.common.history import DurationHistory
+from dexxy.common.cache import TaskCache
+from dexxy.common.checkpoints import Checkpoint
+from dexxy.common.reports import RunReport
+from dexxy.common.graphs import DAG
+from dexxy.common.utils import generateUniqueID
+from time import time
+from dexxy.common.exceptions import DependencyError, NotFoundError, CircularDependencyError, MissingDependencyError, TaskFailedError
+from typing import Any, List, Literal, Set, Tuple, Dict, Type, TypeVar
 from uuid import uuid4
-from networkx import MultiDiGraph, compose, is_directed_acyclic_graph, is_weakly_connected, topological_sort
+
+Broker = TypeVar('Broker')
 
 
 class Pipeline(LoggingStuff):
-    """A Directed Acyclic MultiGraph based Pipeline for Data Processing. """
+    """A Directed Acyclic Graph based Pipeline for Data Processing. """
 
     pipeline_id = 0
 
-    def __init__(self, steps: List[Task] = [], type: Literal['default'] = 'default'):
+    def __init__(self, steps: List[Task] = [], type: Literal['default', 'asyncio'] = 'default'):
 
         Pipeline.pipeline_id += 1
         self.pid = Pipeline.pipeline_id
-        self.dag = MultiDiGraph()
-        self.scheduler = Scheduler()
+        self.dag = DAG()
+        self.task_index: Dict[str, Task] = {}
+        self.components: Dict[str, str] = {}
+        self._scheduler = None
+        self.plan_file = None
+        self.collected: List[Task] = []
         self.steps = [step if isinstance(step, Pipeline) else createTask(step) for step in steps]
         self.type = type
         self._log = self.logger
         self.queue = QueueWarehouse.warehouse(type=type)
-        self._log.info('Initalized Pipeline %s' % self.pid)
+        self._log.info('Initalized Pipeline %s', self.pid)
+
+    @property
+    def scheduler(self):
+        """
+        The Scheduler (an APScheduler BackgroundScheduler) used to run this Pipeline on a schedule. It is created the first time it is used,
+        so Pipelines that are only composed, saved or run once don't import APScheduler.
+        """
+        if self._scheduler is None:
+            from dexxy.common.scheduler import Scheduler
+            self._scheduler = Scheduler()
+        return self._scheduler
 
     def validate_dag(self) -> None:
         """
         Validates Pipeline is constructed properly. Essentially checks to see if it is a DAG and is NOT weakly connected. 
+        Cycles are already rejected edge by edge as the DAG is built (see add_edge_to_dag), and connectivity is tracked as nodes are linked,
+        so this only has to count the connected components.
         
         Raises:
-            CircularDependencyError: Error if DAG contains cycles
             MissingDependencyError: Error raised if DAG contains disconnected nodes
         """
 
-        # Validate DAG does not have cycles
-        if not is_directed_acyclic_graph(self.dag):
-            raise CircularDependencyError("DAG Contains Cycles.")
-
         # Validate DAG does not have weakly connected nodes
-        if not is_weakly_connected(self.dag):
+        if len({self.find_component(tid) for tid in self.dag}) != 1:
             raise MissingDependencyError("DAG Contains Weakly Connected Nodes")
+
+    def find_component(self, tid: int) -> int:
+        """
+        Finds the weakly connected component a node belongs to (union-find with path halving).
+
+        Args:
+            tid (int): The node's Task unique ID
+
+        Returns:
+            int: The tid that represents the node's component.
+        """
+        self.components.setdefault(tid, tid)
+        while self.components[tid] != tid:
+            self.components[tid] = self.components[self.components[tid]]
+            tid = self.components[tid]
+        return tid
+
+    def link_nodes(self, tid_from: int, tid_to: int) -> None:
+        """
+        Records that two nodes are connected by an edge.
+        """
+        root_from, root_to = self.find_component(tid_from), self.find_component(tid_to)
+        if root_from != root_to:
+            self.components[root_from] = root_to
+
+    def find_path(self, source: int, target: int) -> List[int]:
+        """
+        Looks for a directed path between two nodes.
+
+        Args:
+            source (int): The tid to start from
+            target (int): The tid to reach
+
+        Returns:
+            List[int]: The tids along the path (including both ends), or None if target can't be reached.
+        """
+        parents = {source: None}
+        stack = [source]
+        while stack:
+            node = stack.pop()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            for child in self.dag.successors(node):
+                if child not in parents:
+                    parents[child] = node
+                    stack.append(child)
+        return None
+
+    def check_edge(self, tid_from: int, tid_to: int) -> None:
+        """
+        Makes sure an edge can be added without creating a cycle. A cycle is only possible if tid_to can already reach tid_from,
+        which can only happen when tid_to is already in the DAG with edges going out of it, so new Tasks cost nothing to check.
+
+        Raises:
+            CircularDependencyError: Names the Tasks that form the cycle.
+        """
+        if tid_from == tid_to:
+            path = [tid_from, tid_to]
+        elif tid_to in self.dag and self.dag.outDegree(tid_to) and tid_from in self.dag:
+            path = self.find_path(tid_to, tid_from)
+            if path is None:
+                return
+            path.append(tid_to)
+        else:
+            return
+
+        names = []
+        for tid in path:
+            task = self.dag.task(tid) if tid in self.dag else None
+            names.append(task.name if task is not None else tid)
+        raise CircularDependencyError("DAG Contains Cycles: %s" % ' -> '.join(str(name) for name in names))
+
+    def index_task(self, task: Task) -> None:
+        """
+        Makes a Task findable by name. If two Tasks share a name, the first one added wins.
+        """
+        if task.name is not None:
+            self.task_index.setdefault(task.name, task)
+
+    def rebuild_indexes(self) -> None:
+        """
+        Rebuilds the name index and connectivity from self.dag, e.g. after loading a saved DAG.
+        """
+        self.task_index = {}
+        self.components = {}
+        for task in self.tasks():
+            self.index_task(task)
+        for tid_from, tid_to, pid in self.dag.edges():
+            self.link_nodes(tid_from, tid_to)
         
     def merge_dags(self, pipeline: "Pipeline") -> None:
         """
         Allow a Pipeline object to receive another Pipeline object by merging two Graphs together and preserving attributes.
         
-        Returns a new graph of self composed with G. Composition is the simple union of the node sets and edge sets. The node sets of G and self.dag do not need to be disjoint. \
-            Note: Edges in G that have the same edge key as edges in H will be overwritten with edges from self.dag.
+        A Pipeline that hasn't been composed yet is composed straight into self.dag, so nothing is copied. Otherwise the nodes and edges of its DAG
+        are added to self.dag in place. The node sets do not need to be disjoint: for nodes in both, self.dag's Task wins. Edges already in self.dag are kept.
             
         Args:
-            self (MultiDiGraph): First MultiDiGraph Instance
+            self (DAG): First DAG Instance
             pipeline (Pipeline): A Pipeline object that contains Task(s). 
         """
-        
+
+        if len(pipeline.dag) == 0:
+            pipeline.dag = self.dag
+            pipeline.components = self.components
+            pipeline.compose(self)
+            for name, task in pipeline.task_index.items():
+                self.task_index.setdefault(name, task)
+            return
+
         pipeline.compose(self)
         G = pipeline.dag
-        self.dag = compose(G, self.dag)
-        self.repair_attributes(G, self.dag, 'tasks')
+
+        for node in G:
+            if node not in self.dag or self.dag.task(node) is None:
+                self.dag.addNode(node, G.task(node))
+            self.find_component(node)
+
+        for tid_from, tid_to, pid in G.edges():
+            if not self.dag.hasEdge(tid_from, tid_to):
+                self.check_edge(tid_from, tid_to)
+                self.dag.addEdge(tid_from, tid_to, pid)
+            self.link_nodes(tid_from, tid_to)
+        for name, task in pipeline.task_index.items():
+            self.task_index.setdefault(name, task)
 
     def proc_pipeline_dep(self, idx, task, dep):
         """
@@ -79,11 +211,8 @@ class Pipeline(LoggingStuff):
         # gets the last step from the pipeline dependency
         dep_task = dep.steps[-1]
 
-        # Update the task with uuids of related runs
-        if dep.dag.nodes[dep_task.tid].get('tasks', None) is not None:
-            for k in dep.dag.nodes[dep_task.tid]['tasks'].keys():
-                task.related.append(k)
-        else:
+        # The Pipeline's last Task must be in its DAG
+        if dep_task.tid not in dep.dag or dep.dag.task(dep_task.tid) is None:
             raise DependencyError(f'{dep} was not found in {self.__name__}, check pipeline steps.')
 
         # Replace the Pipeline References with Task Reference
@@ -108,24 +237,44 @@ class Pipeline(LoggingStuff):
             (task, dep_task): The Task and dependent Task
         """
         
-        try:
-            dep_task = self.get_task_by_name(name=dep)
+        # Look in this Pipeline first, then in the Pipeline it is being merged into
+        if dep in self.task_index:
+            dep_task = self.task_index[dep]
             dag = self.dag
-        except BaseException:
+        elif input_pipe is not None:
             dep_task = input_pipe.get_task_by_name(name=dep)
             dag = input_pipe.dag
+        else:
+            raise NotFoundError(f"{dep} was not found in the DAG")
 
         task.dependsOn[idx] = dep_task
 
         # Lookup dependent task from the current pipeline or the called pipeline
-        if dag.nodes[dep_task.tid].get('tasks', None) is not None:
-            for k in dag.nodes[dep_task.tid]['tasks'].keys():
-                task.related.append(k)
-        else:
+        if dep_task.tid not in dag or dag.task(dep_task.tid) is None:
             raise DependencyError(f'{dep_task} was not found in {self.__name__}, check pipeline steps.')
 
         return (task, dep_task)
 
+    def proc_task_dep(self, task: Task, dep: Task, input_pipe: "Pipeline"):
+        """
+        Process Dependencies that an earlier compose() already resolved to a Task, e.g. when a composed Pipeline is merged into another one
+
+        Args:
+            task (Task): The Task to process dependencies of. 
+            dep (Task): The dependncy to evaluate
+            input_pipe (Pipeline): A Pipeline which could a previous pipeline we'll need to pull dependencies from. 
+
+        Raises:
+            DependencyError: Thrown if the dependency was not found in the Pipeline. 
+
+        Returns:
+            (task, dep_task): The Task and dependent Task
+        """
+        for dag in (self.dag, input_pipe.dag if input_pipe is not None else None):
+            if dag is not None and dep.tid in dag and dag.task(dep.tid) is not None:
+                return (task, dep)
+        raise DependencyError(f'{dep.name} was not found in Pipeline {self.pid}, check pipeline steps.')
+
     def process_dep(self, idx: int, task: Task, dep: Any, input_pipe: "Pipeline") -> Tuple[Task, Task]:
         """
         Basic Factory function for processing dependencies.
@@ -147,6 +296,8 @@ class Pipeline(LoggingStuff):
             return self.proc_pipeline_dep(idx, task, dep)
         elif isinstance(dep, str):
             return self.proc_named_dep(idx, task, dep, input_pipe)
+        elif isinstance(dep, Task):
+            return self.proc_task_dep(task, dep, input_pipe)
         else:
             raise TypeError("Invalid Dependencies found in {self.__name__}: Task {task.__name__} ")
 
@@ -161,13 +312,10 @@ class Pipeline(LoggingStuff):
         Returns:
             Task: The task that matches the name parameter.
         """
-        for tsk_attrs in dict(self.dag.nodes(data='tasks', default=None)).values():
-            if tsk_attrs is not None:
-                for tsk in tsk_attrs.values():
-                    if tsk.name == name:
-                        return tsk
-
-        raise NotFoundError(f"{name} was not found in the DAG")
+        try:
+            return self.task_index[name]
+        except KeyError:
+            raise NotFoundError(f"{name} was not found in the DAG")
 
     def compose(self, input_pipe: "Pipeline" = None) -> None:
         """
@@ -189,51 +337,256 @@ class Pipeline(LoggingStuff):
                     # Add edge to DAG using task id as an edge key
                     self.add_edge_to_dag(self.pid, dep_task.tid, task.tid, task.tid)
 
-            # Add Task to node with related keys
-            task.related = list(dict.fromkeys(task.related).keys())
+            # Add Task to node
             self.add_node_to_dag(task)
 
-        # Validates DAG was constructed properly
-        self.validate_dag()
+        # Validates DAG was constructed properly. Cycles were rejected as edges were added, and nested Pipelines are only
+        # checked for connectivity as part of the Pipeline they are merged into.
+        if input_pipe is None:
+            self.validate_dag()
+
+    def select(self, targets: List[str], direction: Literal['upstream', 'downstream'] = 'upstream') -> Set[int]:
+        """
+        Works out which Tasks a run of only some targets needs.
+            'upstream'   -- the targets and every Task they depend on, e.g. loadFilm with its extract, transform, table and cursor.
+            'downstream' -- the targets and every Task that depends on them, plus whatever those Tasks need as inputs. Results are passed in memory,
+                            so the inputs have to be produced (or restored from a checkpoint when resuming) in the same run.
+
+        Args:
+            targets (List[str]): Task names, e.g. ['loadFilm'].
+            direction (Literal[upstream, downstream], optional): Which way to walk from the targets. Defaults to 'upstream'.
+
+        Raises:
+            NotFoundError: If a target isn't in the DAG.
+            ValueError: If direction is neither 'upstream' nor 'downstream'.
+
+        Returns:
+            Set[int]: The tids of the Tasks to run.
+        """
+        if direction not in ('upstream', 'downstream'):
+            raise ValueError(f"direction must be 'upstream' or 'downstream', not {direction!r}")
+
+        selected = [self.get_task_by_name(name).tid for name in targets]
+        if direction == 'downstream':
+            selected = self.dag.closure(selected, 'downstream')
+        return self.dag.closure(selected, 'upstream')
 
-    def collect(self) -> None:
+    def collect(self, targets: List[str] = None, direction: Literal['upstream', 'downstream'] = 'upstream') -> None:
         """
-        Enqueues all Tasks from the constructed DAG in topological sort order
+        Enqueues all Tasks from the constructed DAG in topological sort order. Given targets, only the Tasks they need are enqueued (see select),
+        so refreshing one dimension runs its own extract -> transform -> load chain instead of the whole DAG.
+
+        Whatever an earlier run recorded on the Tasks (status, result, error, and whether they were restored from a checkpoint) is cleared first,
+        so every collected Task runs again. run(resume=True) restores the checkpointed Tasks after this.
+
+        Args:
+            targets (List[str], optional): Names of the Tasks to run. Defaults to None (every Task).
+            direction (Literal[upstream, downstream], optional): Run the targets with what they depend on, or with what depends on them. Defaults to 'upstream'.
         """
 
         # Defining a Queue. 
         self.queue = QueueWarehouse.warehouse(self.type)
-        
-        # Begin Enqueuing all Tasks in the DAG
-        nodes = dict(self.dag.nodes(data=True))
-        
-        # Get Topological sort of Task Nodes by Id
-        for task_node_id in list(topological_sort(G=self.dag)):
-            # Lookup each task in a node
-            n_attrs = nodes[task_node_id]
+        selected = self.select(targets, direction) if targets else None
+        self.collected = []
+        for task in self.tasks():
+            task.reset()
+
+        # Get Topological sort of Task Nodes by Id and begin Enqueuing all Tasks in the DAG
+        for task_node_id in self.dag.topologicalOrder():
+            # Lookup the task in each node
+            v = self.dag.task(task_node_id)
+            if v is None:
+                continue
+            if selected is not None and task_node_id not in selected:
+                continue
             # Enqueue Tasks & update status
-            for v in n_attrs['tasks'].values():
-                self.queue.put(v)
-                v.updateStatus('Queued')
-
-    def run(self) -> Any:
+            self.queue.put_nowait(v)
+            v.updateStatus('Queued')
+            self.collected.append(v)
+
+        if selected is not None:
+            self._log.info('Collected %s of %s Tasks for %s (%s)', len(self.collected), len(self.tasks()), ', '.join(targets), direction)
+
+    def run(self, workers: int = 1, executor: Literal['thread', 'process'] = 'thread', release_results: bool = True, spill_threshold: int = None, spill_dir: str = None,
+            policy: Literal['fifo', 'critical_path'] = 'fifo', history: str = None, report: str = None,
+            cache: str = None, cache_size: int = 2 * 1024 ** 3, checkpoint: str = None, resume: bool = False,
+            fail_fast: bool = False, deadline: float = None, broker: Broker = None, targets: List[str] = None,
+            direction: Literal['upstream', 'downstream'] = 'upstream', resources: Dict[str, float] = None, stream_buffer: int = 8) -> Any:
         """
-        Allows for Local Execution of a Pipeline Instance. When called, a queue is generated, the Worker is set up, log shows beginning execution, and the worker is started. 
-        Once completed, the worker is ended (by deleting the result queue)
+        Allows for Local Execution of a Pipeline Instance. When called, a result store is generated, the Worker is set up, log shows beginning execution, and the worker is started.
+        Once completed, the worker is ended. The completed Tasks stay available in self.result_store (see get_result).
+
+        The Worker dispatches each Task as soon as the Tasks it depends on have completed, so with workers > 1 independent Tasks (like the extracts) run at the same time.
+        If the Pipeline was created with type='asyncio', an AsyncWorker runs the Tasks on an event loop and coroutine Task functions are awaited.
+
+        A Task that still fails after its retries (see Task(retries=, timeout=)) is marked Failed and every Task downstream of it is Skipped, while independent
+        branches finish. The history, report and checkpoint are written as usual and then TaskFailedError is raised, so the run can be resumed.
+
+        Args:
+            workers (int, optional): The number of Tasks allowed to run concurrently. Defaults to 1.
+            executor (Literal[thread, process], optional): Where to run Tasks that don't set their own executor. 'process' runs them in a process pool. Defaults to 'thread'.
+            release_results (bool, optional): Drop each Task's result once all of its consumers have run, unless the Task was created with keepResult=True. Defaults to True.
+            spill_threshold (int, optional): DataFrame results larger than this many bytes are written to an Arrow file and memory-mapped again by the Tasks that use them. Defaults to None (keep everything in memory).
+            spill_dir (str, optional): The folder for spilled results. Defaults to None, which uses a temporary folder.
+            policy (Literal[fifo, critical_path], optional): How to pick between ready Tasks. 'critical_path' starts the Task with the longest remaining path
+                (by recorded durations) first. Defaults to 'fifo'.
+            history (str, optional): A JSON file of per-Task durations from earlier runs. It is read before the run and updated afterwards. Defaults to None.
+            report (str, optional): Where to write a run report with every Task's timestamps, waits, duration, result size and error.
+                Paths ending in .csv are written as CSV, anything else as JSON. Defaults to None (no report).
+            cache (str, optional): A folder to cache Task results in. Tasks whose code, kwargs and upstream Tasks are unchanged since a previous run
+                reuse the cached result instead of running (unless created with cacheable=False). Defaults to None (no cache).
+            cache_size (int, optional): The most disk space the cache may use, in bytes. Least recently used results are removed first. Defaults to 2 GiB.
+            checkpoint (str, optional): A run directory to record completed Tasks and their results in, so a failed run can be resumed. Defaults to None.
+            resume (bool, optional): Continue the run recorded in `checkpoint` -- Tasks that completed there are restored and only the rest run. Defaults to False.
+            fail_fast (bool, optional): Stop starting new Tasks after the first failure instead of only skipping the failed Task's descendants. Defaults to False.
+            deadline (float, optional): Seconds the whole run may take. After that no new Task starts and running Tasks time out. Defaults to None (no deadline).
+            broker (Broker, optional): A broker from QueueWarehouse.broker(). Tasks that run with executor='process' are put on it and run by BrokerWorker
+                processes (on this host or others) instead of the local process pool. Defaults to None.
+            targets (List[str], optional): Run only these Tasks and what they need, e.g. ['loadFilm']. The DAG is collected again with collect(targets, direction).
+                Defaults to None (run whatever was collected).
+            direction (Literal[upstream, downstream], optional): With targets, 'upstream' runs them after the Tasks they depend on and 'downstream'
+                also runs every Task that depends on them. Defaults to 'upstream'.
+            resources (Dict[str, float], optional): The capacity of each resource pool, e.g. {'db': 4, 'mem_gb': 16}. A Task created with
+                resources={'db': 1} only starts while a 'db' unit is free, whatever workers is. Pools that aren't listed are unlimited. Defaults to None.
+            stream_buffer (int, optional): The most chunks a streaming Task (Task(stream=True)) may get ahead of each Task reading its stream.
+                Memory held by a stream is bounded by this many chunks per reader, not by the size of the table. Defaults to 8.
+
+        Raises:
+            TaskFailedError: If any Task failed or was skipped.
+
+        Returns:
+            int: The most Tasks that were running at the same time.
         """
-        
-        self.result_queue = QueueWarehouse.warehouse(self.type)
 
-        # Setup Default Worker
-        worker = Worker(taskQueue=self.queue, resultQueue=self.result_queue)
+        if targets:
+            self.collect(targets, direction)
+
+        self.run_id = generateUniqueID()
+        started = time()
+        self.result_store = ResultStore(spillThreshold=spill_threshold, spillDir=spill_dir)
+        durations = DurationHistory(history)
+        scheduling = QueueWarehouse.policy(policy, durations=durations.durations)
+        task_cache = TaskCache(cache, maxBytes=cache_size) if cache is not None else None
+
+        run_checkpoint = Checkpoint(checkpoint) if checkpoint is not None else None
+        if run_checkpoint is not None and resume:
+            run_checkpoint.load()
+            restored = run_checkpoint.restore(self.tasks())
+            self._log.info('Resuming from %s with %s Tasks already completed', checkpoint, restored)
+        elif run_checkpoint is not None:
+            run_checkpoint.reset(self.run_id)
+
+        options = dict(taskQueue=self.queue, resultStore=self.result_store, workers=workers, executor=executor, releaseResults=release_results,
+                       policy=scheduling, cache=task_cache, checkpoint=run_checkpoint, runID=self.run_id,
+                       failFast=fail_fast, deadline=started + deadline if deadline is not None else None, broker=broker,
+                       resources=resources, streamBuffer=stream_buffer)
 
         # Start execution of Tasks
-        self._log.info('Starting Execution')
-        worker.start()
-        
+        with logContext(runID=self.run_id):
+            self._log.info('Starting Execution')
+            if self.type == 'asyncio':
+                import asyncio
+                worker = AsyncWorker(**options)
+                self.peak_concurrency = asyncio.run(worker.start())
+            else:
+                # Setup Default Worker
+                worker = Worker(**options)
+                self.peak_concurrency = worker.start()
+
         # Ends execution of Tasks
         worker.end()
+
+        # Remember how long each Task took for the next run's scheduling
+        durations.record(self.result_store.tasks())
+        durations.save()
+
+        if report is not None:
+            RunReport(self.run_id, list(self.collected or self.tasks()) + worker.children, startedAt=started, finishedAt=time(), workers=workers,
+                      peakConcurrency=self.peak_concurrency, policy=policy).write(report)
+            self._log.info('Wrote run report to %s', report)
+
+        # The log is written by a background thread. Let it catch up so the caller's next print() comes after the run's lines.
+        flushLogging()
+        if worker.failed or worker.skipped:
+            raise TaskFailedError('%s Task(s) failed (%s) and %s were skipped in run %s' % (
+                len(worker.failed), ', '.join(str(task.name) for task in worker.failed), len(worker.skipped), self.run_id))
+
+        return self.peak_concurrency
         
+    def resume(self, checkpoint: str, **kwargs) -> Any:
+        """
+        Resumes a failed run from its run directory. Only the Tasks that had not completed (or whose results could not be saved) are run again.
+            Example:
+                workflow = Pipeline().openDAG('dags/dvd_pipeline')
+                workflow.collect()
+                workflow.resume('runs/dvd_pipeline')
+
+        Args:
+            checkpoint (str): The run directory passed as checkpoint= to the failed run.
+            kwargs: Any other options accepted by run().
+
+        Returns:
+            int: The most Tasks that were running at the same time.
+        """
+        return self.run(checkpoint=checkpoint, resume=True, **kwargs)
+
+    def schedule(self, trigger: Literal['interval', 'cron', 'date'] = 'interval', max_concurrent_runs: int = 1, coalesce: bool = True,
+                 misfire_grace_time: int = 60, keep_warm: List[str] = None, start: bool = True, job_id: str = None, run_options: Dict = None, **trigger_args) -> Any:
+        """
+        Runs this Pipeline on a schedule using self.scheduler. The DAG must already be composed (or opened with openDAG); it is reused by every run.
+            Example:
+                workflow = Pipeline().openDAG('dags/dvd_pipeline')
+                workflow.schedule('interval', minutes=5, keep_warm=['openPool'], run_options={'workers': 4})
+                workflow.schedule('cron', hour=2, minute=30)
+
+        A run that is still going when the next one is due doesn't pile up behind it: runs beyond max_concurrent_runs are skipped, and with coalesce=True
+        firings missed while the host was busy become a single run. Tasks named in keep_warm keep their results (e.g. an open connection pool) for later runs; they are
+        closed and re-created after a failed run.
+
+        Args:
+            trigger (Literal[interval, cron, date], optional): The APScheduler trigger. Defaults to 'interval'.
+            max_concurrent_runs (int, optional): How many runs may overlap. Overlapping runs get their own copy of the DAG, opened from the compiled plan. Defaults to 1.
+            coalesce (bool, optional): Run once instead of once per missed firing. Defaults to True.
+            misfire_grace_time (int, optional): Seconds a run may start late before it is skipped. Defaults to 60.
+            keep_warm (List[str], optional): Names of Tasks whose results are reused between runs. Defaults to None.
+            start (bool, optional): Start the scheduler if it isn't running yet. Defaults to True.
+            job_id (str, optional): The job's ID. Scheduling the same ID again replaces the job. Defaults to None.
+            run_options (Dict, optional): Keyword arguments for run(), e.g. {'workers': 4, 'report': 'dags/run_report.json'}. Defaults to None.
+            trigger_args: The trigger's fields, e.g. minutes=5 for 'interval' or hour=2 for 'cron', and APScheduler job options such as next_run_time.
+
+        Returns:
+            Job: The APScheduler job. self.scheduler.scheduled[job.id] counts its runs and failures.
+        """
+        job = self.scheduler.schedulePipeline(self, trigger, id=job_id, maxConcurrentRuns=max_concurrent_runs, coalesce=coalesce,
+                                              misfireGraceTime=misfire_grace_time, keepWarm=keep_warm, runOptions=run_options, **trigger_args)
+        if start and not self.scheduler.running:
+            self.scheduler.start()
+        self._log.info('Scheduled Pipeline %s (%s)', self.pid, job.trigger)
+        return job
+
+    def tasks(self) -> List[Task]:
+        """
+        Lists every Task in the DAG
+
+        Returns:
+            List[Task]: The Tasks of every node.
+        """
+        return self.dag.tasks()
+
+    def get_result(self, name: str) -> Any:
+        """
+        Retrieves the output of a Task from the last run using its name. Results of Tasks that other Tasks depend on are released during the run
+        unless the Task was created with keepResult=True or the Pipeline ran with release_results=False.
+
+        Args:
+            name (str): The name of the Task
+        Raises:
+            NotFoundError: Complains if the task has not completed
+        Returns:
+            Any: Whatever the Task's func returned.
+        """
+        return self.result_store.getResult(name)
+
     def add_node_to_dag(self, task: Type[Task] = None, properties: Dict = None) -> None:
         """
         Adds a new Node to the DAG with attributes
@@ -242,18 +595,13 @@ class Pipeline(LoggingStuff):
             task (Type[Task], optional): Task Instance. Defaults to None.
             properties (Dict, optional): User Properties. Defaults to None.
         """
-        # if the node already exists
-        if task.tid in list(self.dag.nodes):
-            existing = dict(self.dag.nodes(data='tasks')).get(task.tid, None)
-            if existing is not None:
-                updates = existing.update({task.tid: task})
-                return
-            else:
-                updates = {task.tid: task}
-        else:
-            updates = {task.tid: task}
-        # Add a new node to the DAG
-        self.dag.add_nodes_from([(task.tid, {"id": task.tid, "tasks": updates, "properties": properties})])
+        self.index_task(task)
+        self.find_component(task.tid)
+
+        # Add a new node to the DAG (or attach the Task to a node an edge already created)
+        node = self.dag.addNode(task.tid, task)
+        if properties is not None:
+            self.dag.properties[node] = properties
 
     def add_edge_to_dag(self, pid: int, tid_from: int, tid_to: int, activity_id: uuid4) -> None:
         """
@@ -262,42 +610,17 @@ class Pipeline(LoggingStuff):
         Args:
             tid_from (int): The dependency Task unique ID "tid"
             tid_to (int): The Task unique ID "tid"
-            activity_id (uuid): Task Id used to define the edge
+            activity_id (uuid): Task Id used to define the edge. Edges are identified by their two nodes, so this is only kept for compatibility.
         """
-        # Add the edge to the DAG
-        self.dag.add_edges_from([(tid_from, tid_to, activity_id, {"pid": pid, "tid_from": tid_from, "tid_to": tid_to,})])
+        # Refuse edges that would close a cycle, then add the edge to the DAG
+        self.check_edge(tid_from, tid_to)
+        self.dag.addEdge(tid_from, tid_to, pid)
+        self.link_nodes(tid_from, tid_to)
 
-    def repair_attributes(self, G: MultiDiGraph, H: MultiDiGraph, attr: str) -> None:
-        """
-        Preserved node attributes that may be overwritten when using merge. Note: this method only works if the attribute being preserved is a dictionary
-        
-        Args:
-            G (MultiDiGraph): left graph
-            H (MultiDiGraph): right graph
-            attr (str): name of attribute
-        """
-        
-        # Looping through each node in G
-        for node in G.nodes():
-            # If the node is also in H
-            if node in H:
-                # If this nodes has an attribute(s)
-                if self.dag.nodes[node].get(attr, None) is not None:
-                    # Save those attributes
-                    attr_G = G.nodes[node].get(attr)
-                    if attr_G is not None:
-                        attr_H = H.nodes[node].get(attr)
-                        # If the attributes are = then we're good. Continue to next iteration. 
-                        if attr_G == attr_H:
-                            continue
-                        # Otherwise, repair the attirbutes on this node. 
-                        else:
-                            attr_G.update(attr_H)
-                            self.dag.nodes[node][attr] = attr_G
-                            
     def saveDAG(self, filename):
         """
-        In order to save a DAG and execute later, we take in the pipeline, seralize the DAG with pickle, then save the dag to a file/path specified in filename. 
+        In order to save a DAG and execute later, we compile the composed DAG into a plan file (see dexxy/common/plans.py) at the path specified in filename.
+        The plan holds the topology, each Task's settings and its cloudpickled function and kwargs, but none of the run state (status, results, loggers).
 
         Args:
             filename (str): The path and filename to save the DAG as. 
@@ -306,27 +629,45 @@ class Pipeline(LoggingStuff):
         Returns:
             self: returns itself back to where it was called. Allows for additional execution on this Pipeline. 
         """
-        
-        pipeline_bytes = pickle.dumps(self.dag)
-        
-        with open(filename, 'wb') as f:
-            f.write(pipeline_bytes)
-            
+        from dexxy.common.plans import savePlan
+
+        header = savePlan(self.dag, filename)
+        self._log.info('Saved %s Tasks to %s (plan %s)', header['tasks'], filename, header['contentHash'][:12])
         return self
     
-    def openDAG(self, filename):
+    def openDAG(self, filename, validate: bool = False, modules: Dict[str, str] = None):
         """
         Reads in a DAG from a filename provided. This is necessary to begin processing the DAG by the scheduler. 
+        Plans are checked against their content hash before anything is unpickled. DAGs pickled by older versions still open, but their Tasks
+        call the functions they were saved with, which may no longer match the code around them.
 
         Args:
             filename (str): The path and filename to load the DAG froom. 
                 Example filename='dags/dvd_rental' --> This would load the DAG from a folder called 'dags' with the files actual name = 'dvd_rental'
+            validate (bool, optional): Refuse a plan whose functions no longer match the current code. Defaults to False.
+            modules (Dict[str, str], optional): Where to look up functions saved from a script, e.g. {'__main__': 'main'}. Defaults to None.
+
+        Raises:
+            PlanError: If the plan is damaged or, with validate=True, out of date.
 
         Returns:
             self: returns itself back to where it was called. Allows for additional execution on this Pipeline. 
         """
+        from dexxy.common.plans import isPlan, openPlan
+
+        if isPlan(filename):
+            self.dag = openPlan(filename, validate=validate, modules=modules)
+            self.plan_file = filename
+            self.rebuild_indexes()
+            return self
+
         with open(filename, 'rb') as f:
             pipline_bytes = f.read()
             
         self.dag = pickle.loads(pipline_bytes)
+
+        # DAGs saved before Pipelines used the DAG class are networkx MultiDiGraphs
+        if not isinstance(self.dag, DAG):
+            self.dag = DAG.fromNetworkx(self.dag)
+        self.rebuild_indexes()
         return self
\ No newline at end of file
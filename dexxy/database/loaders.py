@@ -0,0 +1,139 @@
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple, Union
+
+# Bulk loads with COPY instead of INSERT statements. The rows are streamed to the server in COPY's own format, so nothing has to be
+# escaped into (or parsed out of) one statement holding the whole DataFrame. pandas is only imported when there is a DataFrame to load.
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from psycopg import Connection
+
+# The Postgres type psycopg dumps a column as, for the types used in table definitions that don't share the type's own name
+TYPE_NAMES = {
+    'int': 'int4',
+    'integer': 'int4',
+    'serial': 'int4',
+    'smallint': 'int2',
+    'bigint': 'int8',
+    'bigserial': 'int8',
+    'real': 'float4',
+    'float': 'float8',
+    'double precision': 'float8',
+    'decimal': 'numeric',
+    'boolean': 'bool',
+    'character varying': 'varchar',
+    'character': 'bpchar',
+    'char': 'bpchar',
+}
+
+FORMATS = ('text', 'binary')
+
+
+def copyType(sqlType: str) -> str:
+    """
+    Returns the name psycopg knows a column type by, e.g. copyType('VARCHAR(100)') -> 'varchar', copyType('INT') -> 'int4'.
+
+    Args:
+        sqlType (str): The type as written in a table definition.
+
+    Returns:
+        str: The type's name, without its size or precision.
+    """
+    name = re.sub(r'\(.*\)', '', sqlType).strip().lower()
+    return TYPE_NAMES.get(name, name)
+
+
+def copyColumns(definition: Tuple[tuple, ...]) -> List[Tuple[str, str]]:
+    """
+    Reads the columns and types out of a table definition, the (name, type, nullable) tuples given to createTable.
+
+    Args:
+        definition (Tuple[tuple, ...]): The table definition, e.g. DIM_CUSTOMER in main.py.
+
+    Returns:
+        List[Tuple[str, str]]: (column, psycopg type name) pairs in the table's order.
+    """
+    return [(column[0], copyType(column[1])) for column in definition]
+
+
+def columnValues(series: 'pd.Series', pgType: str) -> list:
+    # One column of a batch as Python values the dumper for pgType accepts. Missing values become None (NULL).
+    import pandas as pd
+
+    if pgType == 'date':
+        series = pd.to_datetime(series).dt.date
+    elif pgType in ('timestamp', 'timestamptz'):
+        series = pd.to_datetime(series).astype(object)
+    elif pgType in ('int2', 'int4', 'int8') and series.dtype.kind == 'f':
+        # Integer columns with missing values come out of pandas as floats
+        series = series.astype('Int64')
+
+    if series.hasnans:
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def batchRows(df: 'pd.DataFrame', columns: List[Tuple[str, str]], batchSize: int) -> Iterator[Iterator[tuple]]:
+    # The rows of df, converted batchSize rows at a time so only one batch is held as Python objects
+    for start in range(0, len(df), batchSize):
+        batch = df.iloc[start:start + batchSize]
+        yield zip(*(columnValues(batch[name], pgType) for name, pgType in columns))
+
+
+def copyFrame(conn: 'Connection', df: 'pd.DataFrame', table: Union[str, Any], definition: Tuple[tuple, ...], columns: Dict[str, str] = None,
+              format: str = 'binary', batchSize: int = 10000) -> int:
+    """
+    Writes a DataFrame to a table with COPY ... FROM STDIN, e.g.
+        with pool.connection() as conn:
+            copyFrame(conn, dim_customer, 'dssa.dim_customer', DIM_CUSTOMER)
+
+    The table's columns and their types come from its definition, and the DataFrame's columns are matched to them by name, so their order
+    doesn't matter and extra DataFrame columns are left out. Rows are converted from the DataFrame's columns batchSize at a time and streamed
+    to the server as they are converted. The binary format sends numbers and dates without formatting them as text first, and is the faster
+    one. The text format is more forgiving of values that don't exactly match the column types.
+
+    Args:
+        conn (Connection): The connection to load through. The rows are committed with its transaction (right away with autocommit=True).
+        df (pd.DataFrame): The rows to write.
+        table (Union[str, Any]): The table to write to, e.g. 'dssa.fact_rental' or a pypika Table like Schema('dssa').fact_rental.
+        definition (Tuple[tuple, ...]): The table's definition, the (name, type, nullable) tuples it was created from.
+        columns (Dict[str, str], optional): DataFrame columns to rename to the table's names first, e.g. {'quarter': 'quarter_name'}. Defaults to None.
+        format (str, optional): 'binary' or 'text'. Defaults to 'binary'.
+        batchSize (int, optional): How many rows to convert at a time. Defaults to 10000.
+
+    Raises:
+        ValueError: If the format or batchSize is invalid, or the DataFrame is missing one of the table's columns.
+
+    Returns:
+        int: The rows written.
+    """
+    from psycopg import sql
+
+    if format not in FORMATS:
+        raise ValueError('COPY format must be one of %s. Got %r' % (FORMATS, format))
+    if batchSize < 1:
+        raise ValueError('COPY needs to convert at least 1 row at a time. Got batchSize=%s' % batchSize)
+    if columns:
+        df = df.rename(columns=columns)
+
+    tableColumns = copyColumns(definition)
+    missing = [name for name, _ in tableColumns if name not in df.columns]
+    if missing:
+        raise ValueError('Can not COPY into %s, the DataFrame has no column(s) %s. Rename them with columns={...}' % (table, ', '.join(missing)))
+    if df.empty:
+        return 0
+
+    # pypika Tables quote their own schema and name
+    target = sql.Identifier(*table.split('.')) if isinstance(table, str) else sql.SQL(table.get_sql(quote_char='"'))
+    statement = sql.SQL('COPY {} ({}) FROM STDIN (FORMAT {})').format(
+        target,
+        sql.SQL(', ').join(sql.Identifier(name) for name, _ in tableColumns),
+        sql.SQL(format.upper()))
+
+    with conn.cursor() as cursor:
+        with cursor.copy(statement) as copy:
+            copy.set_types([pgType for _, pgType in tableColumns])
+            for rows in batchRows(df, tableColumns, batchSize):
+                for row in rows:
+                    copy.write_row(row)
+    return len(df)
@@ -1,6 +1,20 @@
-from psycopg import connect, Connection
+from psycopg import connect, Connection, AsyncConnection
 from psycopg.conninfo import make_conninfo
 from configparser import ConfigParser
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Tuple
+import atexit
+import os
+
+# psycopg_pool is only imported once a pool is asked for
+if TYPE_CHECKING:
+    from psycopg_pool import ConnectionPool
+
+# Parsed database.ini sections and open pools (with the settings they were opened with), shared by every PostgresClient in the process
+# and keyed by (absolute path, section)
+_configs: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+_pools: Dict[Tuple[str, str], Tuple['ConnectionPool', dict]] = {}
+_lock = Lock()
 
 class PostgresClient():
 
@@ -40,6 +54,48 @@ class PostgresClient():
             Connection: a new connection instance
         """
 
+        # Est a connection to the DB using the paramters read in. 
+        conn = connect(conninfo=make_conninfo(**self.read_config(path, section)), **kwargs)
+
+        return conn
+
+    def read_config(self, path: str, section: str) -> dict:
+        """
+        Reads the connection parameters for a section of a database.ini file (see connect_from_config for the expected layout).
+        The file is only parsed again once it has changed, so connecting from a config many times doesn't re-read it every time.
+
+        Args:
+            path (str): The filepath with database connection parameters. 
+            section (str): The file type to verify and read. 
+
+        Returns:
+            dict: The connection parameters, e.g. {'host': 'localhost', 'port': '5432', ...}
+        """
+
+        key = (os.path.abspath(path), section)
+        modified = os.path.getmtime(path) if os.path.exists(path) else None
+        with _lock:
+            cached = _configs.get(key)
+        if cached is not None and cached[0] == modified:
+            return dict(cached[1])
+
+        conn_dict = self.parse_config(path, section)
+        with _lock:
+            _configs[key] = (modified, conn_dict)
+        return dict(conn_dict)
+
+    def parse_config(self, path: str, section: str) -> dict:
+        """
+        Parses a section of a database.ini file. Use read_config, which caches the result.
+
+        Args:
+            path (str): The filepath with database connection parameters. 
+            section (str): The file type to verify and read. 
+
+        Returns:
+            dict: The connection parameters.
+        """
+
         conn_dict = {}
         config_parser = ConfigParser()
 
@@ -53,10 +109,82 @@ class PostgresClient():
             for k, v in config_params:
                 conn_dict[k] = v
 
-        # Est a connection to the DB using the paramters read in. 
-        conn = connect(conninfo=make_conninfo(**conn_dict), **kwargs)
+        return conn_dict
 
-        return conn
+    def pool(self, path: str, section: str, min_size: int = 1, max_size: int = 4, check: bool = True, timeout: float = 30.0, **kwargs) -> 'ConnectionPool':
+        """
+        Returns the connection pool for a section of a database.ini file, opening it the first time it is asked for. Every call with the same
+        path and section gets the same pool, so it can be shared by all the Tasks of a run (and by later runs). A pool that was closed is replaced.
+        Asking for an open pool with different settings (sizes, timeout, connection kwargs or connection parameters) raises instead of
+        handing back a pool that doesn't match them.
+            Example:
+                pool = PostgresClient().pool('config/database.ini', 'postgresql', max_size=4, autocommit=True)
+                with pool.connection() as conn:
+                    df = conn.execute('SELECT 1;').fetchall()
+
+        A connection is checked out for the `with` block and returned to the pool at its end (rolled back if the block raised), so Tasks on
+        different threads never share one. The pool keeps min_size connections open, opens more on demand up to max_size and makes callers wait
+        (up to timeout seconds) once all of them are checked out. With check=True a connection is tested before it is handed out, and replaced
+        if the server dropped it. Pools are closed when the process exits.
+
+        Args:
+            path (str): The filepath with database connection parameters. 
+            section (str): The file type to verify and read. 
+            min_size (int, optional): Connections kept open while idle. Defaults to 1.
+            max_size (int, optional): The most connections open at once. Match it to how many Tasks may query at once (e.g. the 'db' resource pool). Defaults to 4.
+            check (bool, optional): Test connections before handing them out. Defaults to True.
+            timeout (float, optional): Seconds to wait for a free connection before raising psycopg_pool.PoolTimeout. Defaults to 30.0.
+            kwargs: Passed to every new connection, e.g. autocommit=True.
+
+        Raises:
+            ValueError: If the pool for path and section is already open with different settings. Close it (close_pools) to reopen it.
+
+        Returns:
+            ConnectionPool: A psycopg_pool.ConnectionPool.
+        """
+        from psycopg_pool import ConnectionPool
+
+        key = (os.path.abspath(path), section)
+        conninfo = make_conninfo(**self.read_config(path, section))
+        settings = dict(conninfo=conninfo, min_size=min_size, max_size=max_size, check=check, timeout=timeout, kwargs=kwargs)
+        with _lock:
+            pool, opened = _pools.get(key, (None, None))
+            if pool is None or pool.closed:
+                pool = ConnectionPool(conninfo, kwargs=kwargs, min_size=min_size, max_size=max_size,
+                                      check=ConnectionPool.check_connection if check else None, timeout=timeout, name=section, open=True)
+                _pools[key] = (pool, settings)
+            elif opened != settings:
+                changed = ', '.join(name for name in settings if settings[name] != opened[name])
+                raise ValueError('The pool for [%s] in %s is already open with a different %s. Use the same settings everywhere, or close_pools() '
+                                 'first' % (section, path, changed))
+        return pool
+
+    @staticmethod
+    def close_pools() -> None:
+        """
+        Closes every pool opened by pool(). Runs at exit.
+        """
+        with _lock:
+            pools = [pool for pool, _ in _pools.values()]
+            _pools.clear()
+        for pool in pools:
+            pool.close()
+
+    async def connect_from_config_async(self, path: str, section: str, **kwargs) -> AsyncConnection:
+        """
+        The asyncio version of connect_from_config. Returns a psycopg AsyncConnection so coroutine Tasks (Pipeline type='asyncio') can await their queries
+        and overlap on a single thread.
+            Example:
+                conn = await PostgresClient().connect_from_config_async(path, section, autocommit=True)
+                cursor = await conn.execute('SELECT 1;')
+        Args:
+            path (str): The filepath with database connection parameters. 
+            section (str): The file type to verify and read. 
+        Returns:
+            AsyncConnection: a new async connection instance
+        """
+
+        return await AsyncConnection.connect(conninfo=make_conninfo(**self.read_config(path, section)), **kwargs)
 
     def connect(self, **kwargs) -> Connection:
         """"
@@ -77,4 +205,16 @@ class PostgresClient():
         # checks if the connection is ok, it will throw an error if it is bad
         conn._check_connection_ok()
 
-        return conn
\ No newline at end of file
+        return conn
+
+    async def connect_async(self, **kwargs) -> AsyncConnection:
+        """
+        The asyncio version of connect. Uses the host, port, user, password and dbname this client was created with.
+        Returns:
+            AsyncConnection: a new async connection instance
+        """
+
+        return await AsyncConnection.connect(conninfo=make_conninfo(host=self.host, port=self.port, user=self.user, password=self.password, dbname=self.dbname, **kwargs))
+
+
+atexit.register(PostgresClient.close_pools)
@@ -1,12 +1,36 @@
-import pandas as pd
-from psycopg import Cursor
-from pypika import PostgreSQLQuery
-from pypika import Schema, Column, PostgreSQLQuery
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, Iterator, Union
 from dexxy.common.tasks import Task
 from dexxy.common.workflows import Pipeline
-from dexxy.common.plotting import plot_dag
-from dexxy.database.postgres import PostgresClient
+from dexxy.common.queues import QueueWarehouse
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.partitions import monthPartitions, rangePartitions
+from dexxy.common.streams import mapChunks
+from dexxy.common.utils import isDataFrame
+import argparse
 import time
+from datetime import datetime
+from itertools import islice
+
+# pandas, psycopg and pypika are imported where they are first needed, so importing main.py (e.g. to load a saved DAG) stays fast
+# and doesn't touch the database. The type hints below are only read by editors and type checkers.
+if TYPE_CHECKING:
+    import pandas as pd
+    from psycopg import Cursor
+    from psycopg_pool import ConnectionPool
+
+
+class LazySchema(object):
+    """
+    Stands in for pypika's Schema until a table is actually used, e.g. dw.customer builds Schema('dssa').customer on first access.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, table: str):
+        from pypika import Schema
+        return getattr(Schema(self._name), table)
 
 
 ################## Parameters ###################
@@ -16,8 +40,51 @@ import time
 
 databaseConfig = "config/database.ini"
 section = 'postgresql'
-dw = Schema('dssa')
-dvd = Schema('public')
+dw = LazySchema('dssa')
+dvd = LazySchema('public')
+
+# Per-Task durations from earlier runs. Used to start the Tasks on the longest path (e.g. the rental extract) first.
+durationHistory = "dags/durations.json"
+
+# A JSON report of the last run: when every Task was queued/started/finished, how long it waited and how large its result was.
+runReport = "dags/run_report.json"
+
+# Set to a folder (e.g. "dags/cache") to reuse transform results across runs when the code and the extracted rows haven't changed.
+resultCache = None
+
+# Every run checkpoints its completed Tasks here. If a run fails, option 4 resumes it without re-running what already completed.
+runDirectory = "runs/dvd_pipeline"
+
+# Set to a broker to run the process Tasks (the dimension and fact transforms) on BrokerWorkers instead of this machine's process pool, e.g.
+#   taskBroker = QueueWarehouse.broker('sqlite', path='runs/broker.db')   -> python -m dexxy.common.brokers sqlite runs/broker.db --processes 4
+#   taskBroker = QueueWarehouse.broker('socket', address=('0.0.0.0', 5050), authkey=os.environb[b'DEXXY_BROKER_AUTHKEY'])
+#                                                                         -> python -m dexxy.common.brokers socket <this host>:5050 (on every worker host,
+#                                                                            with the same DEXXY_BROKER_AUTHKEY). Only serve on 0.0.0.0 on a trusted network.
+taskBroker = None
+
+# How much the Tasks may hold at once. Extracts and loads each take a 'db' connection and the process transforms take the memory they
+# peak at (in GB), so raising workers never opens more than resourcePools['db'] connections to the source database or overloads the host.
+resourcePools = {'db': 4, 'mem_gb': 4}
+
+# How many Tasks run at once. Tasks check connections out of one pool (openPool) for each query instead of sharing a cursor, so they can query
+# concurrently. The pool holds at most resourcePools['db'] connections.
+runWorkers = 4
+
+# The rental extract and the fact rental transform run one child Task per month of rentals, and the fact rental load one per loadChunkRows rows,
+# so the largest table is spread over the workers instead of going through a single query.
+loadChunkRows = 5000
+
+# Loads stream rows to the warehouse with COPY instead of building INSERT statements. 'binary' sends numbers and dates as they are, 'text'
+# is more forgiving of values that don't exactly match the column types. copyBatchRows rows are converted from the dataframe at a time.
+copyFormat = 'binary'
+copyBatchRows = 10000
+
+# The customer chain streams: extractCustomer reads streamChunkRows rows at a time, transformCustomer transforms each chunk as it arrives and
+# loadCustomer copies it into the warehouse, so the three overlap and only a few chunks are held in memory at once.
+streamChunkRows = 200
+
+# Option 5 runs a saved DAG every refreshMinutes. The connection pool opened by openPool is kept warm between runs instead of reconnecting every time.
+refreshMinutes = 5
 
 
 ############## Table Definitions ################
@@ -26,51 +93,51 @@ dvd = Schema('public')
 #     https://pypika.readthedocs.io/en/latest/
 
 FACT_RENTAL = (
-    Column('sk_customer', 'INT', False),
-    Column('sk_date', 'DATE', False),
-    Column('sk_store', 'INT', False),
-    Column('sk_film', 'INT', False),
-    Column('sk_staff', 'INT', False),
-    Column('count_rentals', 'INT', False)
+    ('sk_customer', 'INT', False),
+    ('sk_date', 'DATE', False),
+    ('sk_store', 'INT', False),
+    ('sk_film', 'INT', False),
+    ('sk_staff', 'INT', False),
+    ('count_rentals', 'INT', False)
 )
 
 DIM_CUSTOMER = (
-    Column('sk_customer', 'INT', False),
-    Column('name', 'VARCHAR(100)', False),
-    Column('email', 'VARCHAR(100)', False)
+    ('sk_customer', 'INT', False),
+    ('name', 'VARCHAR(100)', False),
+    ('email', 'VARCHAR(100)', False)
 )
 
 DIM_STAFF = (
-    Column('sk_staff', 'INT', False),
-    Column('name', 'VARCHAR(100)', False),
-    Column('email', 'VARCHAR(100)', False)
+    ('sk_staff', 'INT', False),
+    ('name', 'VARCHAR(100)', False),
+    ('email', 'VARCHAR(100)', False)
 )
 
 DIM_STORE = (
-    Column('sk_store', 'INT', False),
-    Column('name', 'VARCHAR(100)', False),
-    Column('address', 'VARCHAR(100)', False),
-    Column('city', 'VARCHAR(100)', False),
-    Column('state', 'VARCHAR(100)', False),
-    Column('country', 'VARCHAR(100)', False)
+    ('sk_store', 'INT', False),
+    ('name', 'VARCHAR(100)', False),
+    ('address', 'VARCHAR(100)', False),
+    ('city', 'VARCHAR(100)', False),
+    ('state', 'VARCHAR(100)', False),
+    ('country', 'VARCHAR(100)', False)
 )
 
 DIM_FILM = (
-    Column('sk_film', 'INT', False),
-    Column('rating_code', 'VARCHAR(100)', False),
-    Column('film_duration', 'INT', False),
-    Column('rental_duration', 'INT', False),
-    Column('language', 'VARCHAR(100)', False),
-    Column('release_year', 'INT', False),
-    Column('title', 'VARCHAR(255)', False)
+    ('sk_film', 'INT', False),
+    ('rating_code', 'VARCHAR(100)', False),
+    ('film_duration', 'INT', False),
+    ('rental_duration', 'INT', False),
+    ('language', 'VARCHAR(100)', False),
+    ('release_year', 'INT', False),
+    ('title', 'VARCHAR(255)', False)
 )
 
 DIM_DATE = (
-    Column('sk_date', 'DATE', False),
-    Column('quarter_name', 'INT', False),
-    Column('year', 'INT', False),
-    Column('month', 'INT', False),
-    Column('day', 'INT', False)
+    ('sk_date', 'DATE', False),
+    ('quarter_name', 'INT', False),
+    ('year', 'INT', False),
+    ('month', 'INT', False),
+    ('day', 'INT', False)
 )
 
 
@@ -92,14 +159,37 @@ def createCursor(path:str, section:str) -> Cursor:
     Returns:
         Cursor: A cursor instance.
     """
-    
+    from dexxy.database.postgres import PostgresClient
+
     client = PostgresClient()
     conn = client.connect_from_config(path, section, autocommit=True)
     cursor = conn.cursor()
     return cursor
 
-### Global variable for a connection to the db
-cursor = createCursor(databaseConfig, section)
+def openPool(path:str, section:str) -> ConnectionPool:
+    """
+    Opens the connection pool every Task checks its connections out of (see PostgresClient.pool in dexxy/database/postgres.py). Asking again
+    returns the same pool, so the Tasks that aren't handed it can use getPool(). It is opened the first time a Task needs it, not when main.py is imported.
+
+    Args:
+        path (str): The filepath to the database credentials.
+        section (str): The type of database to connect to.
+
+    Returns:
+        ConnectionPool: The pool. Use it as `with pool.connection() as conn:` so the connection goes back to the pool afterwards.
+    """
+    from dexxy.database.postgres import PostgresClient
+
+    return PostgresClient().pool(path, section, min_size=1, max_size=resourcePools['db'], autocommit=True)
+
+def getPool() -> ConnectionPool:
+    """
+    Returns the shared connection pool, opening it on first use.
+
+    Returns:
+        ConnectionPool: The pool.
+    """
+    return openPool(databaseConfig, section)
 
 def setSearchPath(cursor: Cursor) -> None:
     """
@@ -111,49 +201,49 @@ def setSearchPath(cursor: Cursor) -> None:
     cursor.execute("SET search_path TO public;")
     return
 
-def createSchema(cursor: Cursor, schemaName: str) -> Cursor:
+def createSchema(pool: ConnectionPool, schemaName: str) -> ConnectionPool:
     """
-    If the schema provided in schemaName does NOT exist, it will be created in the database using the provided Cursor. 
-    If the schema already exists, nothing is created. Returns Cursor. 
+    If the schema provided in schemaName does NOT exist, it will be created in the database using a connection from the provided pool. 
+    If the schema already exists, nothing is created. Returns the pool. 
 
     Args:
-        cursor (Cursor): A Cursor instance. 
+        pool (ConnectionPool): The connection pool. 
         schemaName (str): A schemaName to create -- if it does not already exist. 
 
     Returns:
-        Cursor: A Cursor instance.
+        ConnectionPool: The pool, for the createTable Tasks.
     """
     q = f"CREATE SCHEMA IF NOT EXISTS {schemaName};"
-    cursor.execute(q)
-    return cursor
+    with pool.connection() as conn:
+        conn.execute(q)
+    return pool
 
 def tearDown(*args, **kwargs) -> None:
     """
-    Closes the connection to the database. 
-
-    Args:
-        cursor (Cursor): A Cursor instance. 
+    Runs after the loads. Tests the pool's idle connections so any the database dropped during the run are replaced before the next run.
+    The pool itself stays open (option 5 keeps it warm between runs) and is closed when the process exits.
     """
-    cursor.close()
+    getPool().check()
     return
     
-def createTable(cursor:Cursor, tableName:str, definition:tuple, primaryKey:str=None, foreignKeys:list=None, referenceTables:list=None) -> None: 
+def createTable(pool:ConnectionPool, tableName:str, definition:tuple, primaryKey:str=None, foreignKeys:list=None, referenceTables:list=None) -> None: 
     """
     Creates a table inside the database using the supplied paramters. If they are not provided, they're initalied to None. 
 
     Args:
-        cursor (Cursor): A Cursor instance. 
+        pool (ConnectionPool): The connection pool. 
         tableName (str): The tablename to create the table on. 
         definition (tuple): _description_
         primaryKey (str, optional): The primary key(s) for relationship instantiation. Defaults to None.
         foreignKeys (list, optional): The foreign key(s) for relationship instantiation.. Defaults to None.
         referenceTables (list, optional): A list of tables that are relational to the new table we're creating. Defaults to None.
     """
+    from pypika import Column, PostgreSQLQuery
     
     ddl = PostgreSQLQuery \
         .create_table(tableName) \
         .if_not_exists() \
-        .columns(*definition)
+        .columns(*(Column(*column) for column in definition))
         
     if primaryKey is not None:
         ddl = ddl.primary_key(primaryKey)
@@ -168,51 +258,181 @@ def createTable(cursor:Cursor, tableName:str, definition:tuple, primaryKey:str=N
             
     ddl = ddl.get_sql()
     
-    cursor.execute(ddl)
+    with pool.connection() as conn:
+        conn.execute(ddl)
     return     
     
-def readData(tableName:str, columns:tuple) -> pd.DataFrame:
+def readData(tableName:str, columns:tuple, where:tuple=None) -> pd.DataFrame:
     """
-    Executes a query to selects Columns and rows from a Table using a cursor.  
+    Executes a query to selects Columns and rows from a Table using a connection from the pool.  
     
     Args:
-        cursor (Cursor): A cursor instance
         tableName (str): The name of the table to query
         columns (tuple): The name of columns from the table to select
+        where (tuple, optional): (column, start, stop) to only select the rows where start <= column < stop, e.g. one partition
+            made by rentalMonths. Defaults to None (every row).
     
     Returns:
         pd.DataFrame: Returns results in a pandas dataframe. This will be used later to transform the data. 
     """
-    query = PostgreSQLQuery \
-        .from_(tableName) \
-        .select(*columns) \
-        .get_sql()
-    res = cursor.execute(query)
-    data = res.fetchall()
+    import pandas as pd
+
+    query = selectQuery(tableName, columns, where)
+    with getPool().connection() as conn:
+        res = conn.execute(query)
+        data = res.fetchall()
     
-    col_names = []
+        col_names = []
     
-    for names in res.description:
-        col_names.append(names[0])
+        for names in res.description:
+            col_names.append(names[0])
     
     df = pd.DataFrame(data, columns=col_names)
     return df
 
-def loadData(df:pd.DataFrame, target:str):
+def selectQuery(tableName:str, columns:tuple, where:tuple=None) -> str:
     """
-    Writes data to a table from a pandas dataframe
+    Builds the SELECT used by readData and readChunks.
     
     Args:
-        cursor (Cursor): A cusror instance to the database.
-        df (pd.DataFrame): pandas dataframe containing data to write to the database. 
-        target (str): name of table for "INSERT" query
+        tableName (str): The name of the table to query
+        columns (tuple): The name of columns from the table to select
+        where (tuple, optional): (column, start, stop) to only select the rows where start <= column < stop. Defaults to None (every row).
+    
+    Returns:
+        str: The query.
+    """
+    from pypika import PostgreSQLQuery
+
+    query = PostgreSQLQuery \
+        .from_(tableName) \
+        .select(*columns)
+    if where is not None:
+        column, start, stop = where
+        field = tableName.field(column)
+        query = query.where((field >= start) & (field < stop))
+    return query.get_sql()
+
+def readChunks(tableName:str, columns:tuple, where:tuple=None, chunkRows:int=None) -> Iterator[pd.DataFrame]:
+    """
+    Streams a table as DataFrames of at most chunkRows rows, for a Task created with stream=True. Rows are fetched from the server as they are read
+    instead of all at once. The stream keeps its connection checked out of the pool until the last chunk has been read.
+    
+    Args:
+        tableName (str): The name of the table to query
+        columns (tuple): The name of columns from the table to select
+        where (tuple, optional): (column, start, stop) to only select the rows where start <= column < stop. Defaults to None (every row).
+        chunkRows (int, optional): The most rows per chunk. Defaults to None (streamChunkRows).
+    
+    Returns:
+        Iterator[pd.DataFrame]: The chunks, in the order the database returns the rows.
+    """
+    import pandas as pd
+
+    chunkRows = chunkRows or streamChunkRows
+    with getPool().connection() as conn:
+        cursor = conn.cursor()
+        rows = cursor.stream(selectQuery(tableName, columns, where))
+        col_names = None
+        while True:
+            chunk = list(islice(rows, chunkRows))
+            if not chunk:
+                return
+            if col_names is None:
+                col_names = [names[0] for names in cursor.description]
+            yield pd.DataFrame(chunk, columns=col_names)
+
+def rentalMonths(tableName:str, columns:tuple, **kwargs) -> list:
+    """
+    Partitions the rental extract into one query per month of rental_date.
+    
+    Args:
+        tableName (str): The rental table
+        columns (tuple): The columns readData selects (not used)
+    
+    Returns:
+        list: One set of kwargs for readData per month, e.g. [{'where': ('rental_date', date(2005, 5, 1), date(2005, 6, 1))}, ...]
     """
-    data = tuple(df.itertuples(index=False, name=None))
+    from pypika import PostgreSQLQuery, functions
+
+    field = tableName.field('rental_date')
     query = PostgreSQLQuery \
-        .into(target) \
-        .insert(*data) \
+        .from_(tableName) \
+        .select(functions.Min(field), functions.Max(field)) \
         .get_sql()
-    cursor.execute(query)
+    with getPool().connection() as conn:
+        low, high = conn.execute(query).fetchone()
+    return [{'where': ('rental_date', start, stop)} for start, stop in monthPartitions(low, high)]
+
+def factMonths(rental_df:pd.DataFrame, inventory_df:pd.DataFrame, date_df:pd.DataFrame, film_df:pd.DataFrame, staff_df:pd.DataFrame, store_df:pd.DataFrame, *args, **kwargs) -> list:
+    """
+    Partitions the fact rental transform into one Task per month of rentals. The fact table is grouped by day, so no group spans two months.
+    Each month's Task runs in a process pool, so it only gets that month's rentals, the inventory and dates they use, and the columns
+    buildFactRental joins on, instead of a copy of every whole frame.
+    
+    Args:
+        rental_df (pd.DataFrame): dataframe from the raw rental table
+        inventory_df (pd.DataFrame): dataframe from the raw inventory table
+        date_df (pd.DataFrame): dataframe containing dim table
+        film_df (pd.DataFrame): dataframe containing dim film
+        staff_df (pd.DataFrame): dataframe containing dim staff
+        store_df (pd.DataFrame): dataframe containing dim store
+    
+    Returns:
+        list: One set of kwargs and inputs for buildFactRental per month, e.g. [{'month': (date(2005, 5, 1), date(2005, 6, 1)), 'inputs': (...)}, ...]
+    """
+    if rental_df.empty:
+        return []
+
+    import pandas as pd
+    film_df = film_df[['sk_film']]
+    staff_df = staff_df[['sk_staff', 'name']]
+    store_df = store_df[['sk_store', 'name']]
+    parts = []
+    for month in monthPartitions(rental_df.rental_date.min(), rental_df.rental_date.max()):
+        start, stop = (pd.Timestamp(day) for day in month)
+        rentals = rental_df[(rental_df.rental_date >= start) & (rental_df.rental_date < stop)]
+        inventory = inventory_df.loc[inventory_df.inventory_id.isin(rentals.inventory_id), ['inventory_id', 'film_id']]
+        dates = date_df.loc[(date_df.sk_date >= month[0].isoformat()) & (date_df.sk_date < month[1].isoformat()), ['sk_date']]
+        parts.append({'month': month, 'inputs': (rentals, inventory, dates, film_df, staff_df, store_df)})
+    return parts
+
+def loadChunks(df:pd.DataFrame, *args, **kwargs) -> list:
+    """
+    Partitions a load into one COPY per loadChunkRows rows.
+    
+    Args:
+        df (pd.DataFrame): pandas dataframe containing data to write to the database.
+    
+    Returns:
+        list: One set of kwargs for loadData per chunk, e.g. [{'rows': (0, 5000)}, {'rows': (5000, 10000)}, ...]
+    """
+    return [{'rows': rows} for rows in rangePartitions(0, len(df) - 1, size=loadChunkRows)]
+
+def loadData(df:Union[pd.DataFrame, Iterable[pd.DataFrame]], target:str, definition:tuple, columns:dict=None, rows:tuple=None):
+    """
+    Writes data to a table from a pandas dataframe with COPY (see copyFrame in dexxy/database/loaders.py), in copyFormat and copyBatchRows rows at a time.
+    
+    Args:
+        df (Union[pd.DataFrame, Iterable[pd.DataFrame]]): pandas dataframe containing data to write to the database, or a stream of them
+            (when the Task it depends on has stream=True), which is written one COPY per chunk as the chunks arrive.
+        target (str): name of table to COPY into
+        definition (tuple): the table definition target was created from (e.g. DIM_CUSTOMER). Its columns are matched to the dataframe's by name.
+        columns (dict, optional): dataframe columns to rename to the table's names, e.g. {'quarter': 'quarter_name'}. Defaults to None.
+        rows (tuple, optional): (start, stop) to only write those rows, e.g. one partition made by loadChunks. Defaults to None (every row).
+    """
+    from dexxy.database.loaders import copyFrame
+
+    if not isDataFrame(df):
+        for chunk in df:
+            loadData(chunk, target, definition, columns=columns)
+        return
+    if df.empty:
+        return
+    if rows is not None:
+        df = df.iloc[rows[0]:rows[1]]
+    with getPool().connection() as conn:
+        copyFrame(conn, df, target, definition, columns=columns, format=copyFormat, batchSize=copyBatchRows)
     return 
 
 def buildDimCustomer(cust_df:pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
@@ -225,7 +445,8 @@ def buildDimCustomer(cust_df:pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
     Returns:
         pd.DataFrame: customer dimension object as a pandas dataframe
     """
-    cust_df.rename(columns={'customer_id': 'sk_customer'}, inplace=True)
+    # The extract is shared with other Tasks that may be running, so build on a renamed copy instead of changing it
+    cust_df = cust_df.rename(columns={'customer_id': 'sk_customer'})
     cust_df['name'] = cust_df.first_name + " " + cust_df.last_name
     dim_customer = cust_df[['sk_customer', 'name', 'email']].copy()
     dim_customer.drop_duplicates(inplace=True)
@@ -241,7 +462,7 @@ def buildDimStaff(staff_df:pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
     Returns:
         pd.DataFrame: staff dimension object as a pandas dataframe
     """
-    staff_df.rename(columns={'staff_id': 'sk_staff'}, inplace=True)
+    staff_df = staff_df.rename(columns={'staff_id': 'sk_staff'})
     staff_df['name'] = staff_df.first_name + " " + staff_df.last_name
     dim_staff = staff_df[['sk_staff', 'name', 'email']].copy()
     dim_staff.drop_duplicates(inplace=True)
@@ -282,7 +503,7 @@ def buildDimStore(store_df:pd.DataFrame, staff_df:pd.DataFrame, address_df:pd.Da
         pd.DataFrame: store dimension object as a pandas dataframe
     """
     
-    staff_df.rename(columns={'sk_staff':'staff_id'}, inplace=True)
+    staff_df = staff_df.rename(columns={'sk_staff':'staff_id'})
     staff_df['name'] = staff_df.first_name + " " + staff_df.last_name
     staff_df = staff_df[['staff_id', 'name']].copy()
     
@@ -294,8 +515,7 @@ def buildDimStore(store_df:pd.DataFrame, staff_df:pd.DataFrame, address_df:pd.Da
     address_df = address_df.merge(city_df, how='inner', on='city_id')
     address_df.rename(columns={'district': 'state'}, inplace=True)
     
-    store_df.rename(columns={'manager_staff_id':'staff_id'}, inplace=True)
-    store_df.rename(columns={'store_id': 'sk_store'}, inplace=True)
+    store_df = store_df.rename(columns={'manager_staff_id':'staff_id', 'store_id': 'sk_store'})
     store_df = store_df.merge(staff_df, how='inner', on='staff_id')
     store_df = store_df.merge(address_df, how='inner', on='address_id')
     store_df = store_df[['sk_store', 'name', 'address', 'city', 'state', 'country']].copy()
@@ -313,21 +533,19 @@ def buildDimFilm(film_df:pd.DataFrame, lang_df:pd.DataFrame, *args, **kwargs) ->
         pd.DataFrame: film dimension object as a pandas dataframe
     """
     
-    film_df.rename(
-        columns={'film_id': 'sk_film', 'rating':'rating_code', 'length':'film_duration'},
-        inplace=True
+    film_df = film_df.rename(
+        columns={'film_id': 'sk_film', 'rating':'rating_code', 'length':'film_duration'}
         )
     
-    lang_df.rename(
-        columns={'name':'language'},
-        inplace=True
+    lang_df = lang_df.rename(
+        columns={'name':'language'}
         )
     
     film_df = film_df.merge(lang_df, how='inner', on='language_id')
     film_df = film_df[['sk_film', 'rating_code', 'film_duration', 'rental_duration', 'language', 'release_year', 'title']].copy()
     return film_df
 
-def buildFactRental(rental_df:pd.DataFrame, inventory_df:pd.DataFrame, date_df:pd.DataFrame, film_df:pd.DataFrame, staff_df:pd.DataFrame, store_df:pd.DataFrame,*args,**kwargs) -> pd.DataFrame:
+def buildFactRental(rental_df:pd.DataFrame, inventory_df:pd.DataFrame, date_df:pd.DataFrame, film_df:pd.DataFrame, staff_df:pd.DataFrame, store_df:pd.DataFrame,*args,month:tuple=None,**kwargs) -> pd.DataFrame:
     """
     Constructs the fact table as described in the star-schema.jpg 
     
@@ -338,11 +556,19 @@ def buildFactRental(rental_df:pd.DataFrame, inventory_df:pd.DataFrame, date_df:p
         film_df (pd.DataFrame): dataframe containing dim film
         staff_df (pd.DataFrame): dataframe containing dim staff
         store_df (pd.DataFrame): dataframe containing dim store
+        month (tuple, optional): (first day, first day of the next month) to only build the rentals of that month, e.g. one partition
+            made by factMonths. Defaults to None (every rental).
     
     Returns:
         pd.DataFrame: fact rental object as a pandas dataframe
     """
 
+    if month is not None:
+        import pandas as pd
+        start, stop = (pd.Timestamp(day) for day in month)
+        rental_df = rental_df[(rental_df.rental_date >= start) & (rental_df.rental_date < stop)]
+    # The extract may be shared with other Tasks, so work on a copy of it
+    rental_df = rental_df.copy()
     rental_df.rename(columns={'customer_id':'sk_customer', 'rental_date':'sk_date'}, inplace=True)
     rental_df['sk_date'] = rental_df.sk_date.dt.strftime("%Y-%m-%d")
     
@@ -381,44 +607,51 @@ def clearPastDBSchema(schemaToDrop: str):
         else:
             clearPastDBSchema(schemaToDrop)
     
-def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None):
+def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None, targets: list = None, direction: str = 'upstream'):
     # Creates a DAG for setting up the connection to the DB, building tables, and building relationships. 
     setup = Pipeline(
         steps=[
-            Task(createCursor,
+            Task(openPool,
                 kwargs={'path': databaseConfig, 'section': section},
                 dependsOn=None,
-                name='createCursor'
+                name='openPool',
+                cacheable=False
             ),
             Task(createSchema,
                 kwargs={"schemaName": dw._name},
-                dependsOn=['createCursor'],
-                name='createSchema'
+                dependsOn=['openPool'],
+                name='createSchema',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={'tableName': dw.customer, 'primaryKey': 'sk_customer', 'definition':DIM_CUSTOMER},
                 dependsOn=['createSchema'],
-                name='createDimCustomer'
+                name='createDimCustomer',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={'tableName': dw.store, 'primaryKey': 'sk_store', 'definition':DIM_STORE},
                 dependsOn=['createSchema'],
-                name='createDimStore'
+                name='createDimStore',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={'tableName': dw.film, 'primaryKey': 'sk_film', 'definition':DIM_FILM},
                 dependsOn=['createSchema'],
-                name='createDimFilm'
+                name='createDimFilm',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={'tableName': dw.staff, 'primaryKey': 'sk_staff', 'definition':DIM_STAFF},
                 dependsOn=['createSchema'],
-                name='createDimStaff'
+                name='createDimStaff',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={'tableName': dw.date, 'primaryKey': 'sk_date', 'definition':DIM_DATE},
                 dependsOn=['createSchema'],
-                name='createDimDate'
+                name='createDimDate',
+                cacheable=False
             ),
             Task(createTable,
                 kwargs={
@@ -426,63 +659,88 @@ def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None):
                     'foreignKeys': ['sk_customer', 'sk_store', 'sk_film', 'sk_staff', 'sk_date'],
                     'referenceTables': [dw.customer, dw.store, dw.film, dw.staff, dw.date]},
                 dependsOn=['createSchema', 'createDimCustomer', 'createDimStore',  'createDimFilm', 'createDimStaff', 'createDimDate'],
-                name='createFactRentals'
+                name='createFactRentals',
+                cacheable=False
             )
         ]
     )
     
-    # Creates a DAG for extracting the information from the existing DB dvdrental. 
+    # Creates a DAG for extracting the information from the existing DB dvdrental. The extracts only read the source tables, so they don't
+    # wait on the setup Tasks. Every Task depends only on the Tasks whose output it uses, so running one target (e.g. --targets loadFilm)
+    # touches only its own extract -> transform -> load chain. The source tables can change between runs, so the extracts always read them
+    # (cacheable=False) and the cache reuses a transform only while its extracts return the same rows.
     extract = Pipeline(
         steps=[
-            Task(readData,
+            Task(readChunks,
                 kwargs={'tableName': dvd.customer,'columns': ('customer_id', 'first_name', 'last_name', 'email')},
-                dependsOn=['createFactRentals'],
-                name='extractCustomer'
+                name='extractCustomer',
+                retries=1,
+                resources={'db': 1},
+                stream=True
             ),
             Task(readData,
                 kwargs={'tableName': dvd.staff,'columns': ('staff_id', 'first_name', 'last_name', 'email')},
-                dependsOn=['createFactRentals'],
-                name='extractStaff'
+                name='extractStaff',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.rental,'columns': ('rental_id', 'rental_date', 'inventory_id', 'staff_id', 'customer_id')},
-                dependsOn=['createFactRentals'],
-                name='extractDates'
+                name='extractDates',
+                retries=1,
+                resources={'db': 1},
+                partitions=rentalMonths,
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.address,'columns': ('address_id','address', 'city_id', 'district')},
-                dependsOn=['createFactRentals'],
-                name='extractAddress'
+                name='extractAddress',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.city,'columns': ('city_id','city', 'country_id')},
-                dependsOn=['createFactRentals'],
-                name='extractCity'
+                name='extractCity',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.country,'columns': ('country_id','country')},
-                dependsOn=['createFactRentals'],
-                name='extractCountry'
+                name='extractCountry',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.store,'columns': ('store_id','manager_staff_id', 'address_id')},
-                dependsOn=['createFactRentals'],
-                name='extractStore'
+                name='extractStore',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.film,'columns': ('film_id', 'rating', 'length', 'rental_duration', 'language_id','release_year', 'title')},
-                dependsOn=['createFactRentals'],
-                name='extractFilm'
+                name='extractFilm',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.language,'columns': ('language_id', 'name')},
-                dependsOn=['createFactRentals'],
-                name='extractLanguage'
+                name='extractLanguage',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             ),
             Task(readData,
                 kwargs={'tableName': dvd.inventory,'columns': ('inventory_id', 'film_id', 'store_id')},
-                dependsOn=['createFactRentals'],
-                name='extractInventory'
+                name='extractInventory',
+                retries=1,
+                resources={'db': 1},
+                cacheable=False
             )
         ]
     )
@@ -490,65 +748,88 @@ def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None):
     # Creates a DAG for tranforming the data read in during extract workflow. 
     transform = Pipeline(
         steps=[
-            Task(buildDimCustomer,
+            Task(mapChunks,
+                kwargs={'func': buildDimCustomer},
                 dependsOn=['extractCustomer'],
-                name='transformCustomer'
+                name='transformCustomer',
+                stream=True
             ),
             Task(buildDimStaff,
-                dependsOn=['extractStaff', 'transformCustomer'],
+                dependsOn=['extractStaff'],
                 name='transformStaff'
             ),
             Task(buildDimDates,
-                dependsOn=['extractDates', 'transformStaff'],
-                name='transformDates'
+                dependsOn=['extractDates'],
+                name='transformDates',
+                executor='process',
+                resources={'mem_gb': 1}
             ),
             Task(buildDimFilm,
-                dependsOn=['extractFilm', 'extractLanguage', 'transformDates'],
+                dependsOn=['extractFilm', 'extractLanguage'],
                 name='transformFilm'
             ),
             Task(buildDimStore,
-                dependsOn=['extractStore', 'extractStaff', 'extractAddress', 'extractCity', 'extractCountry', 'transformFilm'],
-                name='transformStore'
+                dependsOn=['extractStore', 'extractStaff', 'extractAddress', 'extractCity', 'extractCountry'],
+                name='transformStore',
+                executor='process',
+                resources={'mem_gb': 1}
             ),
             Task(buildFactRental,
                 dependsOn=['extractDates', 'extractInventory', 'transformDates', 'transformFilm', 'transformStaff', 'transformStore'],
-                name='transformFactRental'
+                name='transformFactRental',
+                executor='process',
+                resources={'mem_gb': 1},
+                partitions=factMonths
             )
         ]
     )
     
     # Creates a DAG for loading the data we transformed in the transform workflow. 
+    # Each load also waits for its table. createTable returns nothing, so the table adds no input to loadData.
     load = Pipeline(
         steps=[
             Task(loadData,
-                dependsOn=['transformCustomer'],
-                kwargs={'target': dw.customer},
-                name='loadCustomer'
+                dependsOn=['transformCustomer', 'createDimCustomer'],
+                kwargs={'target': dw.customer, 'definition': DIM_CUSTOMER},
+                name='loadCustomer',
+                cacheable=False,
+                resources={'db': 1}
             ),
             Task(loadData,
-                dependsOn=['transformStaff'],
-                kwargs={'target': dw.staff},
-                name='loadStaff'
+                dependsOn=['transformStaff', 'createDimStaff'],
+                kwargs={'target': dw.staff, 'definition': DIM_STAFF},
+                name='loadStaff',
+                cacheable=False,
+                resources={'db': 1}
             ),
             Task(loadData,
-                dependsOn=['transformDates'],
-                kwargs={'target': dw.date},
-                name='loadDates'
+                dependsOn=['transformDates', 'createDimDate'],
+                kwargs={'target': dw.date, 'definition': DIM_DATE, 'columns': {'quarter': 'quarter_name'}},
+                name='loadDates',
+                cacheable=False,
+                resources={'db': 1}
             ),
             Task(loadData,
-                dependsOn=['transformStore'],
-                kwargs={'target': dw.store},
-                name='loadStore'
+                dependsOn=['transformStore', 'createDimStore'],
+                kwargs={'target': dw.store, 'definition': DIM_STORE},
+                name='loadStore',
+                cacheable=False,
+                resources={'db': 1}
             ),
             Task(loadData,
-                dependsOn=['transformFilm'],
-                kwargs={'target': dw.film},
-                name='loadFilm'
+                dependsOn=['transformFilm', 'createDimFilm'],
+                kwargs={'target': dw.film, 'definition': DIM_FILM},
+                name='loadFilm',
+                cacheable=False,
+                resources={'db': 1}
             ),
             Task(loadData,
-                dependsOn=['transformFactRental', 'loadFilm', 'loadStore', 'loadDates', 'loadStaff', 'loadCustomer'],
-                kwargs={'target': dw.factRental},
-                name='loadFactRental'
+                dependsOn=['transformFactRental', 'createFactRentals', 'loadFilm', 'loadStore', 'loadDates', 'loadStaff', 'loadCustomer'],
+                kwargs={'target': dw.factRental, 'definition': FACT_RENTAL},
+                name='loadFactRental',
+                cacheable=False,
+                resources={'db': 1},
+                partitions=loadChunks
             )
         ]
     )
@@ -559,6 +840,7 @@ def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None):
             Task(tearDown,
                 dependsOn= [load],
                 name='tearDown',
+                cacheable=False
             )
         ]
     )
@@ -588,18 +870,23 @@ def executeWorkflow(needToRun: bool, needToSave: bool, filename: str = None):
         workflow.compose()
 
         # ============================ ENQUEUE ============================ #
-        # This section uses the .collect() method which enqueues all tasks in the DAG to a task FIFO queue in topological order 
-        workflow.collect()
+        # This section uses the .collect() method which enqueues all tasks in the DAG to a task FIFO queue in topological order.
+        # With targets (e.g. --targets loadFilm) only the Tasks they need are enqueued.
+        workflow.collect(targets, direction)
 
         # ============================ EXECUTION ============================ #
         # Runs the workflow locally using a single worker
-        workflow.run()
+        try:
+            workflow.run(policy='critical_path', history=durationHistory, report=runReport, cache=resultCache, checkpoint=runDirectory, broker=taskBroker, resources=resourcePools, workers=runWorkers)
+        except TaskFailedError as error:
+            print(f'{error}\nSee {runReport} for details. Option 4 resumes the run from its checkpoint.')
+            return
         print('The workflow has been proccessed. \nExiting.')
         return
         
     return 
     
-def processWorkflow(workflow: Pipeline, needToCompose: bool):
+def processWorkflow(workflow: Pipeline, needToCompose: bool, resume: bool = False, targets: list = None, direction: str = 'upstream'):
     
     if needToCompose == True:
         # ============================ COMPILATION ============================ #
@@ -607,16 +894,50 @@ def processWorkflow(workflow: Pipeline, needToCompose: bool):
         workflow.compose()
 
     # ============================ ENQUEUE ============================ #
-    # This section uses the .collect() method which enqueues all tasks in the DAG to a task FIFO queue in topological order 
-    workflow.collect()
+    # This section uses the .collect() method which enqueues all tasks in the DAG to a task FIFO queue in topological order.
+    # With targets (e.g. --targets loadFilm) only the Tasks they need are enqueued.
+    workflow.collect(targets, direction)
 
     # ============================ EXECUTION ============================ #
-    # Runs the workflow locally using a single worker
-    workflow.run()
+    # Runs the workflow locally using a single worker. When resuming, Tasks completed in the checkpointed run are skipped.
+    # If a Task fails, everything downstream of it is skipped and the error is raised once the independent branches have finished.
+    try:
+        workflow.run(policy='critical_path', history=durationHistory, report=runReport, cache=resultCache, checkpoint=runDirectory, resume=resume, broker=taskBroker, resources=resourcePools, workers=runWorkers)
+    except TaskFailedError as error:
+        print(f'{error}\nSee {runReport} for details. Option 4 resumes the run from its checkpoint.')
     
     return
     
-def main():
+def openWorkflow(filename: str) -> Pipeline:
+    """
+    Opens a DAG saved with option 1. DAGs pickled before DAGs were saved as compiled plans hold the Tasks of an older main.py (createCursor,
+    loadData without a table definition) and can't run with this one, and a plan whose functions have changed since it was saved would run
+    the old code. Both are refused.
+
+    Args:
+        filename (str): The DAG's file, e.g. 'dags/dvd_pipeline'.
+
+    Returns:
+        Pipeline: The opened workflow, or None (after saying why) if it has to be saved again with option 1.
+    """
+    from dexxy.common.plans import PlanError, isPlan
+
+    if not isPlan(filename):
+        print(f'{filename} was saved by an older version of this pipeline and can not run with the current code. Save it again with option 1.')
+        return None
+    try:
+        # Plans saved by running main.py refer to its functions as __main__
+        return Pipeline().openDAG(filename, validate=True, modules={'__main__': __name__})
+    except PlanError as error:
+        print(f'{error}\nSave it again with option 1.')
+        return None
+
+def main(targets: list = None, direction: str = 'upstream'):
+    """
+    Args:
+        targets (list, optional): Run only these Tasks (and what they need) instead of the whole DAG, e.g. ['loadFilm']. Defaults to None.
+        direction (str, optional): 'upstream' runs the targets with the Tasks they depend on, 'downstream' also runs the Tasks that depend on them. Defaults to 'upstream'.
+    """
     
     # Prompts to see if you would like to drop a previously created DB schema. 
     #       If so -- it tries to drop it. If it fails, it loops till you press 'e' to exit. 
@@ -635,11 +956,13 @@ def main():
     
     
     
-    # Prompts to give you 3 options:
+    # Prompts to give you 4 options:
     #   1. Build the Pipeline and save the DAG (no execution)
     #   2. Build the DAG and execute
     #   3. Load and execute a DAG
-    decision = input('Would you like to: \n1. Build the Pipeline and save the DAG (no execution)\n2. Build the DAG and execute\n3. Load and execute a DAG\n\nPlease enter the number of your selection.\n')
+    #   4. Load a DAG and resume the last run from its checkpoint
+    #   5. Load a DAG and run it on a schedule
+    decision = input('Would you like to: \n1. Build the Pipeline and save the DAG (no execution)\n2. Build the DAG and execute\n3. Load and execute a DAG\n4. Load a DAG and resume a failed run\n5. Load a DAG and run it every few minutes\n\nPlease enter the number of your selection.\n')
     
     # Option 1
     if decision == '1':
@@ -659,31 +982,78 @@ def main():
     # Option 2
     elif decision == '2':
         # Build the workflow and execute the DAG
-        executeWorkflow(needToRun=True, needToSave=False, filename=None)
+        executeWorkflow(needToRun=True, needToSave=False, filename=None, targets=targets, direction=direction)
         return
     
     # Option 3
     elif decision == '3':
         filename = input('What is the filename of the DAG you would like to load?\n')
         
-        # If the filename starts with 'dags/' then we can open that file
-        if(filename.startswith('dags/')):
-            workflow = Pipeline().openDAG(filename)
         # If the filename doesn't start with 'dags/' then add it to the beginning of the filename for the user(s). 
-        else:
+        if not filename.startswith('dags/'):
             filename = 'dags/' + str(filename)
-            workflow = Pipeline().openDAG(filename)
+        workflow = openWorkflow(filename)
+        if workflow is None:
+            return
         print('File has been opened.')
             
         # Process the workflow
-        processWorkflow(workflow, False)
+        processWorkflow(workflow, False, targets=targets, direction=direction)
         print('The workflow has been proccessed. Exiting.')
         return
     
+    # Option 4
+    elif decision == '4':
+        filename = input('What is the filename of the DAG you would like to resume?\n')
+        
+        # If the filename doesn't start with 'dags/' then add it to the beginning of the filename for the user(s). 
+        if not filename.startswith('dags/'):
+            filename = 'dags/' + str(filename)
+        workflow = openWorkflow(filename)
+        if workflow is None:
+            return
+        print(f'File has been opened. Resuming from the checkpoint in {runDirectory}')
+        
+        # Process the workflow, skipping the Tasks that completed in the failed run
+        processWorkflow(workflow, False, resume=True, targets=targets, direction=direction)
+        print('The workflow has been proccessed. Exiting.')
+        return
+    
+    # Option 5
+    elif decision == '5':
+        filename = input('What is the filename of the DAG you would like to schedule?\n')
+        
+        # If the filename doesn't start with 'dags/' then add it to the beginning of the filename for the user(s). 
+        if not filename.startswith('dags/'):
+            filename = 'dags/' + str(filename)
+        workflow = openWorkflow(filename)
+        if workflow is None:
+            return
+        
+        # A run that is still going when the next one is due is skipped rather than queued. Failed runs are logged and the schedule keeps going.
+        workflow.schedule('interval', minutes=refreshMinutes, keep_warm=['openPool'], next_run_time=datetime.now(),
+                          run_options=dict(policy='critical_path', history=durationHistory, report=runReport, cache=resultCache, checkpoint=runDirectory, broker=taskBroker,
+                                           resources=resourcePools, workers=runWorkers, targets=targets, direction=direction))
+        print(f'Running {filename} every {refreshMinutes} minutes. Press Ctrl+C to stop.')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            workflow.scheduler.shutdown()
+        print('The schedule has been stopped. Exiting.')
+        return
+    
     else:
         print("You've entered an invalid input. Please re-run this script and do better.")
         return 
     
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # e.g. python main.py --targets loadFilm                            -> refresh the film dimension only
+    #      python main.py --targets transformFactRental --direction downstream  -> rebuild the fact table and everything after it
+    parser = argparse.ArgumentParser(description='Build, save, load or schedule the DVD rental star-schema pipeline.')
+    parser.add_argument('--targets', nargs='+', default=None, help='Run only these Tasks and the Tasks they need, e.g. loadFilm')
+    parser.add_argument('--direction', choices=['upstream', 'downstream'], default='upstream',
+                        help='upstream: the targets and what they depend on. downstream: also every Task that depends on them.')
+    args = parser.parse_args()
+    main(args.targets, args.direction)
\ No newline at end of file
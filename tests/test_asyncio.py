@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import pytest
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.queues import QueueWarehouse
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list) -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps, type='asyncio')
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+def test_asyncio_pipelines_queue_on_an_asyncio_queue():
+    assert isinstance(QueueWarehouse.warehouse('asyncio'), asyncio.Queue)
+    assert isinstance(Pipeline(type='asyncio').queue, asyncio.Queue)
+
+
+def test_coroutines_are_awaited_side_by_side_on_the_loop():
+    loopThreads = set()
+
+    def meet(mine, theirs):
+        # Each coroutine waits for the other one to start, so the run only finishes if both are awaited at the same time
+        async def call(x):
+            loopThreads.add(threading.get_ident())
+            events[mine].set()
+            await asyncio.wait_for(events[theirs].wait(), timeout=5)
+            return x + 1
+        return call
+
+    def sync(left, right):
+        return threading.get_ident(), left + right
+
+    events = {}
+
+    async def start(x):
+        events.update(left=asyncio.Event(), right=asyncio.Event())
+        return x
+
+    pipeline = build([
+        Task(start, dependsOn=['root'], name='start'),
+        Task(meet('left', 'right'), dependsOn=['start'], name='left'),
+        Task(meet('right', 'left'), dependsOn=['start'], name='right'),
+        Task(sync, dependsOn=['left', 'right'], name='sync', keepResult=True),
+    ])
+    pipeline.run(workers=2)
+    thread, total = pipeline.get_result('sync')
+    assert total == 4
+    # Coroutines run on the loop's thread, regular functions are handed to another thread
+    assert len(loopThreads) == 1 and thread not in loopThreads
+
+
+def test_failed_coroutine_fails_the_run():
+    async def boom(x):
+        raise ValueError('async boom')
+
+    pipeline = build([Task(boom, dependsOn=['root'], name='boom')])
+    with pytest.raises(TaskFailedError):
+        pipeline.run()
+    assert 'async boom' in pipeline.get_task_by_name('boom').error
@@ -0,0 +1,158 @@
+import cloudpickle
+import threading
+import time
+import pytest
+from dexxy.common.brokers import BrokerExecutor, BrokerWorker, MemoryBroker, SocketBroker, SQLiteBroker
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.results import SpilledResult
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 2
+
+
+def square(x):
+    return x * x
+
+
+def boom(x):
+    raise ValueError('remote boom')
+
+
+def frame():
+    import pandas as pd
+    return pd.DataFrame({'a': range(100)})
+
+
+def received(df):
+    return type(df).__name__, int(df.a.sum())
+
+
+calls = []
+
+
+def slow(x):
+    calls.append(x)
+    time.sleep(0.5)
+
+
+def startWorker(broker, jobs: int) -> threading.Thread:
+    worker = threading.Thread(target=BrokerWorker(broker, name='test-worker', pollInterval=0.01).serve, args=(jobs,), daemon=True)
+    worker.start()
+    return worker
+
+
+def test_sqlite_broker_round_trip(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / 'broker.db'))
+    worker = startWorker(SQLiteBroker(str(tmp_path / 'broker.db')), jobs=2)
+
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(square, dependsOn=['root'], name='square', executor='process', keepResult=True)])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(broker=broker)
+    assert pipeline.get_result('square') == 4
+
+    # Errors raised on the worker come back as the Task's error
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(boom, dependsOn=['root'], name='boom', executor='process')])
+    pipeline.compose()
+    pipeline.collect()
+    with pytest.raises(TaskFailedError):
+        pipeline.run(broker=broker)
+    assert 'remote boom' in pipeline.get_task_by_name('boom').error
+    worker.join(timeout=5)
+
+
+@pytest.mark.parametrize('makeBroker', [lambda path: SQLiteBroker(path, lease=0.1), lambda path: MemoryBroker(lease=0.1)])
+def test_expired_lease_requeues_then_fails_the_job(tmp_path, makeBroker):
+    broker = makeBroker(str(tmp_path / 'broker.db'))
+    jobID = broker.put(b'payload')
+
+    assert broker.claim('lost-worker') == (jobID, b'payload')
+    time.sleep(0.2)
+    # The Pipeline polls for outcomes meanwhile. The first worker stopped renewing, so the job goes to the next worker and the first
+    # one's outcome is ignored.
+    assert broker.collect([jobID]) == []
+    assert broker.claim('second-worker') == (jobID, b'payload')
+    broker.finish(jobID, b'late', 'lost-worker')
+    assert broker.collect([jobID]) == []
+
+    time.sleep(0.2)
+    (collected, outcome), = broker.collect([jobID])
+    succeeded, error = cloudpickle.loads(outcome)
+    assert collected == jobID and not succeeded
+    assert 'lease expired' in str(error)
+
+
+def test_sqlite_broker_drops_jobs_of_a_crashed_run(tmp_path):
+    crashed = SQLiteBroker(str(tmp_path / 'broker.db'), lease=0.1)
+    crashed.put(b'old job')
+    time.sleep(0.2)
+
+    broker = SQLiteBroker(str(tmp_path / 'broker.db'), lease=0.1)
+    assert broker.claim('worker') is None
+
+
+def test_socket_broker_needs_an_authkey():
+    with pytest.raises(ValueError):
+        SocketBroker(serve=True)
+
+
+class RecordingBroker(MemoryBroker):
+    # Keeps the inputs of every job put on it
+
+    def __init__(self):
+        super(RecordingBroker, self).__init__()
+        self.inputs = []
+
+    def put(self, payload: bytes) -> int:
+        fn, args, kwargs = cloudpickle.loads(payload)
+        self.inputs.extend(args[1])
+        return super(RecordingBroker, self).put(payload)
+
+
+def test_spilled_inputs_are_sent_to_broker_workers_as_data():
+    broker = RecordingBroker()
+    worker = startWorker(broker, jobs=1)
+
+    pipeline = Pipeline(steps=[Task(frame, name='frame'), Task(received, dependsOn=['frame'], name='received', executor='process', keepResult=True)])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(broker=broker, spill_threshold=1)
+    assert pipeline.get_result('received') == ('DataFrame', sum(range(100)))
+    # The input travelled as data, not as a SpilledResult handle pointing at a file on the Pipeline's host
+    assert broker.inputs and not any(isinstance(data, SpilledResult) for data in broker.inputs)
+    worker.join(timeout=5)
+
+
+def test_only_unclaimed_jobs_can_be_cancelled():
+    broker = MemoryBroker()
+    executor = BrokerExecutor(broker)
+
+    unclaimed = executor.submit(square, 2)
+    assert unclaimed.cancel()
+    assert broker.claim('worker') is None
+
+    claimed = executor.submit(square, 3)
+    assert broker.claim('worker')[0] == claimed.jobID
+    assert not claimed.cancel()
+    assert claimed.running()
+    executor.shutdown()
+
+
+def test_timed_out_broker_job_is_not_retried_while_it_runs():
+    calls.clear()
+    broker = MemoryBroker()
+    worker = startWorker(broker, jobs=1)
+
+    pipeline = Pipeline(steps=[Task(root, name='root'),
+                               Task(slow, dependsOn=['root'], name='slow', executor='process', timeout=0.1, retries=2, retryDelay=0.01)])
+    pipeline.compose()
+    pipeline.collect()
+    with pytest.raises(TaskFailedError):
+        pipeline.run(broker=broker)
+    task = pipeline.get_task_by_name('slow')
+    assert task.attempts == 1 and 'TaskTimeoutError' in task.error
+    assert calls == [2]
+    worker.join(timeout=5)
@@ -0,0 +1,85 @@
+from collections import deque
+from dexxy.common.cache import TaskCache, fingerprint
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+FACTOR = 2
+SOURCE = {'rows': [1, 2, 3]}
+# Not a plain value, so appending to it doesn't change the fingerprint of the functions that use it
+calls = deque()
+
+
+def scale(x):
+    return x * FACTOR
+
+
+def transform(x):
+    return scale(x)
+
+
+def test_fingerprint_follows_helpers_and_globals():
+    global FACTOR
+
+    before = fingerprint(transform)
+    FACTOR = 3
+    try:
+        assert fingerprint(transform) != before
+    finally:
+        FACTOR = 2
+    assert fingerprint(transform) == before
+
+
+def test_key_includes_functions_in_kwargs_and_version(tmp_path):
+    cache = TaskCache(str(tmp_path))
+
+    def apply(x, func):
+        return func(x)
+
+    keys = {
+        cache.key(Task(apply, kwargs={'func': scale}), []),
+        cache.key(Task(apply, kwargs={'func': lambda x: x + 1}), []),
+        cache.key(Task(apply, kwargs={'func': scale}, version='2'), []),
+    }
+    assert len(keys) == 3
+
+
+def root():
+    return 1
+
+
+def extract(x):
+    calls.append('extract')
+    return list(SOURCE['rows'])
+
+
+def total(rows):
+    calls.append('total')
+    return sum(rows)
+
+
+def runCached(directory: str) -> Pipeline:
+    pipeline = Pipeline(steps=[
+        Task(root, name='root'),
+        Task(extract, dependsOn=['root'], name='extract', cacheable=False),
+        Task(total, dependsOn=['extract'], name='total', keepResult=True),
+    ])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(cache=directory)
+    return pipeline
+
+
+def test_uncacheable_extract_reruns_and_keys_its_dependents_by_content(tmp_path):
+    calls.clear()
+    runCached(str(tmp_path))
+    pipeline = runCached(str(tmp_path))
+    assert list(calls) == ['extract', 'total', 'extract']
+    assert pipeline.get_result('total') == 6
+
+    SOURCE['rows'] = [10, 20]
+    try:
+        pipeline = runCached(str(tmp_path))
+    finally:
+        SOURCE['rows'] = [1, 2, 3]
+    assert list(calls)[3:] == ['extract', 'total']
+    assert pipeline.get_result('total') == 30
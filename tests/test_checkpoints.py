@@ -0,0 +1,86 @@
+import json
+import pytest
+from dexxy.common.checkpoints import Checkpoint
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def buildPipeline(calls: list, failures: list) -> Pipeline:
+    def a():
+        calls.append('a')
+        return 1
+
+    def b(x):
+        calls.append('b')
+        if failures:
+            failures.pop()
+            raise RuntimeError('b fails')
+        return x + 1
+
+    pipeline = Pipeline(steps=[Task(a, name='a', keepResult=True), Task(b, dependsOn=['a'], name='b', keepResult=True)])
+    pipeline.compose()
+    return pipeline
+
+
+def test_resume_runs_only_unfinished_tasks(tmp_path):
+    calls = []
+    pipeline = buildPipeline(calls, failures=[True])
+
+    pipeline.collect()
+    with pytest.raises(TaskFailedError):
+        pipeline.run(checkpoint=str(tmp_path))
+    assert calls == ['a', 'b']
+
+    pipeline.collect()
+    pipeline.run(checkpoint=str(tmp_path), resume=True)
+    assert calls == ['a', 'b', 'b']
+    assert pipeline.get_result('b') == 2
+
+
+def test_plain_run_after_resume_runs_every_task(tmp_path):
+    calls = []
+    pipeline = buildPipeline(calls, failures=[True])
+
+    pipeline.collect()
+    with pytest.raises(TaskFailedError):
+        pipeline.run(checkpoint=str(tmp_path))
+    pipeline.collect()
+    pipeline.run(checkpoint=str(tmp_path), resume=True)
+
+    # The Tasks restored by the resume are not restored in the next run
+    calls.clear()
+    pipeline.collect()
+    pipeline.run()
+    assert calls == ['a', 'b']
+    assert pipeline.get_result('b') == 2
+    assert not any(task.restored for task in pipeline.tasks())
+
+
+def test_completed_tasks_are_appended_to_the_log(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.reset('run-1')
+    tasks = [Task(lambda: 1, name='t%s' % index) for index in range(3)]
+    for task in tasks:
+        task.result = 1
+        checkpoint.save(task, 'run-1')
+
+    lines = (tmp_path / 'checkpoint.jsonl').read_text().splitlines()
+    assert json.loads(lines[0]) == {'runID': 'run-1'}
+    assert [json.loads(line)['task'] for line in lines[1:]] == ['t0', 't1', 't2']
+
+    # A crash part way through writing a line loses only that Task
+    with open(tmp_path / 'checkpoint.jsonl', 'a') as f:
+        f.write('{"task": "t3", "sta')
+    state = Checkpoint(str(tmp_path)).load()
+    assert sorted(state) == ['t0', 't1', 't2']
+    assert len((tmp_path / 'checkpoint.jsonl').read_text().splitlines()) == 4
+
+
+def test_legacy_checkpoint_is_read(tmp_path):
+    entry = {'status': 'Completed', 'tid': 1, 'result': None, 'restorable': True}
+    (tmp_path / 'checkpoint.json').write_text(json.dumps({'runID': 'old', 'tasks': {'a': entry}}))
+
+    checkpoint = Checkpoint(str(tmp_path))
+    assert checkpoint.load() == {'a': entry}
+    assert checkpoint.runID == 'old'
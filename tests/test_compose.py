@@ -0,0 +1,82 @@
+import pytest
+from dexxy.common.exceptions import CircularDependencyError, DependencyError, MissingDependencyError, NotFoundError
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def step(*inputs):
+    return 1
+
+
+def parents(pipeline: Pipeline, name: str) -> list:
+    return sorted(pipeline.dag.task(tid).name for tid in pipeline.dag.predecessors(pipeline.get_task_by_name(name).tid))
+
+
+def test_named_dependencies_are_looked_up_in_the_name_index():
+    pipeline = Pipeline(steps=[
+        Task(step, name='root'),
+        Task(step, dependsOn=['root'], name='a'),
+        Task(step, dependsOn=['root', 'a'], name='b'),
+    ])
+    pipeline.compose()
+    root = pipeline.get_task_by_name('root')
+    assert pipeline.get_task_by_name('b').dependsOn == [root, pipeline.get_task_by_name('a')]
+    assert parents(pipeline, 'b') == ['a', 'root']
+    with pytest.raises(NotFoundError):
+        pipeline.get_task_by_name('c')
+
+
+def test_unknown_dependency_is_reported():
+    pipeline = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=['missing'], name='a')])
+    with pytest.raises(NotFoundError, match='missing'):
+        pipeline.compose()
+
+    stray = Task(step, name='stray')
+    pipeline = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=[stray], name='a')])
+    with pytest.raises(DependencyError, match='stray'):
+        pipeline.compose()
+
+
+def test_nested_pipelines_are_composed_into_their_parent():
+    extract = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=['root'], name='extract')])
+    lookup = Pipeline(steps=[Task(step, dependsOn=['root'], name='lookup')])
+    # Not composed beforehand, so it is composed straight into the parent's DAG
+    load = Pipeline(steps=[Task(step, dependsOn=['transform'], name='load')])
+    transform = Pipeline(steps=[
+        extract,
+        lookup,
+        # A Pipeline dependency means its last step
+        Task(step, dependsOn=[extract, 'lookup'], name='transform'),
+        load,
+    ])
+    # Composed Pipelines are merged in place
+    extract.compose()
+    lookup.compose(extract)
+    transform.compose()
+
+    assert [task.name for task in transform.tasks()] == ['root', 'extract', 'lookup', 'transform', 'load']
+    assert parents(transform, 'transform') == ['extract', 'lookup']
+    assert parents(transform, 'lookup') == ['root'] and parents(transform, 'load') == ['transform']
+    assert transform.dag.numberOfEdges() == 5
+    assert load.dag is transform.dag
+
+
+def test_disconnected_tasks_are_refused():
+    pipeline = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=['root'], name='a'), Task(step, name='alone')])
+    with pytest.raises(MissingDependencyError):
+        pipeline.compose()
+
+
+def test_edges_closing_a_cycle_are_refused_with_the_tasks_in_it():
+    pipeline = Pipeline(steps=[Task(step, name='a'), Task(step, dependsOn=['a'], name='b'), Task(step, dependsOn=['b'], name='c')])
+    pipeline.compose()
+    a, c = pipeline.get_task_by_name('a'), pipeline.get_task_by_name('c')
+
+    with pytest.raises(CircularDependencyError, match='a -> b -> c -> a'):
+        pipeline.add_edge_to_dag(pipeline.pid, c.tid, a.tid, a.tid)
+    with pytest.raises(CircularDependencyError, match='a -> a'):
+        pipeline.add_edge_to_dag(pipeline.pid, a.tid, a.tid, a.tid)
+    # The refused edges were not added, and edges that don't close a cycle still can be
+    assert pipeline.dag.numberOfEdges() == 2
+    pipeline.add_edge_to_dag(pipeline.pid, a.tid, c.tid, c.tid)
+    assert parents(pipeline, 'c') == ['a', 'b']
@@ -0,0 +1,33 @@
+import os
+import pickle
+import pytest
+from dexxy.common.plans import Plan, isPlan
+
+DAG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dags', 'dvd_pipeline')
+
+
+def test_shipped_dag_is_a_plan_matching_main():
+    main = pytest.importorskip('main')
+
+    assert isPlan(DAG_FILE)
+    plan = Plan(DAG_FILE)
+    plan.verify()
+    # The plan was saved by running main.py, so its functions are looked up in main
+    assert plan.checkCode({'__main__': 'main'}) == []
+
+    workflow = main.openWorkflow(DAG_FILE)
+    tasks = {task.name: task for task in workflow.tasks()}
+    assert 'openPool' in tasks and 'createCursor' not in tasks
+    assert tasks['createSchema'].dependsOn == [tasks['openPool']]
+    assert all('definition' in task.kwargs for name, task in tasks.items() if name.startswith('load'))
+
+
+def test_main_refuses_dags_pickled_by_older_versions(tmp_path, capsys):
+    main = pytest.importorskip('main')
+
+    # Before plans, saveDAG pickled the DAG as is
+    old = tmp_path / 'old_pipeline'
+    old.write_bytes(pickle.dumps({'nodes': ['createCursor']}))
+
+    assert main.openWorkflow(str(old)) is None
+    assert 'Save it again with option 1' in capsys.readouterr().out
@@ -0,0 +1,94 @@
+import pickle
+from dexxy.common.graphs import DAG
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def step(*inputs):
+    return 1
+
+
+def diamond() -> DAG:
+    # 1 -> 2 -> 4 and 1 -> 3 -> 4, added with 4 first so order can't come from insertion alone
+    dag = DAG()
+    dag.addNode(4, 'd')
+    for tid, task in ((1, 'a'), (2, 'b'), (3, 'c')):
+        dag.addNode(tid, task)
+    for tidFrom, tidTo in ((1, 2), (1, 3), (2, 4), (3, 4)):
+        assert dag.addEdge(tidFrom, tidTo, pid=7)
+    return dag
+
+
+def test_nodes_and_edges_live_in_lists_indexed_by_node_number():
+    dag = diamond()
+    assert len(dag) == 4 and list(dag) == [4, 1, 2, 3] and 3 in dag and 5 not in dag
+    assert dag.index == {4: 0, 1: 1, 2: 2, 3: 3}
+    assert dag.tasks() == ['d', 'a', 'b', 'c'] and dag.task(4) == 'd'
+    assert sorted(dag.successors(1)) == [2, 3] and sorted(dag.predecessors(4)) == [2, 3]
+    assert dag.outDegree(1) == 2 and dag.outDegree(4) == 0
+    assert sorted(dag.edges()) == [(1, 2, 7), (1, 3, 7), (2, 4, 7), (3, 4, 7)] and dag.numberOfEdges() == 4
+
+    # Duplicate edges are not added twice, and an edge can create a node that gets its Task later
+    assert not dag.addEdge(1, 2)
+    assert dag.addEdge(4, 5) and dag.task(5) is None
+    dag.addNode(5, 'e')
+    assert dag.task(5) == 'e' and dag.hasEdge(4, 5) and not dag.hasEdge(5, 4)
+
+
+def test_topological_order_keeps_insertion_order_between_ready_nodes():
+    assert diamond().topologicalOrder() == [1, 2, 3, 4]
+
+    dag = DAG()
+    dag.addNodes([10, 11, 12], ['x', 'y', 'z'])
+    dag.addEdge(12, 10)
+    assert dag.topologicalOrder() == [11, 12, 10]
+
+
+def test_networkx_round_trip():
+    dag = diamond()
+    dag.properties[dag.index[1]] = {'owner': 'etl'}
+    G = dag.toNetworkx()
+    assert G.nodes[1]['tasks'] == {1: 'a'} and G.nodes[1]['properties'] == {'owner': 'etl'}
+    assert G.number_of_edges() == 4
+
+    copy = DAG.fromNetworkx(G)
+    assert list(copy) == list(dag) and copy.tasks() == dag.tasks()
+    assert sorted(copy.edges()) == sorted(dag.edges())
+    assert copy.properties[copy.index[1]] == {'owner': 'etl'}
+
+
+def test_pipeline_runs_its_dag_in_topological_order():
+    order = []
+
+    def record(name):
+        def call(*inputs):
+            order.append(name)
+        return call
+
+    pipeline = Pipeline(steps=[
+        Task(record('root'), name='root'),
+        Task(record('left'), dependsOn=['root'], name='left'),
+        Task(record('right'), dependsOn=['root'], name='right'),
+        Task(record('join'), dependsOn=['left', 'right'], name='join'),
+    ])
+    pipeline.compose()
+    assert isinstance(pipeline.dag, DAG)
+    assert [pipeline.dag.task(tid).name for tid in pipeline.dag.topologicalOrder()] == ['root', 'left', 'right', 'join']
+
+    pipeline.collect()
+    pipeline.run()
+    assert order == ['root', 'left', 'right', 'join']
+
+
+def test_networkx_dags_saved_by_older_versions_still_open(tmp_path):
+    pipeline = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=['root'], name='next', keepResult=True)])
+    pipeline.compose()
+    path = tmp_path / 'old_dag'
+    path.write_bytes(pickle.dumps(pipeline.dag.toNetworkx()))
+
+    opened = Pipeline().openDAG(str(path))
+    assert isinstance(opened.dag, DAG)
+    assert [task.name for task in opened.tasks()] == ['root', 'next']
+    opened.collect()
+    opened.run()
+    assert opened.get_result('next') == 1
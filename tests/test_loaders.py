@@ -0,0 +1,104 @@
+import datetime
+import pandas as pd
+import pytest
+from dexxy.database.loaders import copyColumns, copyFrame, copyType
+
+DEFINITION = (
+    ('sk_film', 'INT', 'NOT NULL'),
+    ('title', 'VARCHAR(255)', 'NOT NULL'),
+    ('rental_rate', 'NUMERIC(4, 2)', 'NULL'),
+    ('sk_date', 'DATE', 'NOT NULL'),
+    ('copies', 'BIGINT', 'NULL'),
+)
+
+
+class FakeCopy(object):
+    # Records what copyFrame writes instead of sending it to a server
+
+    def __init__(self, statement):
+        self.statement = statement.as_string(None)
+        self.types = None
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_types(self, types):
+        self.types = types
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.copies = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy(self, statement):
+        self.copies.append(FakeCopy(statement))
+        return self.copies[-1]
+
+
+def frame() -> pd.DataFrame:
+    # Columns out of the table's order, one extra column and missing values in a float and an integer column
+    return pd.DataFrame({
+        'extra': ['x', 'y', 'z'],
+        'sk_date': ['2005-05-24', '2005-05-25', '2005-05-26'],
+        'name': ['Alien', 'Brazil', 'Casablanca'],
+        'rental_rate': [0.99, None, 4.99],
+        'copies': [3, None, 1],
+        'sk_film': [1, 2, 3],
+    })
+
+
+def test_copy_types_drop_sizes_and_use_psycopg_names():
+    assert copyType('VARCHAR(100)') == 'varchar'
+    assert copyType('INT') == 'int4'
+    assert copyType('double precision') == 'float8'
+    assert copyType('DATE') == 'date'
+    assert copyColumns(DEFINITION) == [('sk_film', 'int4'), ('title', 'varchar'), ('rental_rate', 'numeric'), ('sk_date', 'date'), ('copies', 'int8')]
+
+
+@pytest.mark.parametrize('format', ['binary', 'text'])
+def test_copy_frame_maps_columns_by_name_and_converts_types(format):
+    conn = FakeConnection()
+    written = copyFrame(conn, frame(), 'dssa.dim_film', DEFINITION, columns={'name': 'title'}, format=format, batchSize=2)
+
+    copy, = conn.copies
+    assert written == 3
+    assert copy.statement == 'COPY "dssa"."dim_film" ("sk_film", "title", "rental_rate", "sk_date", "copies") FROM STDIN (FORMAT %s)' % format.upper()
+    assert copy.types == ['int4', 'varchar', 'numeric', 'date', 'int8']
+    assert copy.rows == [
+        (1, 'Alien', 0.99, datetime.date(2005, 5, 24), 3),
+        (2, 'Brazil', None, datetime.date(2005, 5, 25), None),
+        (3, 'Casablanca', 4.99, datetime.date(2005, 5, 26), 1),
+    ]
+    # Integer columns come out as ints even when pandas held them as floats
+    assert all(type(row[4]) is int for row in copy.rows if row[4] is not None)
+
+
+def test_copy_frame_rejects_missing_columns_and_bad_settings():
+    conn = FakeConnection()
+    with pytest.raises(ValueError, match='title'):
+        copyFrame(conn, frame(), 'dssa.dim_film', DEFINITION)
+    with pytest.raises(ValueError, match='format'):
+        copyFrame(conn, frame(), 'dssa.dim_film', DEFINITION, columns={'name': 'title'}, format='csv')
+    with pytest.raises(ValueError, match='batchSize'):
+        copyFrame(conn, frame(), 'dssa.dim_film', DEFINITION, columns={'name': 'title'}, batchSize=0)
+    assert conn.copies == []
+
+    assert copyFrame(conn, frame().iloc[:0], 'dssa.dim_film', DEFINITION, columns={'name': 'title'}) == 0
+    assert conn.copies == []
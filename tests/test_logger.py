@@ -0,0 +1,83 @@
+import json
+import logging
+import time
+import pytest
+from dexxy.common import logger
+from dexxy.common.logger import ContextFilter, ContextFormatter, JsonFormatter, QueuedHandler, logContext
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+class SlowHandler(logging.Handler):
+    # A terminal that takes a while to write each line
+
+    def __init__(self):
+        super(SlowHandler, self).__init__()
+        self.lines = []
+
+    def emit(self, record):
+        time.sleep(0.01)
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def queued():
+    target = SlowHandler()
+    handler = QueuedHandler(target)
+    yield handler, target.lines
+    handler.close()
+
+
+def record(message: str, *args) -> logging.LogRecord:
+    return logging.LogRecord('Worker', logging.INFO, __file__, 1, message, args, None)
+
+
+def test_flush_waits_for_everything_queued_before_it(queued):
+    handler, lines = queued
+    for number in range(5):
+        handler.handle(record('line %s', number))
+    handler.flush()
+    assert lines == ['line %s' % number for number in range(5)]
+
+
+def test_messages_are_merged_on_the_logging_thread(queued):
+    handler, lines = queued
+    rows = [1]
+    handler.handle(record('rows %s', rows))
+    rows.append(2)
+    handler.flush()
+    assert lines == ['rows [1]']
+
+
+def test_records_carry_the_run_and_task_ids():
+    with logContext(runID='run-1', taskID=3):
+        tagged = record('Running Tasks %s', 'extract')
+        ContextFilter().filter(tagged)
+    untagged = record('Starting')
+    ContextFilter().filter(untagged)
+
+    assert ContextFormatter('%(message)s').format(tagged) == 'Running Tasks extract :: run=run-1 task=3'
+    assert ContextFormatter('%(message)s').format(untagged) == 'Starting'
+    fields = json.loads(JsonFormatter().format(tagged))
+    assert (fields['message'], fields['runID'], fields['taskID'], fields['level']) == ('Running Tasks extract', 'run-1', 3, 'INFO')
+
+
+def test_run_returns_after_its_log_lines_are_written(queued, monkeypatch):
+    handler, lines = queued
+    root = logging.getLogger()
+    monkeypatch.setattr(logger, '_handler', handler)
+    level = root.level
+    # setLevel (rather than setting root.level) also clears the loggers' cached levels
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    try:
+        pipeline = Pipeline(steps=[Task(lambda: 1, name='root'), Task(lambda x: x, dependsOn=['root'], name='next')])
+        pipeline.compose()
+        pipeline.collect()
+        pipeline.run()
+        written = len(lines)
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+    assert written and handler.queue.empty()
+    assert any('Running Tasks next' in line for line in lines[:written])
@@ -0,0 +1,55 @@
+import pytest
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list, type: str = 'default') -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps, type=type)
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+@pytest.mark.parametrize('type', ['default', 'asyncio'])
+def test_mapped_task_combines_its_children_in_partition_order(type):
+    def ranges(x, size):
+        return [{'start': start} for start in range(0, 100, size)]
+
+    def part(x, size, start):
+        return list(range(start, start + size))
+
+    def merge(*parts):
+        return [value for values in parts for value in values]
+
+    pipeline = build([Task(part, kwargs={'size': 25}, dependsOn=['root'], name='mapped', partitions=ranges, reduce=merge, keepResult=True)],
+                     type=type)
+    pipeline.run(workers=3)
+    assert pipeline.get_result('mapped') == list(range(100))
+
+
+def test_partitions_can_hand_each_child_its_own_inputs():
+    seen = []
+
+    def values(x):
+        return list(range(10))
+
+    def halves(rows):
+        return [{'half': index, 'inputs': (rows[start:start + 5],)} for index, start in enumerate((0, 5))]
+
+    def total(rows, half):
+        seen.append(rows)
+        return sum(rows)
+
+    pipeline = build([
+        Task(values, dependsOn=['root'], name='values'),
+        Task(total, dependsOn=['values'], name='mapped', partitions=halves, keepResult=True),
+    ])
+    pipeline.run(workers=2)
+    assert pipeline.get_result('mapped') == [sum(range(5)), sum(range(5, 10))]
+    assert sorted(seen) == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]]
+    # The slices are dropped once the children have run
+    assert all(child.inputs is None for child in pipeline.get_task_by_name('mapped').children)
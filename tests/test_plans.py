@@ -0,0 +1,85 @@
+import sys
+import pytest
+from dexxy.common.exceptions import PlanError
+from dexxy.common.plans import Plan, isPlan
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def ranges(x, size):
+    return [{'start': start} for start in range(0, 6, size)]
+
+
+def part(x, size, start):
+    return list(range(start, start + size))
+
+
+def total(*parts):
+    return sum(value for values in parts for value in values)
+
+
+def double(x):
+    return x * 2
+
+
+def build() -> Pipeline:
+    pipeline = Pipeline(steps=[
+        Task(root, name='root'),
+        Task(part, kwargs={'size': 2}, dependsOn=['root'], name='mapped', partitions=ranges, reduce=total, retries=2, resources={'db': 1}),
+        Task(double, dependsOn=['mapped'], name='double', keepResult=True, version='2'),
+    ])
+    pipeline.compose()
+    return pipeline
+
+
+def test_saved_plan_opens_and_runs_like_the_pipeline_it_was_saved_from(tmp_path):
+    filename = str(tmp_path / 'plan')
+    saved = build()
+    saved.saveDAG(filename)
+    assert isPlan(filename)
+    with Plan(filename) as plan:
+        plan.verify()
+        assert plan.checkCode() == []
+
+    opened = Pipeline().openDAG(filename, validate=True)
+    assert sorted(task.tid for task in opened.tasks()) == sorted(task.tid for task in saved.tasks())
+    mapped = opened.get_task_by_name('mapped')
+    assert (mapped.func, mapped.partitions, mapped.reduce) == (part, ranges, total)
+    assert (mapped.kwargs, mapped.retries, mapped.resources) == ({'size': 2}, 2, {'db': 1})
+    assert opened.get_task_by_name('double').version == '2'
+    assert [dep.name for dep in opened.get_task_by_name('double').dependsOn] == ['mapped']
+
+    opened.collect()
+    opened.run(workers=2)
+    assert opened.get_result('double') == 2 * sum(range(6))
+    # Tasks made after opening a plan don't reuse its tids
+    assert Task(root).tid > max(task.tid for task in opened.tasks())
+
+
+def test_plan_with_a_bad_content_hash_is_refused(tmp_path):
+    filename = tmp_path / 'plan'
+    build().saveDAG(str(filename))
+    data = bytearray(filename.read_bytes())
+    data[-1] ^= 0xFF
+    filename.write_bytes(bytes(data))
+
+    with Plan(str(filename)) as plan:
+        with pytest.raises(PlanError, match='content hash'):
+            plan.verify()
+    with pytest.raises(PlanError):
+        Pipeline().openDAG(str(filename))
+
+
+def test_plan_whose_functions_changed_is_refused_when_validated(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'plan')
+    build().saveDAG(filename)
+    monkeypatch.setattr(sys.modules[__name__], 'double', lambda x: x * 3)
+
+    with Plan(filename) as plan:
+        assert plan.checkCode() == ['%s:double has changed since the plan was compiled' % __name__]
+    with pytest.raises(PlanError, match='double'):
+        Pipeline().openDAG(filename, validate=True)
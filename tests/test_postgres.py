@@ -0,0 +1,48 @@
+import pytest
+from dexxy.database.postgres import PostgresClient
+
+psycopg_pool = pytest.importorskip('psycopg_pool')
+
+
+class FakePool(object):
+    # Stands in for psycopg_pool.ConnectionPool, which would try to connect
+
+    check_connection = None
+
+    def __init__(self, conninfo, **settings):
+        self.conninfo = conninfo
+        self.settings = settings
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setattr(psycopg_pool, 'ConnectionPool', FakePool)
+    path = tmp_path / 'database.ini'
+    path.write_text('[postgresql]\nhost = localhost\nport = 5432\nuser = postgres\npassword = pass\ndbname = dvdrental\n')
+    yield str(path)
+    PostgresClient.close_pools()
+
+
+def test_pool_is_shared_by_callers_with_the_same_settings(config):
+    pool = PostgresClient().pool(config, 'postgresql', max_size=2, autocommit=True)
+    assert PostgresClient().pool(config, 'postgresql', max_size=2, autocommit=True) is pool
+    assert pool.settings['max_size'] == 2 and pool.settings['kwargs'] == {'autocommit': True}
+
+
+def test_pool_with_different_settings_raises(config):
+    PostgresClient().pool(config, 'postgresql', max_size=2)
+    with pytest.raises(ValueError, match='max_size'):
+        PostgresClient().pool(config, 'postgresql', max_size=8)
+    with pytest.raises(ValueError, match='kwargs'):
+        PostgresClient().pool(config, 'postgresql', max_size=2, autocommit=True)
+
+
+def test_closed_pool_is_reopened_with_new_settings(config):
+    pool = PostgresClient().pool(config, 'postgresql', max_size=2)
+    pool.close()
+    reopened = PostgresClient().pool(config, 'postgresql', max_size=8)
+    assert reopened is not pool and reopened.settings['max_size'] == 8
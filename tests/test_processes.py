@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+from dexxy.common.processes import ArrowFrame, pack, unpack
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def test_dataframes_cross_as_one_arrow_buffer():
+    df = pd.DataFrame({'a': range(5), 'b': list('abcde')})
+    packed = pack(df)
+    assert isinstance(packed, ArrowFrame)
+    pd.testing.assert_frame_equal(unpack(packed), df)
+    # Anything else is left to pickle
+    assert pack([1, 2]) == [1, 2] and unpack([1, 2]) == [1, 2]
+
+
+def test_process_tasks_run_in_another_process():
+    # Nested functions are shipped by value, so the child process doesn't have to import this module
+    def frame():
+        return pd.DataFrame({'a': range(100)})
+
+    def where(df):
+        import os
+        return os.getpid(), int(df.a.sum())
+
+    def local(result):
+        return result
+
+    pipeline = Pipeline(steps=[
+        Task(frame, name='frame', executor='process'),
+        Task(where, dependsOn=['frame'], name='where', executor='process'),
+        Task(local, dependsOn=['where'], name='local', keepResult=True),
+    ])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(workers=2)
+    pid, total = pipeline.get_result('local')
+    assert pid != os.getpid() and total == sum(range(100))
+
+
+def test_run_executor_is_the_default_for_tasks_without_one():
+    def root():
+        import os
+        return os.getpid()
+
+    def here(pid):
+        import os
+        return pid, os.getpid()
+
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(here, dependsOn=['root'], name='here', executor='thread', keepResult=True)])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(executor='process')
+    child, parent = pipeline.get_result('here')
+    assert child != parent == os.getpid()
@@ -0,0 +1,66 @@
+import csv
+import json
+import time
+import pandas as pd
+import pytest
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.reports import REPORT_FIELDS, describeResult
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def frame(x):
+    time.sleep(0.05)
+    return pd.DataFrame({'a': range(10)})
+
+
+def boom(df):
+    raise ValueError('report boom')
+
+
+def run(report: str) -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(frame, dependsOn=['root'], name='frame'), Task(boom, dependsOn=['frame'], name='boom')])
+    pipeline.compose()
+    pipeline.collect()
+    with pytest.raises(TaskFailedError):
+        pipeline.run(report=report)
+    return pipeline
+
+
+def test_result_sizes():
+    df = pd.DataFrame({'a': range(10)})
+    assert describeResult(df) == (10, int(df.memory_usage(deep=True).sum()))
+    assert describeResult(None) == (None, None)
+    assert describeResult([1, 2])[0] is None
+
+
+def test_json_report_has_timings_sizes_and_errors(tmp_path):
+    path = str(tmp_path / 'report.json')
+    pipeline = run(path)
+    with open(path) as f:
+        report = json.load(f)
+
+    assert report['runID'] and [row['name'] for row in report['tasks']] == ['root', 'frame', 'boom']
+    rows = {row['name']: row for row in report['tasks']}
+    assert set(rows['frame']) == set(REPORT_FIELDS)
+    assert rows['frame']['status'] == 'Completed' and rows['frame']['resultRows'] == 10 and rows['frame']['resultBytes'] > 0
+    assert rows['frame']['duration'] >= 0.05
+    assert rows['frame']['queuedAt'] <= rows['frame']['readyAt'] <= rows['frame']['startedAt'] <= rows['frame']['finishedAt']
+    # boom became ready once frame had finished
+    assert rows['boom']['waitDependencies'] >= 0.05
+    assert rows['boom']['status'] == 'Failed' and 'ValueError: report boom' in rows['boom']['error']
+    assert rows['boom']['tid'] == pipeline.get_task_by_name('boom').tid
+
+
+def test_csv_report_has_one_row_per_task(tmp_path):
+    path = str(tmp_path / 'report.csv')
+    run(path)
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['name'] for row in rows] == ['root', 'frame', 'boom']
+    assert list(rows[0]) == ['runID'] + REPORT_FIELDS
+    assert len({row['runID'] for row in rows}) == 1
@@ -0,0 +1,51 @@
+import threading
+import time
+import pytest
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list, type: str = 'default') -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps, type=type)
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+def statuses(pipeline: Pipeline) -> dict:
+    return {task.name: task.status for task in pipeline.tasks()}
+
+
+@pytest.mark.parametrize('type', ['default', 'asyncio'])
+def test_resource_pool_limits_concurrent_tasks(type):
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def work(x):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.05)
+        with lock:
+            state['running'] -= 1
+
+    pipeline = build([Task(work, dependsOn=['root'], name='work%s' % index, resources={'db': 1}) for index in range(6)], type=type)
+    pipeline.run(workers=6, resources={'db': 2})
+    assert state['peak'] == 2
+
+
+def test_task_needing_more_than_a_pool_holds_fails():
+    pipeline = build([
+        Task(lambda x: x, dependsOn=['root'], name='big', resources={'mem_gb': 8}),
+        Task(lambda x: x, dependsOn=['root'], name='small', resources={'mem_gb': 1}),
+    ])
+
+    with pytest.raises(TaskFailedError):
+        pipeline.run(workers=2, resources={'mem_gb': 4})
+    assert statuses(pipeline)['big'] == 'Failed'
+    assert statuses(pipeline)['small'] == 'Completed'
@@ -0,0 +1,121 @@
+import os
+import pytest
+from dexxy.common.exceptions import NotFoundError
+from dexxy.common.results import ResultStore, SpilledResult
+from dexxy.common.tasks import Task
+from dexxy.common.utils import isDataFrame
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def completed(func, name: str, result) -> Task:
+    task = Task(func, name=name)
+    task.result = result
+    task.updateStatus('Completed')
+    return task
+
+
+def test_result_store_looks_tasks_up_by_tid_and_name():
+    store = ResultStore()
+    first, second = completed(root, 'first', 1), completed(root, 'second', [2])
+    store.put(first)
+    store.put(second)
+
+    assert store.get(first.tid) is first and store.get(second.tid) is second
+    assert store.get(second.tid + 1000) is None
+    assert store.getByName('second') is second and store.getResult('second') == [2]
+    assert first.tid in store and len(store) == 2
+    assert store.tasks() == [first, second]
+    with pytest.raises(NotFoundError):
+        store.getByName('third')
+
+
+def test_pipeline_results_come_from_the_store():
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(lambda x: x + 1, dependsOn=['root'], name='next')])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run()
+    assert pipeline.get_result('next') == 2
+    assert [task.name for task in pipeline.result_store.tasks()] == ['root', 'next']
+    with pytest.raises(NotFoundError):
+        pipeline.get_result('missing')
+
+
+def fanOut(release: bool = True, keep: bool = False) -> tuple:
+    # shared is read by left and by last, which also waits for left, so shared's result must outlive left
+    seen = {}
+
+    def record(name):
+        def consume(*inputs):
+            seen[name] = inputs
+            return name
+        return consume
+
+    pipeline = Pipeline(steps=[
+        Task(root, name='root'),
+        Task(lambda x: [x] * 3, dependsOn=['root'], name='shared', keepResult=keep),
+        Task(record('left'), dependsOn=['shared'], name='left'),
+        Task(record('last'), dependsOn=['shared', 'left'], name='last'),
+    ])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(workers=1, release_results=release)
+    return pipeline, seen
+
+
+def test_result_is_released_after_its_last_consumer():
+    pipeline, seen = fanOut()
+    assert seen == {'left': ([1, 1, 1],), 'last': ([1, 1, 1], 'left')}
+    assert pipeline.get_task_by_name('shared').result is None
+    assert pipeline.get_task_by_name('root').result is None
+    # Nothing consumes the last Task, so its result stays
+    assert pipeline.get_result('last') == 'last'
+
+
+def test_kept_results_are_not_released():
+    pipeline, _ = fanOut(keep=True)
+    assert pipeline.get_result('shared') == [1, 1, 1]
+    pipeline, _ = fanOut(release=False)
+    assert pipeline.get_result('shared') == [1, 1, 1] and pipeline.get_result('root') == 1
+
+
+def test_large_dataframes_are_spilled_and_the_file_removed_on_release(tmp_path):
+    import pandas as pd
+
+    store = ResultStore(spillThreshold=1000, spillDir=str(tmp_path))
+    df = pd.DataFrame({'a': range(1000), 'b': ['x'] * 1000})
+    large, small, other = completed(root, 'large', df), completed(root, 'small', df.head(2)), completed(root, 'other', list(range(1000)))
+    for task in (large, small, other):
+        store.maybeSpill(task)
+        store.put(task)
+
+    assert isinstance(large.result, SpilledResult) and large.result.rows == 1000
+    assert os.path.exists(large.result.path)
+    pd.testing.assert_frame_equal(store.getResult('large'), df)
+    # Small DataFrames and other results stay in memory
+    assert isDataFrame(small.result) and other.result == list(range(1000))
+
+    path = large.result.path
+    store.release(large)
+    assert large.result is None and not os.path.exists(path)
+
+
+def test_spilled_results_reach_their_consumers_and_are_cleaned_up(tmp_path):
+    import pandas as pd
+
+    def frame(x):
+        return pd.DataFrame({'a': range(1000)})
+
+    def total(df):
+        return type(df).__name__, int(df.a.sum())
+
+    pipeline = Pipeline(steps=[Task(root, name='root'), Task(frame, dependsOn=['root'], name='frame'), Task(total, dependsOn=['frame'], name='total')])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run(spill_threshold=1, spill_dir=str(tmp_path))
+    assert pipeline.get_result('total') == ('DataFrame', sum(range(1000)))
+    assert pipeline.get_task_by_name('frame').result is None
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,81 @@
+import time
+import pytest
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list, type: str = 'default') -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps, type=type)
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+def statuses(pipeline: Pipeline) -> dict:
+    return {task.name: task.status for task in pipeline.tasks()}
+
+
+@pytest.mark.parametrize('type', ['default', 'asyncio'])
+def test_failure_skips_descendants_and_finishes_other_branches(type):
+    def boom(x):
+        raise ValueError('boom')
+
+    pipeline = build([
+        Task(boom, dependsOn=['root'], name='boom'),
+        Task(lambda x: x, dependsOn=['boom'], name='child'),
+        Task(lambda x: x + 1, dependsOn=['root'], name='other', keepResult=True),
+    ], type=type)
+
+    with pytest.raises(TaskFailedError):
+        pipeline.run(workers=2)
+    assert statuses(pipeline) == {'root': 'Completed', 'boom': 'Failed', 'child': 'Skipped', 'other': 'Completed'}
+    assert 'ValueError: boom' in pipeline.get_task_by_name('boom').error
+    assert pipeline.get_result('other') == 2
+
+
+def test_retries_until_the_task_succeeds():
+    calls = []
+
+    def flaky(x):
+        calls.append(x)
+        if len(calls) < 3:
+            raise ConnectionError('hiccup')
+        return len(calls)
+
+    pipeline = build([Task(flaky, dependsOn=['root'], name='flaky', retries=2, retryDelay=0.01, keepResult=True)])
+    pipeline.run()
+    assert pipeline.get_result('flaky') == 3
+    assert pipeline.get_task_by_name('flaky').attempts == 3
+
+
+def test_timed_out_attempt_is_not_retried_and_holds_its_resources():
+    started = {}
+    finished = {}
+
+    def slow(x):
+        started['slow'] = time.time()
+        time.sleep(0.5)
+        finished['slow'] = time.time()
+
+    def other(x):
+        started['other'] = time.time()
+
+    pipeline = build([
+        Task(slow, dependsOn=['root'], name='slow', timeout=0.1, retries=2, retryDelay=0.01, resources={'db': 1}),
+        Task(other, dependsOn=['root'], name='other', resources={'db': 1}),
+    ])
+
+    with pytest.raises(TaskFailedError):
+        pipeline.run(workers=2, resources={'db': 1})
+    slowTask = pipeline.get_task_by_name('slow')
+    assert slowTask.status == 'Failed'
+    assert slowTask.attempts == 1
+    assert 'TaskTimeoutError' in slowTask.error
+    # The attempt kept running after its timeout, and its 'db' unit wasn't handed to other until it finished
+    assert started['slow'] < started['other']
+    assert started['other'] >= finished['slow']
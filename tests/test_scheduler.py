@@ -0,0 +1,91 @@
+import os
+import pytest
+from dexxy.common.scheduler import Scheduler, ScheduledPipeline
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+class Resource(object):
+    # Stands in for a connection pool that is expensive to open
+
+    def __init__(self, opened: list):
+        self.closed = False
+        opened.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def build(opened: list, used: list, failures: list = None) -> Pipeline:
+    def openPool():
+        return Resource(opened)
+
+    def use(pool):
+        if failures:
+            raise failures.pop()
+        used.append(pool)
+        return len(used)
+
+    pipeline = Pipeline(steps=[Task(openPool, name='openPool'), Task(use, dependsOn=['openPool'], name='use')])
+    pipeline.compose()
+    return pipeline
+
+
+def test_warm_tasks_are_reused_by_later_runs():
+    opened, used = [], []
+    scheduled = ScheduledPipeline(build(opened, used), keepWarm=['openPool'])
+    for _ in range(3):
+        scheduled.run()
+
+    assert scheduled.runs == 3 and scheduled.failures == 0
+    assert len(opened) == 1 and used == opened * 3
+    assert scheduled.pipeline.get_task_by_name('openPool').restored
+
+    scheduled.close()
+    assert opened[0].closed
+
+
+def test_failed_run_closes_warm_results_and_the_next_run_reopens_them():
+    opened, used = [], []
+    failures = [ValueError('connection dropped')]
+    scheduled = ScheduledPipeline(build(opened, used, failures), keepWarm=['openPool'])
+
+    scheduled.run()
+    assert scheduled.failures == 1 and 'use' in scheduled.lastError
+    assert len(opened) == 1 and opened[0].closed
+
+    scheduled.run()
+    assert scheduled.runs == 1 and scheduled.lastError is None
+    assert len(opened) == 2 and used == [opened[1]] and not opened[1].closed
+
+
+def test_overlapping_runs_get_their_own_copy():
+    opened, used = [], []
+    scheduled = ScheduledPipeline(build(opened, used), maxConcurrentRuns=2)
+    first = scheduled.acquire()
+    second = scheduled.acquire()
+    assert first is scheduled.pipeline and second is not first
+    assert sorted(task.tid for task in second.tasks()) == sorted(task.tid for task in first.tasks())
+    assert all(copy is not task for copy, task in zip(second.tasks(), first.tasks()))
+
+    planFile = scheduled._planFile
+    scheduled.release(second)
+    scheduled.release(first)
+    # Both copies are idle now, so no third copy is opened
+    assert scheduled.acquire() in (first, second)
+    scheduled.close()
+    assert not os.path.exists(planFile)
+
+
+def test_only_composed_pipelines_can_be_scheduled():
+    with pytest.raises(ValueError):
+        ScheduledPipeline(Pipeline(steps=[Task(print, name='print')]))
+
+
+def test_schedule_passes_overlap_settings_to_the_job():
+    scheduler = Scheduler()
+    pipeline = build([], [])
+    job = scheduler.schedulePipeline(pipeline, 'interval', id='refresh', maxConcurrentRuns=1, coalesce=True, misfireGraceTime=30,
+                                     keepWarm=['openPool'], minutes=5)
+    assert (job.id, job.max_instances, job.coalesce, job.misfire_grace_time) == ('refresh', 1, True, 30)
+    assert scheduler.scheduled['refresh'].keepWarm == {'openPool'}
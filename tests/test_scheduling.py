@@ -0,0 +1,86 @@
+from dexxy.common.history import DurationHistory
+from dexxy.common.queues import CriticalPathPolicy, FifoPolicy, ReadyQueue
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def step(*inputs):
+    return 1
+
+
+def graph() -> tuple:
+    # lookup is ready first but nothing slow waits on it; extract is short itself but feeds the slow fact build
+    tasks = {name: Task(step, name=name) for name in ('lookup', 'extract', 'fact', 'dim')}
+    dependents = {task.tid: [] for task in tasks.values()}
+    dependents[tasks['extract'].tid].append(tasks['fact'])
+    return tasks, dependents
+
+
+def popAll(queue: ReadyQueue) -> list:
+    return [queue.pop().name for _ in range(len(queue))]
+
+
+def test_critical_path_starts_the_longest_remaining_path_first():
+    tasks, dependents = graph()
+    policy = CriticalPathPolicy({'lookup': 2.0, 'extract': 1.0, 'fact': 10.0, 'dim': 3.0})
+    policy.prepare(list(tasks.values()), dependents)
+    assert policy.remaining[tasks['extract'].tid] == 11.0
+
+    queue = ReadyQueue(policy)
+    for name in ('lookup', 'extract', 'dim'):
+        queue.push(tasks[name])
+    assert popAll(queue) == ['extract', 'dim', 'lookup']
+
+    queue = ReadyQueue(FifoPolicy())
+    for name in ('lookup', 'extract', 'dim'):
+        queue.push(tasks[name])
+    assert popAll(queue) == ['lookup', 'extract', 'dim']
+
+
+def test_tasks_without_history_count_as_the_average():
+    tasks, dependents = graph()
+    policy = CriticalPathPolicy({'lookup': 2.0, 'fact': 4.0})
+    policy.prepare(list(tasks.values()), dependents)
+    assert policy.remaining[tasks['dim'].tid] == 3.0
+    assert policy.remaining[tasks['extract'].tid] == 7.0
+
+
+def test_duration_history_smooths_and_saves(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = DurationHistory(path, smoothing=0.5)
+    task = Task(step, name='extract')
+    for duration in (4.0, 2.0):
+        task.duration = duration
+        history.record([task, Task(step)])
+    history.save()
+    assert DurationHistory(path).durations == {'extract': 3.0}
+
+
+def test_run_orders_ready_tasks_by_recorded_durations(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = DurationHistory(path)
+    history.durations = {'root': 0.1, 'lookup': 0.1, 'extract': 0.1, 'fact': 30.0}
+    history.save()
+
+    def run(policy: str) -> list:
+        started = []
+
+        def record(name):
+            def call(*inputs):
+                started.append(name)
+            return call
+
+        pipeline = Pipeline(steps=[
+            Task(record('root'), name='root'),
+            Task(record('lookup'), dependsOn=['root'], name='lookup'),
+            Task(record('extract'), dependsOn=['root'], name='extract'),
+            Task(record('fact'), dependsOn=['extract'], name='fact'),
+        ])
+        pipeline.compose()
+        pipeline.collect()
+        pipeline.run(workers=1, policy=policy, history=path)
+        return started
+
+    assert run('fifo') == ['root', 'lookup', 'extract', 'fact']
+    # fact becomes ready with a longer path ahead of it than lookup, so it goes first too
+    assert run('critical_path') == ['root', 'extract', 'fact', 'lookup']
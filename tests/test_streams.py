@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from dexxy.common.exceptions import StreamError, TaskFailedError
+from dexxy.common.streams import mapChunks
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list) -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps)
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+def test_producer_waits_for_a_slow_reader():
+    lock = threading.Lock()
+    state = {'produced': 0, 'ahead': 0}
+
+    def produce(x):
+        for chunk in range(20):
+            with lock:
+                state['produced'] += 1
+            yield chunk
+
+    def consume(chunks):
+        total = 0
+        for read, chunk in enumerate(chunks, 1):
+            time.sleep(0.005)
+            with lock:
+                state['ahead'] = max(state['ahead'], state['produced'] - read)
+            total += chunk
+        return total
+
+    pipeline = build([
+        Task(produce, dependsOn=['root'], name='produce', stream=True),
+        Task(mapChunks, kwargs={'func': lambda chunk: chunk * 2}, dependsOn=['produce'], name='double', stream=True),
+        Task(consume, dependsOn=['double'], name='consume', keepResult=True),
+    ])
+    pipeline.run(workers=1, stream_buffer=2)
+
+    assert pipeline.get_result('consume') == 2 * sum(range(20))
+    # Each stream lets its producer get at most stream_buffer chunks ahead (plus the chunk in hand), and there are two streams in the chain
+    assert state['ahead'] <= 2 * (2 + 1)
+
+
+def test_producer_error_fails_its_readers():
+    def produce(x):
+        yield 1
+        raise ValueError('source went away')
+
+    def consume(chunks):
+        return sum(chunks)
+
+    pipeline = build([
+        Task(produce, dependsOn=['root'], name='produce', stream=True),
+        Task(consume, dependsOn=['produce'], name='consume', retries=2, retryDelay=0.01),
+    ])
+
+    with pytest.raises(TaskFailedError):
+        pipeline.run(workers=2)
+    produceTask = pipeline.get_task_by_name('produce')
+    consumeTask = pipeline.get_task_by_name('consume')
+    assert produceTask.status == 'Failed' and 'source went away' in produceTask.error
+    assert consumeTask.status == 'Failed' and StreamError.__name__ in consumeTask.error
+    # A reader that failed part way through a stream isn't retried
+    assert consumeTask.attempts == 1
@@ -0,0 +1,65 @@
+import pytest
+from dexxy.common.exceptions import NotFoundError
+from dexxy.common.tasks import Task
+from dexxy.common.workflows import Pipeline
+
+
+def step(*inputs):
+    return 1
+
+
+def build() -> Pipeline:
+    # Two extract -> transform -> load chains, and a report built from both transforms
+    pipeline = Pipeline(steps=[
+        Task(step, name='root'),
+        Task(step, dependsOn=['root'], name='extractA'),
+        Task(step, dependsOn=['extractA'], name='transformA'),
+        Task(step, dependsOn=['transformA'], name='loadA'),
+        Task(step, dependsOn=['root'], name='extractB'),
+        Task(step, dependsOn=['extractB'], name='transformB'),
+        Task(step, dependsOn=['transformB'], name='loadB'),
+        Task(step, dependsOn=['transformA', 'transformB'], name='report'),
+    ])
+    pipeline.compose()
+    return pipeline
+
+
+def names(pipeline: Pipeline, tids: set) -> set:
+    return {task.name for task in pipeline.tasks() if task.tid in tids}
+
+
+def test_closure_walks_either_way():
+    pipeline = build()
+    transformA = pipeline.get_task_by_name('transformA').tid
+    assert names(pipeline, pipeline.dag.closure([transformA], 'upstream')) == {'root', 'extractA', 'transformA'}
+    assert names(pipeline, pipeline.dag.closure([transformA], 'downstream')) == {'transformA', 'loadA', 'report'}
+
+
+def test_select_upstream_is_the_targets_and_their_ancestors():
+    pipeline = build()
+    assert names(pipeline, pipeline.select(['loadA'])) == {'root', 'extractA', 'transformA', 'loadA'}
+    assert names(pipeline, pipeline.select(['loadA', 'loadB'], 'upstream')) == {'root', 'extractA', 'transformA', 'loadA', 'extractB', 'transformB', 'loadB'}
+
+
+def test_select_downstream_adds_the_inputs_of_the_descendants():
+    pipeline = build()
+    # report also needs transformB, so its chain runs too -- but not loadB
+    assert names(pipeline, pipeline.select(['transformA'], 'downstream')) == {'root', 'extractA', 'transformA', 'loadA', 'extractB', 'transformB', 'report'}
+
+
+def test_select_rejects_unknown_targets_and_directions():
+    pipeline = build()
+    with pytest.raises(NotFoundError):
+        pipeline.select(['loadC'])
+    with pytest.raises(ValueError):
+        pipeline.select(['loadA'], 'sideways')
+
+
+def test_run_with_targets_only_runs_the_selected_tasks():
+    pipeline = build()
+    pipeline.collect(['loadB'])
+    assert [task.name for task in pipeline.collected] == ['root', 'extractB', 'transformB', 'loadB']
+    pipeline.run(workers=2)
+    statuses = {task.name: task.status for task in pipeline.tasks()}
+    assert statuses == {'root': 'Completed', 'extractA': 'Not Started', 'transformA': 'Not Started', 'loadA': 'Not Started',
+                        'extractB': 'Completed', 'transformB': 'Completed', 'loadB': 'Completed', 'report': 'Not Started'}
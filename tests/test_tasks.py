@@ -0,0 +1,60 @@
+import pickle
+import pytest
+from dexxy.common.results import ResultStore
+from dexxy.common.tasks import Task
+from dexxy.common.utils import nextTaskID, reserveTaskIDs
+from dexxy.common.workflows import Pipeline
+
+
+def step(*inputs):
+    return 1
+
+
+def test_tasks_have_slots_and_integer_tids():
+    first, second = Task(step, name='first'), Task(step, name='second')
+    assert not hasattr(first, '__dict__')
+    with pytest.raises(AttributeError):
+        first.notASetting = 1
+    assert type(first.tid) is int and second.tid > first.tid
+    # The UUID is only made when asked for, and then kept
+    assert first._uuid is None and first.uuid == first.uuid
+
+
+def test_reserved_task_ids_are_not_handed_out_again():
+    highest = nextTaskID() + 1000
+    reserveTaskIDs(highest)
+    assert Task(step).tid > highest
+    # Reserving below the next ID changes nothing
+    current = nextTaskID()
+    reserveTaskIDs(1)
+    assert nextTaskID() == current + 1
+
+
+def test_pickled_task_keeps_its_settings_and_drops_an_abandoned_attempt():
+    task = Task(step, kwargs={'a': 1}, name='step', retries=2, resources={'db': 1})
+    task.abandoned = object()
+    copy = pickle.loads(pickle.dumps(task))
+    assert (copy.tid, copy.name, copy.kwargs, copy.retries, copy.resources) == (task.tid, 'step', {'a': 1}, 2, {'db': 1})
+    assert copy.abandoned is None
+
+
+def test_task_pickled_without_newer_settings_takes_their_defaults():
+    task = Task(step, name='old')
+    state = task.__getstate__()
+    for setting in ('stream', 'resources', 'partitions', 'version'):
+        del state[setting]
+    copy = Task.__new__(Task)
+    copy.__setstate__(state)
+    assert (copy.stream, copy.resources, copy.partitions, copy.version) == (False, None, None, None)
+    assert copy.status == 'Not Started'
+
+
+def test_result_store_is_keyed_by_tid():
+    pipeline = Pipeline(steps=[Task(step, name='root'), Task(step, dependsOn=['root'], name='next', keepResult=True)])
+    pipeline.compose()
+    pipeline.collect()
+    pipeline.run()
+    store: ResultStore = pipeline.result_store
+    assert sorted(store._byTid) == sorted(task.tid for task in pipeline.tasks())
+    assert all(type(tid) is int for tid in store._byTid)
+    assert store.get(pipeline.get_task_by_name('next').tid).result == 1
@@ -0,0 +1,55 @@
+import threading
+import pytest
+from dexxy.common.exceptions import TaskFailedError
+from dexxy.common.tasks import Task
+from dexxy.common.workers import Worker
+from dexxy.common.workflows import Pipeline
+
+
+def root():
+    return 1
+
+
+def build(steps: list, type: str = 'default') -> Pipeline:
+    pipeline = Pipeline(steps=[Task(root, name='root')] + steps, type=type)
+    pipeline.compose()
+    pipeline.collect()
+    return pipeline
+
+
+def statuses(pipeline: Pipeline) -> dict:
+    return {task.name: task.status for task in pipeline.tasks()}
+
+
+def test_failure_outside_func_fails_the_task(monkeypatch):
+    getInputs = Worker.getInputs
+
+    def brokenInputs(self, task):
+        if task.name == 'b':
+            raise RuntimeError('inputs went missing')
+        return getInputs(self, task)
+
+    monkeypatch.setattr(Worker, 'getInputs', brokenInputs)
+    pipeline = build([
+        Task(lambda x: x, dependsOn=['root'], name='b'),
+        Task(lambda x: x, dependsOn=['b'], name='c'),
+        Task(lambda x: x, dependsOn=['root'], name='d'),
+    ])
+
+    with pytest.raises(TaskFailedError):
+        pipeline.run(workers=2)
+    assert statuses(pipeline) == {'root': 'Completed', 'b': 'Failed', 'c': 'Skipped', 'd': 'Completed'}
+    assert 'inputs went missing' in pipeline.get_task_by_name('b').error
+
+
+def test_independent_tasks_run_at_the_same_time():
+    # Each Task waits for the other one to start, so the run only finishes if they run side by side
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet(x):
+        barrier.wait()
+        return x
+
+    pipeline = build([Task(meet, dependsOn=['root'], name='left'), Task(meet, dependsOn=['root'], name='right')])
+    assert pipeline.run(workers=2) == 2
+    assert statuses(pipeline) == {'root': 'Completed', 'left': 'Completed', 'right': 'Completed'}